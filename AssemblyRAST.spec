@@ -14,9 +14,11 @@ module AssemblyRAST {
 
         extra_params - assembler specific parameters
         min_contig_length - minimum length of contigs to output, default 200
+        genome_size - expected genome size in bp, used to report NG50
 
         @optional min_contig_len
         @optional extra_params
+        @optional genome_size
     */
     typedef structure {
         string workspace;
@@ -25,13 +27,52 @@ module AssemblyRAST {
 
         int min_contig_len;
         list <string> extra_params;
+        int genome_size;
     } AssemblyParams;
 
+    /*
+        report_name - the name of the report object
+        report_ref - the reference of the report object, empty until the
+                     assembly has finished when the server runs in poll mode
+        arast_job_id - the ARAST job id, set when the server runs in poll mode.
+                       A run that found every slot taken is queued, and
+                       this is an id of the queued run instead.
+        queue_position - the position of a queued run in the queue, else 0
+
+        @optional arast_job_id queue_position
+    */
     typedef structure {
         string report_name;
         string report_ref;
+        string arast_job_id;
+        int queue_position;
     } AssemblyOutput;
 
+    /*
+        State of an assembly submitted while the server runs in poll mode.
+        The server only follows these jobs in memory, so a job that is
+        still queued, running or finishing when the server restarts is lost
+        and its state becomes error.
+
+        arast_job_id - the ARAST job id, or the id of the queued run until
+                       it has been submitted
+        state - one of queued, running, finishing, done or error
+        queue_position - the position of a queued run in the queue, else 0
+        arast_status - the last status reported by ARAST
+        report_ref - the reference of the report object once state is done
+        error - the error message if state is error
+    */
+    typedef structure {
+        string arast_job_id;
+        string assembler;
+        string state;
+        string arast_status;
+        string report_name;
+        string report_ref;
+        string error;
+        int queue_position;
+    } AssemblyJobState;
+
     funcdef run_kiki(AssemblyParams params) returns (AssemblyOutput output)
         authentication required;
 
@@ -62,4 +103,71 @@ module AssemblyRAST {
     funcdef run_a6(AssemblyParams params) returns (AssemblyOutput output)
         authentication required;
 
+    /*
+        Run several assemblers supported by AssemblyRAST on the same reads.
+
+        workspace_name - the name of the workspace for input/output
+        read_library_name - the name of the PE read library
+        output_contigset_name - the prefix of the output contigsets; each
+                                assembler's contigs are saved as
+                                <output_contigset_name>.<assembler>
+        assemblers - the assemblers to run, e.g. ["kiki", "spades", "megahit"]
+
+        extra_params - assembler specific parameters
+        min_contig_length - minimum length of contigs to output, default 200
+        genome_size - expected genome size in bp, used to report NG50
+
+        @optional min_contig_len
+        @optional extra_params
+        @optional genome_size
+    */
+    typedef structure {
+        string workspace_name;
+        string read_library_name;
+        string output_contigset_name;
+        list <string> assemblers;
+
+        int min_contig_len;
+        list <string> extra_params;
+        int genome_size;
+    } MultiAssemblyParams;
+
+    /*
+        Stage the read library once, run all requested assemblers at the
+        same time and return one comparative report. In poll mode the call
+        returns at once: arast_job_id is then the id of the whole run for
+        check_assembly_job, whose assembler lists the assemblers, and the
+        report is saved when the last of them finishes.
+    */
+    funcdef run_assemblers(MultiAssemblyParams params) returns (AssemblyOutput output)
+        authentication required;
+
+    funcdef check_assembly_job(string arast_job_id) returns (AssemblyJobState state)
+        authentication required;
+
+    /*
+        Where the caller stands in the queue of assembly runs. Runs beyond
+        the server's overall or per user limit wait in a queue that serves
+        users in turn. Only runs submitted in poll mode are queued; in wait
+        mode a run that finds every slot taken is refused.
+
+        running, queued - runs in flight and waiting, for all users
+        user_running, user_queued - the caller's own runs in flight and waiting
+        positions - the queue position of each of the caller's waiting
+                    runs, 1 being the next to start
+        mean_wait_seconds, max_wait_seconds - how long admitted runs waited
+    */
+    typedef structure {
+        int running;
+        int queued;
+        int user_running;
+        int user_queued;
+        list<int> positions;
+        float mean_wait_seconds;
+        float max_wait_seconds;
+    } QueueStatus;
+
+    funcdef get_queue_status() returns (QueueStatus status)
+        authentication required;
+
 };
@@ -1,4 +1,4 @@
 #!/bin/bash
 script_dir=$(dirname "$(readlink -f "$0")")
 export PYTHONPATH=$script_dir/../lib:$PATH:$PYTHONPATH
-python -u $script_dir/../lib/AssemblyRAST/AssemblyRASTServer.py $1 $2 $3
+python -u $script_dir/../lib/AssemblyRAST/server.py $1 $2 $3
@@ -171,10 +171,93 @@ class AssemblyRAST(object):
             raise ServerError('Unknown', 0, 'An unknown server error occurred')
         return resp['result']
  
-    def filter_contigs(self, params, json_rpc_context = None):
+    def run_kiki(self, params, json_rpc_context = None):
         if json_rpc_context and type(json_rpc_context) is not dict:
-            raise ValueError('Method filter_contigs: argument json_rpc_context is not type dict as required.')
-        resp = self._call('AssemblyRAST.filter_contigs',
+            raise ValueError('Method run_kiki: argument json_rpc_context is not type dict as required.')
+        resp = self._call('AssemblyRAST.run_kiki',
                           [params], json_rpc_context)
         return resp[0]
- 
\ No newline at end of file
+ 
+    def run_velvet(self, params, json_rpc_context = None):
+        if json_rpc_context and type(json_rpc_context) is not dict:
+            raise ValueError('Method run_velvet: argument json_rpc_context is not type dict as required.')
+        resp = self._call('AssemblyRAST.run_velvet',
+                          [params], json_rpc_context)
+        return resp[0]
+ 
+    def run_miniasm(self, params, json_rpc_context = None):
+        if json_rpc_context and type(json_rpc_context) is not dict:
+            raise ValueError('Method run_miniasm: argument json_rpc_context is not type dict as required.')
+        resp = self._call('AssemblyRAST.run_miniasm',
+                          [params], json_rpc_context)
+        return resp[0]
+ 
+    def run_spades(self, params, json_rpc_context = None):
+        if json_rpc_context and type(json_rpc_context) is not dict:
+            raise ValueError('Method run_spades: argument json_rpc_context is not type dict as required.')
+        resp = self._call('AssemblyRAST.run_spades',
+                          [params], json_rpc_context)
+        return resp[0]
+ 
+    def run_idba(self, params, json_rpc_context = None):
+        if json_rpc_context and type(json_rpc_context) is not dict:
+            raise ValueError('Method run_idba: argument json_rpc_context is not type dict as required.')
+        resp = self._call('AssemblyRAST.run_idba',
+                          [params], json_rpc_context)
+        return resp[0]
+ 
+    def run_megahit(self, params, json_rpc_context = None):
+        if json_rpc_context and type(json_rpc_context) is not dict:
+            raise ValueError('Method run_megahit: argument json_rpc_context is not type dict as required.')
+        resp = self._call('AssemblyRAST.run_megahit',
+                          [params], json_rpc_context)
+        return resp[0]
+ 
+    def run_ray(self, params, json_rpc_context = None):
+        if json_rpc_context and type(json_rpc_context) is not dict:
+            raise ValueError('Method run_ray: argument json_rpc_context is not type dict as required.')
+        resp = self._call('AssemblyRAST.run_ray',
+                          [params], json_rpc_context)
+        return resp[0]
+ 
+    def run_masurca(self, params, json_rpc_context = None):
+        if json_rpc_context and type(json_rpc_context) is not dict:
+            raise ValueError('Method run_masurca: argument json_rpc_context is not type dict as required.')
+        resp = self._call('AssemblyRAST.run_masurca',
+                          [params], json_rpc_context)
+        return resp[0]
+ 
+    def run_a5(self, params, json_rpc_context = None):
+        if json_rpc_context and type(json_rpc_context) is not dict:
+            raise ValueError('Method run_a5: argument json_rpc_context is not type dict as required.')
+        resp = self._call('AssemblyRAST.run_a5',
+                          [params], json_rpc_context)
+        return resp[0]
+ 
+    def run_a6(self, params, json_rpc_context = None):
+        if json_rpc_context and type(json_rpc_context) is not dict:
+            raise ValueError('Method run_a6: argument json_rpc_context is not type dict as required.')
+        resp = self._call('AssemblyRAST.run_a6',
+                          [params], json_rpc_context)
+        return resp[0]
+ 
+    def run_assemblers(self, params, json_rpc_context = None):
+        if json_rpc_context and type(json_rpc_context) is not dict:
+            raise ValueError('Method run_assemblers: argument json_rpc_context is not type dict as required.')
+        resp = self._call('AssemblyRAST.run_assemblers',
+                          [params], json_rpc_context)
+        return resp[0]
+ 
+    def check_assembly_job(self, arast_job_id, json_rpc_context = None):
+        if json_rpc_context and type(json_rpc_context) is not dict:
+            raise ValueError('Method check_assembly_job: argument json_rpc_context is not type dict as required.')
+        resp = self._call('AssemblyRAST.check_assembly_job',
+                          [arast_job_id], json_rpc_context)
+        return resp[0]
+
+    def get_queue_status(self, json_rpc_context = None):
+        if json_rpc_context and type(json_rpc_context) is not dict:
+            raise ValueError('Method get_queue_status: argument json_rpc_context is not type dict as required.')
+        resp = self._call('AssemblyRAST.get_queue_status',
+                          [], json_rpc_context)
+        return resp[0]
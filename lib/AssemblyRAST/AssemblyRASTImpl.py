@@ -1,6 +1,7 @@
 #BEGIN_HEADER
 import os
 import sys
+import copy
 import shutil
 import hashlib
 import subprocess
@@ -10,15 +11,26 @@ import logging
 import pprint
 import json
 import tempfile
+import threading
 import re
+import time
 from datetime import datetime
 from pprint import pprint, pformat
 
-import numpy as np
-
-from Bio import SeqIO
-
-from biokbase.workspace.client import Workspace as workspaceService
+from AssemblyRAST.admission import AdmissionController
+from AssemblyRAST.arast_client import (ARASTClient, ARASTCommandClient, ARASTError,
+                                       DEFAULT_WAIT_TIMEOUT, job_done, job_failed)
+from AssemblyRAST.assembly_stats import AssemblyStats, format_stats, stats_metadata
+from AssemblyRAST.checksum import PARALLEL_MIN_BYTES, AssemblyDigest, md5_contigs
+from AssemblyRAST.contigset import ContigSetWriter, save_object_from_file
+from AssemblyRAST.fasta import filter_fasta
+from AssemblyRAST.job_poller import JobPoller, JobStore
+from AssemblyRAST.metrics import Registry
+from AssemblyRAST.owners import Owners
+from AssemblyRAST.result_cache import ResultCache, cache_key
+from AssemblyRAST.timing import Timings
+from AssemblyRAST.ttl_cache import TTLCache
+from AssemblyRAST.workspace_pool import WorkspacePool
 
 
 # logging.basicConfig(format="[%(asctime)s %(levelname)s %(name)s] %(message)s", level=logging.DEBUG)
@@ -48,6 +60,8 @@ This sample module contains multiple assembly methods:
     run_a5
     run_a6
 
+    run_assemblers runs several of them on the same reads and compares them.
+
     '''
 
     ######## WARNING FOR GEVENT USERS #######
@@ -57,7 +71,30 @@ This sample module contains multiple assembly methods:
     # the latter method is running.
     #########################################
     #BEGIN_CLASS_HEADER
+    ASSEMBLERS = ('kiki', 'velvet', 'miniasm', 'spades', 'idba', 'megahit',
+                  'ray', 'masurca', 'a5', 'a6')
+
+    READ_LIB_PATHS = ['lib1/file', 'lib2/file', 'handle_1', 'handle_2',
+                      'lib/file', 'handle', 'interleaved']
+
+    # the error of polled jobs whose worker or server went away
+    LOST_JOB = 'The server process watching the job went away while it ran'
+
     workspaceURL = None
+    arastURL = None
+    arastClient = 'commands'
+    submitMode = 'wait'
+    hashThreads = 0
+    resultCache = None
+    admission = None
+    admissionTimeout = None
+    admissionPollInterval = None
+    pollInitialDelay = 5
+    pollMaxDelay = 300
+    arastWaitTimeout = None
+    owners = None
+    metrics = None
+    arastJobs = None
 
     # target is a list for collecting log messages
     def log(self, target, message):
@@ -67,12 +104,24 @@ This sample module contains multiple assembly methods:
         print(message)
         sys.stdout.flush()
 
-    def create_temp_json(self, attrs):
-        f = tempfile.NamedTemporaryFile(delete=False)
-        outjson = f.name
-        f.write(json.dumps(attrs))
-        f.close()
-        return outjson
+    # the ARAST client for one user's run, as chosen by arast-client
+    def make_arast_client(self, token, user):
+        if self.arastClient == 'rest':
+            return ARASTClient(self.arastURL, token, user=user)
+        return ARASTCommandClient(self.arastURL, token, user=user)
+
+    # fetch the parts of a read library object that combine_read_libs uses
+    def get_read_lib(self, ws, ref):
+        # the info call checks that this token can read the object, so a
+        # cached library is never handed to a user who could not fetch it
+        info = ws.get_object_info_new({'objects': [{'ref': ref}]})[0]
+        versioned_ref = '{}/{}/{}'.format(info[6], info[0], info[4])
+        data = self.readLibCache.get(versioned_ref)
+        if data is None:
+            data = ws.get_object_subset([{'ref': versioned_ref,
+                                          'included': self.READ_LIB_PATHS}])[0]['data']
+            self.readLibCache.put(versioned_ref, data)
+        return {'data': data, 'info': info}
 
     # combine multiple read library objects into a kbase_assembly_input
     def combine_read_libs(self, libs):
@@ -111,174 +160,726 @@ This sample module contains multiple assembly methods:
         logger.debug('kbase_assembly_input = {}'.format(json.dumps(assembly_input)))
         return assembly_input
 
+    # take a slot for a run. Request threads never wait for one: with queue
+    # the run is queued, for the poller to start, and otherwise turned away.
+    # Async CLI jobs have a process of their own and wait in it, logging
+    # the queue position.
+    def admit(self, ctx, weight=1, queue=False):
+        if ctx.get('CLI'):
+            return self.admission.acquire(ctx.get('user_id'), weight, timeout=self.admissionTimeout,
+                                          log=lambda message: self.log(None, message))
+        return self.admission.try_acquire(ctx.get('user_id'), weight, queue=queue)
+
+    # add the stages of a finished run to the metrics
+    def observe_timings(self, assembler, timings):
+        for span in timings.spans:
+            self.stageSeconds.inc(span['seconds'], assembler=assembler, stage=span['stage'])
+            if span['bytes']:
+                self.stageBytes.inc(span['bytes'], assembler=assembler, stage=span['stage'])
+        self.runsFinished.inc(assembler=assembler)
+
+    # metrics of this process, read when scraped
+    def collect_metrics(self):
+        return [('assemblyrast_arast_jobs_active', 'gauge',
+                 'ARAST jobs submitted and not yet finished.', [({}, len(self.arastJobs))])]
+
+    # metrics of the admission state every worker shares, read when scraped
+    def collect_admission_metrics(self):
+        status = self.admission.status()
+        return [('assemblyrast_runs_running', 'gauge',
+                 'Runs admitted and holding a slot.', [({}, status['running'])]),
+                ('assemblyrast_runs_queued', 'gauge',
+                 'Runs waiting for a slot.', [({}, status['queued'])]),
+                ('assemblyrast_runs_oldest_wait_seconds', 'gauge',
+                 'How long the longest waiting run has waited for a slot.',
+                 [({}, status['oldest_wait_seconds'])]),
+                ('assemblyrast_runs_admitted_total', 'counter',
+                 'Runs given a slot.', [({}, status['admitted'])]),
+                ('assemblyrast_runs_rejected_total', 'counter',
+                 'Runs turned away because the queue was full or the wait timed out.',
+                 [({}, status['rejected'])])]
+
     # template
     def arast_run(self, ctx, params, assembler='kiki'):
-        output = None
+        self.check_params(params)
+        # async CLI jobs exit as soon as we return, so they always wait
+        poll = self.submitMode == 'poll' and not ctx.get('CLI')
+        timings = Timings()
+        with timings.span('admission'):
+            ticket = self.admit(ctx, queue=poll)
+        if ticket['admitted'] is None:
+            return self.arast_enqueue(ctx, params, assembler, ticket, timings)
+        return self.arast_start(ctx, params, assembler, ticket, timings, poll)
 
-        console = []
-        self.log(console,'Running run_{} with params='.format(assembler))
-        self.log(console, pformat(params))
+    # stage and submit an admitted run, then wait for it or, with poll,
+    # hand it to the poller, which releases the slot once it is finished
+    def arast_start(self, ctx, params, assembler, ticket, timings, poll, record_id=None):
+        try:
+            staged = self.arast_stage(ctx, params, 'run_'+assembler, timings)
+
+            # a cached result goes straight to the workspace save
+            run = self.arast_cached(staged, assembler)
+            if run is not None:
+                return self.arast_finish(run)
 
-        #### do some basic checks
+            run = self.arast_submit(ctx, params, assembler, staged)
+
+            if poll:
+                run['admission'] = ticket
+                output = self.arast_watch(run, record_id)
+                ticket = None
+                return output
+
+            try:
+                self.arast_wait(run)
+            finally:
+                self.arastJobs.discard(run['job_id'])
+            return self.arast_finish(run)
+        finally:
+            if ticket is not None:
+                self.admission.release(ticket)
+
+    # queue a run that found every slot taken and return at once; the
+    # poller starts it when it is admitted, under an id of its own that
+    # check_assembly_job answers for
+    def arast_enqueue(self, ctx, params, assembler, ticket, timings):
+        run_id = ticket['id']
+        self.jobStore.save({'arast_job_id': run_id,
+                            'assembler': assembler,
+                            'user_id': ctx.get('user_id'),
+                            'owner': self.jobStore.owner,
+                            'state': 'queued',
+                            'arast_status': '',
+                            'report_name': '',
+                            'report_ref': '',
+                            'error': ''}, run_id)
+        self.log(None, 'Run {} for {} queued at position {}'.format(
+            run_id, ctx.get('user_id'), ticket['position']))
+
+        def poll():
+            return self.admission.poll(ticket)
+
+        def on_done():
+            # the wait in the queue is part of admission
+            timings.add('admission', ticket['admitted'] - ticket['queued'])
+            output = self.arast_start(ctx, params, assembler, ticket, timings, True, run_id)
+            if output['report_ref']:
+                # a cached result, saved already
+                self.jobStore.update(run_id, state='done', report_name=output['report_name'],
+                                     report_ref=output['report_ref'])
+
+        def on_error(e):
+            try:
+                logger.error('Queued run {} failed: {}'.format(run_id, e))
+                self.jobStore.update(run_id, state='error', error=str(e))
+            finally:
+                self.admission.release(ticket)
+
+        self.poller.watch(run_id, poll, on_done, on_error,
+                          delay=self.admissionPollInterval, max_delay=self.admissionPollInterval)
+        return {'report_name': '', 'report_ref': '', 'arast_job_id': run_id,
+                'queue_position': ticket['position']}
+
+    # the basic checks, made before a run is admitted
+    def check_params(self, params):
         if 'workspace_name' not in params:
             raise ValueError('workspace_name parameter is required')
         if 'read_library_name' not in params:
             raise ValueError('read_library_name parameter is required')
         if 'output_contigset_name' not in params:
             raise ValueError('output_contigset_name parameter is required')
-        min_contig_len = params.get('min_contig_len') or 300
+        # the UI may send numbers as strings, so anything int() takes will do
+        for name, minimum in (('min_contig_len', 0), ('genome_size', 1)):
+            value = params.get(name)
+            if value is None or value == '':
+                continue
+            try:
+                number = int(value)
+            except (TypeError, ValueError):
+                raise ValueError('{} parameter must be an integer, not {!r}'.format(name, value))
+            if number < minimum:
+                raise ValueError('{} parameter must be at least {}'.format(name, minimum))
 
-        token = ctx['token']
+    # validate params and stage the read library for ARAST
+    def arast_stage(self, ctx, params, method, timings=None):
+        if timings is None:
+            timings = Timings()
+        console = []
+        self.log(console,'Running {} with params='.format(method))
+        self.log(console, pformat(params))
+        self.check_params(params)
 
-        os.environ["KB_AUTH_TOKEN"] = token
-        os.environ["ARAST_URL"] = '140.221.67.209' # testing on torino
+        token = ctx['token']
 
-        ws = workspaceService(self.workspaceURL, token=token)
-        objects = ws.get_objects([{'ref': params['workspace_name']+'/'+params['read_library_name']}])
+        with timings.span('stage') as span:
+            ws = self.wsPool.get(token)
+            lib = self.get_read_lib(ws, params['workspace_name']+'/'+params['read_library_name'])
+            span['records'] = 1
 
-        libs = [objects[0]]
-        wsid = objects[0]['info'][6]
+        libs = [lib]
+        wsid = lib['info'][6]
 
         kbase_assembly_input = self.combine_read_libs(libs)
-        tmp_data = self.create_temp_json(kbase_assembly_input)
+
+        # a copy, so the caller's context is left as it was
+        provenance = copy.deepcopy(ctx.get('provenance') or [{}])
+        # add additional info to provenance here, in this case the input data object reference
+        provenance[0]['input_ws_objects'] = [params['workspace_name']+'/'+params['read_library_name']]
+
+        return {'params': params,
+                'user_id': ctx.get('user_id'),
+                'provenance': provenance,
+                'console': console,
+                'token': token,
+                'ws': ws,
+                'wsid': wsid,
+                'input': kbase_assembly_input,
+                'timings': timings,
+                'arast': self.make_arast_client(token, ctx.get('user_id'))}
+
+    # submit a staged read library to ARAST for one assembler
+    def arast_submit(self, ctx, params, assembler, staged=None):
+        if staged is None:
+            staged = self.arast_stage(ctx, params, 'run_'+assembler)
 
         logger.info('Start {} assembler'.format(assembler))
 
-        cmd = ['ar-run', '-a', assembler, '--data-json', tmp_data]
-        logger.debug('CMD: {}'.format(' '.join(cmd)))
+        timings = staged['timings'].copy()
+        with timings.span('submit'):
+            job_id = staged['arast'].submit_job(assembler, staged['input'])
+        logger.debug('ARAST job ID: {}'.format(job_id))
+        self.arastJobs.add(job_id)
 
-        p = subprocess.Popen(cmd,
-                             stdout=subprocess.PIPE,
-                             stderr=subprocess.STDOUT, shell=False)
+        run = dict(staged)
+        run.update({'assembler': assembler,
+                    'job_id': job_id,
+                    'timings': timings,
+                    'submitted': time.time(),
+                    'cache_key': cache_key(assembler, staged['input'], params),
+                    'report_name': '{}.report.{}'.format(assembler, job_id)})
+        return run
 
-        out, err = p.communicate()
-        logger.debug(out)
+    # look up a finished result for this assembler and staged input, and
+    # return a run ready for arast_finish if there is one
+    def arast_cached(self, staged, assembler):
+        if self.resultCache is None:
+            return None
+        timings = staged['timings'].copy()
+        with timings.span('cache_lookup'):
+            key = cache_key(assembler, staged['input'], staged['params'])
+            output_dir = self.make_output_dir(key[:12])
+            try:
+                results = self.resultCache.get(key, output_dir)
+            except Exception:
+                # a broken cache only costs the run its shortcut
+                logger.exception('Result cache lookup for {} failed'.format(key))
+                results = None
+        if results is None:
+            shutil.rmtree(output_dir)
+            return None
+        self.log(staged['console'], 'Using cached {} result {}'.format(assembler, key))
 
-        if p.returncode != 0:
-            raise ValueError('Error running ar_run, return code: {}\n'.format(p.returncode))
+        run = dict(staged)
+        run.update({'assembler': assembler,
+                    'job_id': None,
+                    'timings': timings,
+                    'cache_key': key,
+                    'output_dir': output_dir,
+                    'results': results,
+                    'report_name': '{}.report.{}'.format(assembler, key[:12])})
+        return run
 
-        job_id = None
-        match = re.search('(\d+)', out)
-        if match:
-            job_id = match.group(1)
-        else:
-            raise ValueError('No integer job ID found: {}\n'.format(out))
+    # split the time an ARAST job took into waiting in the ARAST queue and
+    # running the assembler, as far as the status polls can tell
+    def arast_progress(self, run, status):
+        now = time.time()
+        if 'assembly_started' not in run and not status.lower().startswith('queued'):
+            run['assembly_started'] = now
+            run['timings'].add('arast_queue', now - run['submitted'])
+        if 'assembly_done' not in run and job_done(status):
+            run['assembly_done'] = now
+            run['timings'].add('assembly', now - run['assembly_started'])
 
-        timestamp = int((datetime.utcnow() - datetime.utcfromtimestamp(0)).total_seconds()*1000)
-        output_dir = os.path.join(self.scratch, 'output.'+str(timestamp))
-        output_contigs = os.path.join(output_dir, 'contigs.fa')
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+    # block until a submitted run is done, checking it as often as the
+    # poller would, for at most arast-wait-timeout seconds
+    def arast_wait(self, run):
+        return run['arast'].wait_for_job(run['job_id'], interval=self.pollInitialDelay,
+                                         max_interval=self.pollMaxDelay,
+                                         timeout=self.arastWaitTimeout,
+                                         on_status=lambda status: self.arast_progress(run, status))
 
-        cmd = ['ar-get', '-j', job_id, '-w', '-l']
-        logger.debug('CMD: {}'.format(' '.join(cmd)))
-        ar_log = subprocess.check_output(cmd)
+    # a new output directory, never shared with another run even when two
+    # threads start runs with the same name in the same millisecond
+    def make_output_dir(self, name):
+        timestamp = int((datetime.utcnow() - datetime.utcfromtimestamp(0)).total_seconds()*1000)
+        return tempfile.mkdtemp(prefix='output.{}.{}.'.format(timestamp, name), dir=self.scratch)
 
-        self.log(console, ar_log)
+    # hand a submitted run to the shared poller and return right away. The
+    # state is recorded under record_id, by default the ARAST job id.
+    def arast_watch(self, run, record_id=None):
+        job_id = run['job_id']
+        record_id = record_id or job_id
+        self.jobStore.save({'arast_job_id': job_id,
+                            'assembler': run['assembler'],
+                            'user_id': run['user_id'],
+                            'owner': self.jobStore.owner,
+                            'state': 'running',
+                            'arast_status': 'Submitted',
+                            'report_name': run['report_name'],
+                            'report_ref': '',
+                            'error': ''}, record_id)
 
-        cmdstr = 'ar-get -j {} -w -p | ar-filter -l {} > {}'.format(job_id, min_contig_len, output_contigs)
-        logger.debug('CMD: {}'.format(cmdstr))
-        subprocess.check_call(cmdstr, shell=True)
+        def poll():
+            status = run['arast'].get_job_status(job_id)
+            self.arast_progress(run, status)
+            if status != run.get('arast_status'):
+                run['arast_status'] = status
+                self.jobStore.update(record_id, arast_status=status)
+            return job_done(status)
 
-        cmd = ['ar-get', '-j', job_id, '-w', '-r']
-        logger.debug('CMD: {}'.format(' '.join(cmd)))
-        ar_report = subprocess.check_output(cmd)
+        def release():
+            if run.get('admission') is not None:
+                self.admission.release(run['admission'])
 
-        self.log(console, "\nDONE\n")
+        def on_done():
+            try:
+                self.arastJobs.discard(job_id)
+                self.jobStore.update(record_id, state='finishing')
+                if job_failed(run['arast_status']):
+                    raise ARASTError('ARAST job {} failed: {}'.format(job_id, run['arast_status']))
+                output = self.arast_finish(run)
+                self.jobStore.update(record_id, state='done', report_ref=output['report_ref'])
+            finally:
+                release()
 
-        # Warning: this reads everything into memory!  Will not work if
-        # the contigset is very large!
-        contigset_data = {
-            'id': '{}.contigset'.format(assembler),
-            'source': 'User assembled contigs from reads in KBase',
-            'source_id':'none',
-            'md5': 'md5 of what? concat seq? concat md5s?',
-            'contigs':[]
-        }
+        def on_error(e):
+            try:
+                self.arastJobs.discard(job_id)
+                logger.error('ARAST job {} failed: {}'.format(job_id, e))
+                self.jobStore.update(record_id, state='error', error=str(e))
+            finally:
+                release()
 
-        lengths = []
-        for seq_record in SeqIO.parse(output_contigs, 'fasta'):
-            contig = {
-                'id': seq_record.id,
-                'name': seq_record.name,
-                'description': seq_record.description,
-                'length': len(seq_record.seq),
-                'sequence': str(seq_record.seq),
-                'md5': hashlib.md5(str(seq_record.seq)).hexdigest()
-            }
-            lengths.append(contig['length'])
-            contigset_data['contigs'].append(contig)
-
-
-        provenance = [{}]
-        if 'provenance' in ctx:
-            provenance = ctx['provenance']
-        # add additional info to provenance here, in this case the input data object reference
-        provenance[0]['input_ws_objects']=[params['workspace_name']+'/'+params['read_library_name']]
+        self.poller.watch(record_id, poll, on_done, on_error)
+        return {'report_name': run['report_name'], 'report_ref': '',
+                'arast_job_id': record_id, 'queue_position': 0}
 
-        # save the contigset output
-        new_obj_info = ws.save_objects({
-                'id': wsid, # set the output workspace ID
-                'objects':[
-                    {
-                        'type': 'KBaseGenomes.ContigSet',
-                        'data': contigset_data,
-                        'name': params['output_contigset_name'],
-                        'meta': {},
-                        'provenance': provenance
-                    }
-                ]
-            })
+    # retrieve the results of a finished ARAST job and save them
+    def arast_finish(self, run):
+        output = None
 
-        os.remove(tmp_data)
-        shutil.rmtree(output_dir)
+        params = run['params']
+        result = self.arast_save_contigs(run, params['output_contigset_name'])
 
         # create a Report
         report = ''
-        report += '============= Raw Contigs ============\n' + ar_report + '\n'
+        report += '============= Raw Contigs ============\n' + result['ar_report'] + '\n'
 
         report += '========== Filtered Contigs ==========\n'
         report += 'ContigSet saved to: '+params['workspace_name']+'/'+params['output_contigset_name']+'\n'
-        report += 'Assembled into '+str(len(contigset_data['contigs'])) + ' contigs.\n'
-        report += 'Average Length: '+str(sum(lengths)/float(len(lengths))) + ' bp.\n'
+        stats = result['stats']
+        report += 'Assembled into '+str(stats['contigs']) + ' contigs.\n'
+        report += 'Assembly MD5: '+result['md5'] + '\n'
+        report += 'Average Length: '+str(stats['mean_length']) + ' bp.\n'
+        report += format_stats(stats)
 
-        # compute a simple contig length distribution
-        bins = 10
-        counts, edges = np.histogram(lengths, bins)
-        report += 'Contig Length Distribution (# of contigs -- min to max basepairs):\n'
-        for c in range(bins):
-            report += '   '+str(counts[c]) + '\t--\t' + str(edges[c]) + ' to ' + str(edges[c+1]) + ' bp\n'
+        timings = run['timings']
+        report += '============== Timings ===============\n' + timings.format()
 
         print report
 
+        objects_created = [{'ref':params['workspace_name']+'/'+params['output_contigset_name'], 'description':'Assembled contigs'}]
+        provenance = timings.provenance(run['provenance'])
+        with timings.span('save_report'):
+            output = self.save_report(run, run['report_name'], report, objects_created,
+                                      provenance=provenance)
+        timings.log(run['report_name'])
+        self.observe_timings(run['assembler'], timings)
+
+        # At some point might do deeper type checking...
+        if not isinstance(output, dict):
+            raise ValueError('Method filter_contigs return value ' +
+                             'returnVal is not type dict as required.')
+        # return the results
+        return output
+
+    # download the contigs of a finished ARAST job, filter them and save
+    # them as a ContigSet named contigset_name
+    def arast_save_contigs(self, run, contigset_name):
+        assembler = run['assembler']
+        params = run['params']
+        console = run['console']
+        wsid = run['wsid']
+        arast = run['arast']
+        job_id = run['job_id']
+        provenance = run['provenance']
+        timings = run['timings']
+        min_contig_len = int(params.get('min_contig_len') or 300)
+
+        if 'results' in run:
+            output_dir = run['output_dir']
+            results = run['results']
+        else:
+            output_dir = self.make_output_dir(job_id)
+            # log, report and contigs are downloaded concurrently
+            with timings.span('download') as span:
+                results = arast.fetch_results(job_id, output_dir)
+                span['bytes'] = sum(os.path.getsize(path) for path in results.values())
+                span['records'] = len(results)
+
+        # keep the filtered contigs of a new result for the result cache
+        filtered_contigs = None
+        if self.resultCache is not None and 'results' not in run:
+            filtered_contigs = os.path.join(output_dir, 'contigs.filtered.fa')
+
+        with open(results['log']) as f:
+            ar_log = f.read()
+
+        self.log(console, ar_log)
+
+        with open(results['report']) as f:
+            ar_report = f.read()
+
+        self.log(console, "\nDONE\n")
+
+        # the ContigSet is written to disk one contig at a time and uploaded
+        # from there, so the assembly is never held in memory
+        # parse, hash and stats time is told apart from the time spent
+        # writing the ContigSet, which is everything else in this block
+        contigset_request = os.path.join(output_dir, 'contigset.json')
+        raw_size = os.path.getsize(results['contigs'])
+        with timings.span('serialize') as serialize, \
+                ContigSetWriter(contigset_request, wsid, contigset_name,
+                                contigset_id='{}.contigset'.format(assembler),
+                                source='User assembled contigs from reads in KBase',
+                                source_id='none',
+                                provenance=provenance) as contigset:
+            # short contigs are dropped as the raw assembly is read, and
+            # large assemblies may be hashed on threads
+            threads = 0
+            if raw_size >= PARALLEL_MIN_BYTES:
+                threads = self.hashThreads
+            digest = AssemblyDigest()
+            stats = AssemblyStats(genome_size=int(params.get('genome_size') or 0) or None)
+            cached = open(filtered_contigs, 'w') if filtered_contigs else None
+            with open(results['contigs']) as raw_contigs:
+                contigs = timings.iterate('parse', filter_fasta(raw_contigs, min_contig_len))
+                timings.add('parse', bytes=raw_size)
+                for contig_id, description, seq, md5 in timings.iterate('hash', md5_contigs(contigs, threads)):
+                    if cached is not None:
+                        cached.write('>' + description + '\n' + seq + '\n')
+                    contigset.add({
+                        'id': contig_id,
+                        'name': contig_id,
+                        'description': description,
+                        'length': len(seq),
+                        'sequence': seq,
+                        'md5': md5
+                    })
+                    digest.update(md5)
+                    stats.add(seq)
+            with timings.span('stats') as span:
+                summary = stats.summary()
+                span['records'] = summary['contigs']
+            contigset.meta.update(stats_metadata(summary))
+            contigset.close(md5=digest.hexdigest())
+            if cached is not None:
+                cached.close()
+            serialize['records'] = summary['contigs']
+        serialize['bytes'] = os.path.getsize(contigset_request)
+
+        # save the contigset output
+        with timings.span('save') as span:
+            new_obj_info = save_object_from_file(self.workspaceURL, run['token'], contigset_request,
+                                                 session=run['ws'].session)
+            span['bytes'] = serialize['bytes']
+            span['records'] = 1
+
+        if filtered_contigs is not None:
+            # the contigs are saved already, so a failed store must not fail the run
+            with timings.span('cache_store') as span:
+                try:
+                    self.resultCache.put(run['cache_key'], {'contigs': filtered_contigs,
+                                                            'report': results['report'],
+                                                            'log': results['log']})
+                    span['bytes'] = os.path.getsize(filtered_contigs)
+                except Exception:
+                    logger.exception('Storing result {} in the cache failed'.format(run['cache_key']))
+
+        shutil.rmtree(output_dir)
+
+        return {'assembler': assembler,
+                'contigset_name': contigset_name,
+                'ar_report': ar_report,
+                'stats': summary,
+                'md5': digest.hexdigest()}
+
+    # save a hidden KBaseReport.Report and return the method output
+    def save_report(self, run, report_name, report, objects_created, provenance=None):
         reportObj = {
-            'objects_created':[{'ref':params['workspace_name']+'/'+params['output_contigset_name'], 'description':'Assembled contigs'}],
+            'objects_created': objects_created,
             'text_message': report
         }
 
-        reportName = '{}.report.{}'.format(assembler, job_id)
-        report_obj_info = ws.save_objects({
-                'id': wsid,
+        report_obj_info = run['ws'].save_objects({
+                'id': run['wsid'],
                 'objects': [
                     {
                         'type': 'KBaseReport.Report',
                         'data': reportObj,
-                        'name': reportName,
+                        'name': report_name,
                         'meta': {},
                         'hidden': 1,
-                        'provenance': provenance
+                        'provenance': provenance or run['provenance']
                     }
                 ]
             })[0]
 
-        output = { 'report_name': reportName, 'report_ref': str(report_obj_info[6]) + '/' + str(report_obj_info[0]) + '/' + str(report_obj_info[4]) }
+        return { 'report_name': report_name, 'report_ref': str(report_obj_info[6]) + '/' + str(report_obj_info[0]) + '/' + str(report_obj_info[4]) }
 
-        # At some point might do deeper type checking...
-        if not isinstance(output, dict):
-            raise ValueError('Method filter_contigs return value ' +
-                             'returnVal is not type dict as required.')
-        # return the results
-        return output
+    # run several assemblers on one staged read library and compare them
+    def arast_run_many(self, ctx, params):
+        assemblers = params.get('assemblers') or []
+        if not assemblers:
+            raise ValueError('assemblers parameter is required')
+        unknown = [a for a in assemblers if a not in self.ASSEMBLERS]
+        if unknown:
+            raise ValueError('Unknown assemblers: {}'.format(', '.join(unknown)))
+        if len(set(assemblers)) != len(assemblers):
+            raise ValueError('Each assembler may only be requested once')
+        self.check_params(params)
+        # async CLI jobs exit as soon as we return, so they always wait
+        poll = self.submitMode == 'poll' and not ctx.get('CLI')
+
+        # the assemblers run at the same time, so take a slot for each
+        timings = Timings()
+        with timings.span('admission'):
+            ticket = self.admit(ctx, weight=len(assemblers), queue=poll)
+        if poll:
+            return self.arast_watch_many(ctx, params, assemblers, ticket, timings)
+        try:
+            staged, runs, errors = self.arast_submit_many(ctx, params, assemblers, timings)
+            results = {}
+
+            # wait for all jobs together and save each result as it finishes
+
+            def finish(run):
+                try:
+                    if run['job_id'] is not None:
+                        try:
+                            self.arast_wait(run)
+                        finally:
+                            self.arastJobs.discard(run['job_id'])
+                    results[run['assembler']] = self.arast_save_many(run)
+                except Exception as e:
+                    logger.exception('Assembler {} failed'.format(run['assembler']))
+                    errors[run['assembler']] = str(e)
+
+            threads = [threading.Thread(target=finish, args=(run,)) for run in runs]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            return self.arast_compare(params, assemblers, staged, runs, results, errors)
+        finally:
+            self.admission.release(ticket)
+
+    # stage the read library once and submit it for each assembler. An
+    # assembler that cannot be submitted fails on its own, and the jobs
+    # already submitted for the others are still seen through.
+    def arast_submit_many(self, ctx, params, assemblers, timings):
+        staged = self.arast_stage(ctx, params, 'run_assemblers', timings)
+        runs = []
+        errors = {}
+        for assembler in assemblers:
+            try:
+                run = self.arast_cached(staged, assembler)
+                if run is None:
+                    run = self.arast_submit(ctx, params, assembler, staged)
+            except Exception as e:
+                logger.exception('Submitting assembler {} failed'.format(assembler))
+                errors[assembler] = str(e)
+                continue
+            runs.append(run)
+        return staged, runs, errors
+
+    # save the contigs of one finished run of arast_run_many
+    def arast_save_many(self, run):
+        name = '{}.{}'.format(run['params']['output_contigset_name'], run['assembler'])
+        return self.arast_save_contigs(run, name)
+
+    # in poll mode, run the assemblers in the background under one id that
+    # check_assembly_job answers for. The comparative report is saved when
+    # the last of them finishes, and the slots are held until then.
+    def arast_watch_many(self, ctx, params, assemblers, ticket, timings):
+        run_id = ticket['id']
+        queued = ticket['admitted'] is None
+        self.jobStore.save({'arast_job_id': run_id,
+                            'assembler': ','.join(assemblers),
+                            'user_id': ctx.get('user_id'),
+                            'owner': self.jobStore.owner,
+                            'state': 'queued' if queued else 'running',
+                            'arast_status': '',
+                            'report_name': '',
+                            'report_ref': '',
+                            'error': ''}, run_id)
+
+        def fail(e):
+            try:
+                logger.error('Assemblers run {} failed: {}'.format(run_id, e))
+                self.jobStore.update(run_id, state='error', error=str(e))
+            finally:
+                self.admission.release(ticket)
+
+        if not queued:
+            try:
+                self.arast_start_many(ctx, params, assemblers, ticket, timings, run_id)
+            except Exception as e:
+                fail(e)
+                raise
+            return {'report_name': '', 'report_ref': '', 'arast_job_id': run_id,
+                    'queue_position': 0}
+
+        self.log(None, 'Run {} for {} queued at position {}'.format(
+            run_id, ctx.get('user_id'), ticket['position']))
+
+        def on_admitted():
+            # the wait in the queue is part of admission
+            timings.add('admission', ticket['admitted'] - ticket['queued'])
+            self.jobStore.update(run_id, state='running')
+            self.arast_start_many(ctx, params, assemblers, ticket, timings, run_id)
+
+        self.poller.watch(run_id, lambda: self.admission.poll(ticket), on_admitted, fail,
+                          delay=self.admissionPollInterval, max_delay=self.admissionPollInterval)
+        return {'report_name': '', 'report_ref': '', 'arast_job_id': run_id,
+                'queue_position': ticket['position']}
+
+    # submit the admitted runs of arast_watch_many and hand them to the poller
+    def arast_start_many(self, ctx, params, assemblers, ticket, timings, run_id):
+        staged, runs, errors = self.arast_submit_many(ctx, params, assemblers, timings)
+        results = {}
+        statuses = {}
+        lock = threading.Lock()
+        pending = [len(runs)]
+
+        def record_status(run, status):
+            with lock:
+                statuses[run['assembler']] = status
+                summary = ', '.join('{}: {}'.format(a, statuses[a])
+                                    for a in assemblers if a in statuses)
+            self.jobStore.update(run_id, arast_status=summary)
+
+        def report():
+            try:
+                self.jobStore.update(run_id, state='finishing')
+                output = self.arast_compare(params, assemblers, staged, runs, results, errors)
+                self.jobStore.update(run_id, state='done', report_name=output['report_name'],
+                                     report_ref=output['report_ref'])
+            except Exception as e:
+                logger.error('Assemblers run {} failed: {}'.format(run_id, e))
+                self.jobStore.update(run_id, state='error', error=str(e))
+            finally:
+                self.admission.release(ticket)
+
+        # the last run to finish saves the comparative report
+        def finished(run, result=None, error=None):
+            with lock:
+                if error is None:
+                    results[run['assembler']] = result
+                else:
+                    errors[run['assembler']] = error
+                pending[0] -= 1
+                if pending[0]:
+                    return
+            report()
+
+        def save(run):
+            try:
+                result = self.arast_save_many(run)
+            except Exception as e:
+                logger.exception('Assembler {} failed'.format(run['assembler']))
+                finished(run, error=str(e))
+            else:
+                finished(run, result)
+
+        def watch(run):
+            job_id = run['job_id']
+
+            def poll():
+                status = run['arast'].get_job_status(job_id)
+                self.arast_progress(run, status)
+                if status != run.get('arast_status'):
+                    run['arast_status'] = status
+                    record_status(run, status)
+                return job_done(status)
+
+            def on_done():
+                self.arastJobs.discard(job_id)
+                if job_failed(run['arast_status']):
+                    finished(run, error='ARAST job {} failed: {}'.format(job_id, run['arast_status']))
+                else:
+                    save(run)
+
+            def on_error(e):
+                self.arastJobs.discard(job_id)
+                logger.error('ARAST job {} failed: {}'.format(job_id, e))
+                finished(run, error=str(e))
+
+            self.poller.watch('{}.{}'.format(run_id, job_id), poll, on_done, on_error)
+
+        if not runs:
+            report()
+            return
+        for run in runs:
+            if run['job_id'] is None:
+                # a cached result
+                save(run)
+            else:
+                watch(run)
+
+    # save one comparative report of the finished runs of arast_run_many
+    def arast_compare(self, params, assemblers, staged, runs, results, errors):
+        if not results:
+            raise ARASTError('All assemblers failed:\n' + '\n'.join(
+                '{}: {}'.format(a, errors[a]) for a in assemblers))
+
+        # create a comparative Report
+        report = ''
+        report += '========= Assembler Comparison =========\n'
+        report += 'Assembler\tContigs\tTotal bp\tAverage bp\tLongest bp\tN50 bp\tL50\tGC %\tAssembly MD5\n'
+        for assembler in assemblers:
+            if assembler not in results:
+                report += assembler + '\tFAILED: ' + errors[assembler] + '\n'
+                continue
+            stats = results[assembler]['stats']
+            report += '\t'.join([assembler, str(stats['contigs']), str(stats['total_length']),
+                                 '{:.1f}'.format(stats['mean_length']), str(stats['largest_contig']),
+                                 str(stats.get('N50', 0)), str(stats.get('L50', 0)),
+                                 '{:.2f}'.format(stats['GC']),
+                                 results[assembler]['md5']]) + '\n'
+        for assembler in assemblers:
+            if assembler in results:
+                report += '\n============= {} Raw Contigs ============\n'.format(assembler)
+                report += results[assembler]['ar_report'] + '\n'
+
+        # each assembler's run has its own timings, from admission to save
+        provenance = staged['provenance']
+        for run in runs:
+            if run['assembler'] in results:
+                report += '\n============== {} Timings ==============\n'.format(run['assembler'])
+                report += run['timings'].format()
+                provenance = run['timings'].provenance(provenance, key='timings.' + run['assembler'])
+                run['timings'].log('{} {}'.format(params['output_contigset_name'], run['assembler']))
+                self.observe_timings(run['assembler'], run['timings'])
+
+        print report
+
+        objects_created = [{'ref': params['workspace_name']+'/'+results[a]['contigset_name'],
+                            'description': 'Assembled contigs ({})'.format(a)}
+                           for a in assemblers if a in results]
+        report_name = 'assemblers.report.' + '_'.join(run['job_id'] or run['cache_key'][:12]
+                                                      for run in runs)
+        return self.save_report(staged, report_name, report, objects_created, provenance=provenance)
 
     #END_CLASS_HEADER
 
@@ -287,9 +888,62 @@ This sample module contains multiple assembly methods:
     def __init__(self, config):
         #BEGIN_CONSTRUCTOR
         self.workspaceURL = config['workspace-url']
+        self.arastURL = config.get('arast-url', '140.221.67.209')
+        self.arastClient = config.get('arast-client', 'commands')
+        if self.arastClient not in ('commands', 'rest'):
+            raise ValueError('arast-client must be commands or rest, not ' + self.arastClient)
+        self.submitMode = config.get('arast-submit-mode', 'wait')
+        self.hashThreads = int(config.get('contig-hash-threads', 0))
         self.scratch = os.path.abspath(config['scratch'])
         if not os.path.exists(self.scratch):
             os.makedirs(self.scratch)
+        self.wsPool = WorkspacePool(self.workspaceURL,
+                                    max_age=int(config.get('workspace-session-lifetime', 300)))
+        self.readLibCache = TTLCache(maxsize=1024,
+                                     ttl=int(config.get('read-lib-cache-ttl', 600)))
+        # the owner of the runs and slots of this process; each uwsgi worker
+        # forked from here takes one of its own
+        self.owners = owners = Owners(os.path.join(self.scratch, 'owners'))
+        owners.claim()
+        owners.sweep()
+        # polled jobs are only watched in memory, so those of a worker or
+        # server that has gone away will never finish
+        self.jobStore = JobStore(os.path.join(self.scratch, 'jobs'), owners)
+        for job_id in self.jobStore.fail_orphans(self.LOST_JOB):
+            logger.warning('ARAST job {} was lost in a server restart'.format(job_id))
+        cache_size = int(config.get('result-cache-size-mb', 0)) << 20
+        if cache_size > 0:
+            self.resultCache = ResultCache(os.path.join(self.scratch, 'cache'), cache_size)
+        self.pollInitialDelay = int(config.get('arast-poll-initial-delay', 5))
+        self.pollMaxDelay = int(config.get('arast-poll-max-delay', 300))
+        self.arastWaitTimeout = int(config.get('arast-wait-timeout', DEFAULT_WAIT_TIMEOUT))
+        self.poller = JobPoller(initial_delay=self.pollInitialDelay,
+                                max_delay=self.pollMaxDelay)
+        # shared by every worker; async CLI jobs have a scratch of their own
+        self.admission = AdmissionController(
+            os.path.join(self.scratch, 'admission'), owners,
+            max_running=int(config.get('admission-max-running', 10)),
+            max_per_user=int(config.get('admission-max-per-user', 3)),
+            max_queued=int(config.get('admission-max-queued', 100)))
+        self.admissionTimeout = float(config.get('admission-timeout', 0)) or None
+        self.admissionPollInterval = float(config.get('admission-poll-interval', 5))
+        # ids of the ARAST jobs submitted and not yet finished
+        self.arastJobs = set()
+        self.metrics = Registry()
+        self.stageSeconds = self.metrics.counter(
+            'assemblyrast_stage_seconds_total',
+            'Seconds spent in each stage of finished runs.', ('assembler', 'stage'))
+        self.stageBytes = self.metrics.counter(
+            'assemblyrast_stage_bytes_total',
+            'Bytes moved by each stage of finished runs: download is the ARAST '
+            'results downloaded, save the ContigSets uploaded to the workspace.',
+            ('assembler', 'stage'))
+        self.runsFinished = self.metrics.counter(
+            'assemblyrast_runs_finished_total', 'Runs whose results were saved.', ('assembler',))
+        self.metrics.collect(self.collect_metrics)
+        self.metrics.collect(self.collect_admission_metrics, local=False)
+        self.metrics.share(os.path.join(self.scratch, 'metrics', 'runs'), owners,
+                           interval=float(config.get('metrics-flush-interval', 5)))
         #END_CONSTRUCTOR
         pass
 
@@ -372,3 +1026,42 @@ This sample module contains multiple assembly methods:
         output = self.arast_run(ctx, params, "a6")
         #END run_a6
         return [output]
+
+    def check_assembly_job(self, ctx, arast_job_id):
+        # ctx is the context object
+        # return variables are: state
+        #BEGIN check_assembly_job
+        # the jobs of a worker that was recycled or killed fail here, while
+        # admission frees their slots
+        record = self.jobStore.load_live(arast_job_id, self.LOST_JOB)
+        if record is None:
+            raise ValueError('Unknown ARAST job: {}'.format(arast_job_id))
+        if record.get('user_id') and record['user_id'] != ctx.get('user_id'):
+            raise ValueError('ARAST job {} belongs to another user'.format(arast_job_id))
+        state = dict((k, record.get(k, '')) for k in (
+            'arast_job_id', 'assembler', 'state', 'arast_status',
+            'report_name', 'report_ref', 'error'))
+        state['queue_position'] = 0
+        if state['state'] == 'queued':
+            state['queue_position'] = self.admission.position(arast_job_id) or 0
+        #END check_assembly_job
+        return [state]
+
+    def get_queue_status(self, ctx):
+        # ctx is the context object
+        # return variables are: status
+        #BEGIN get_queue_status
+        full = self.admission.status(ctx.get('user_id'))
+        status = dict((k, full[k]) for k in (
+            'running', 'queued', 'user_running', 'user_queued', 'positions',
+            'mean_wait_seconds', 'max_wait_seconds'))
+        #END get_queue_status
+        return [status]
+
+    def run_assemblers(self, ctx, params):
+        # ctx is the context object
+        # return variables are: output
+        #BEGIN run_assemblers
+        output = self.arast_run_many(ctx, params)
+        #END run_assemblers
+        return [output]
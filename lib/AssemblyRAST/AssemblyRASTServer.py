@@ -60,9 +60,45 @@ class JSONObjectEncoder(json.JSONEncoder):
 sync_methods = {}
 async_run_methods = {}
 async_check_methods = {}
-async_run_methods['AssemblyRAST.filter_contigs_async'] = ['AssemblyRAST', 'filter_contigs']
-async_check_methods['AssemblyRAST.filter_contigs_check'] = ['AssemblyRAST', 'filter_contigs']
-sync_methods['AssemblyRAST.filter_contigs'] = True
+async_run_methods['AssemblyRAST.run_kiki_async'] = ['AssemblyRAST', 'run_kiki']
+async_check_methods['AssemblyRAST.run_kiki_check'] = ['AssemblyRAST', 'run_kiki']
+sync_methods['AssemblyRAST.run_kiki'] = True
+async_run_methods['AssemblyRAST.run_velvet_async'] = ['AssemblyRAST', 'run_velvet']
+async_check_methods['AssemblyRAST.run_velvet_check'] = ['AssemblyRAST', 'run_velvet']
+sync_methods['AssemblyRAST.run_velvet'] = True
+async_run_methods['AssemblyRAST.run_miniasm_async'] = ['AssemblyRAST', 'run_miniasm']
+async_check_methods['AssemblyRAST.run_miniasm_check'] = ['AssemblyRAST', 'run_miniasm']
+sync_methods['AssemblyRAST.run_miniasm'] = True
+async_run_methods['AssemblyRAST.run_spades_async'] = ['AssemblyRAST', 'run_spades']
+async_check_methods['AssemblyRAST.run_spades_check'] = ['AssemblyRAST', 'run_spades']
+sync_methods['AssemblyRAST.run_spades'] = True
+async_run_methods['AssemblyRAST.run_idba_async'] = ['AssemblyRAST', 'run_idba']
+async_check_methods['AssemblyRAST.run_idba_check'] = ['AssemblyRAST', 'run_idba']
+sync_methods['AssemblyRAST.run_idba'] = True
+async_run_methods['AssemblyRAST.run_megahit_async'] = ['AssemblyRAST', 'run_megahit']
+async_check_methods['AssemblyRAST.run_megahit_check'] = ['AssemblyRAST', 'run_megahit']
+sync_methods['AssemblyRAST.run_megahit'] = True
+async_run_methods['AssemblyRAST.run_ray_async'] = ['AssemblyRAST', 'run_ray']
+async_check_methods['AssemblyRAST.run_ray_check'] = ['AssemblyRAST', 'run_ray']
+sync_methods['AssemblyRAST.run_ray'] = True
+async_run_methods['AssemblyRAST.run_masurca_async'] = ['AssemblyRAST', 'run_masurca']
+async_check_methods['AssemblyRAST.run_masurca_check'] = ['AssemblyRAST', 'run_masurca']
+sync_methods['AssemblyRAST.run_masurca'] = True
+async_run_methods['AssemblyRAST.run_a5_async'] = ['AssemblyRAST', 'run_a5']
+async_check_methods['AssemblyRAST.run_a5_check'] = ['AssemblyRAST', 'run_a5']
+sync_methods['AssemblyRAST.run_a5'] = True
+async_run_methods['AssemblyRAST.run_a6_async'] = ['AssemblyRAST', 'run_a6']
+async_check_methods['AssemblyRAST.run_a6_check'] = ['AssemblyRAST', 'run_a6']
+sync_methods['AssemblyRAST.run_a6'] = True
+async_run_methods['AssemblyRAST.run_assemblers_async'] = ['AssemblyRAST', 'run_assemblers']
+async_check_methods['AssemblyRAST.run_assemblers_check'] = ['AssemblyRAST', 'run_assemblers']
+sync_methods['AssemblyRAST.run_assemblers'] = True
+async_run_methods['AssemblyRAST.check_assembly_job_async'] = ['AssemblyRAST', 'check_assembly_job']
+async_check_methods['AssemblyRAST.check_assembly_job_check'] = ['AssemblyRAST', 'check_assembly_job']
+sync_methods['AssemblyRAST.check_assembly_job'] = True
+async_run_methods['AssemblyRAST.get_queue_status_async'] = ['AssemblyRAST', 'get_queue_status']
+async_check_methods['AssemblyRAST.get_queue_status_check'] = ['AssemblyRAST', 'get_queue_status']
+sync_methods['AssemblyRAST.get_queue_status'] = True
 
 class AsyncJobServiceClient(object):
 
@@ -334,10 +370,58 @@ class Application(object):
         self.serverlog.set_log_level(6)
         self.rpc_service = JSONRPCServiceCustom()
         self.method_authentication = dict()
-        self.rpc_service.add(impl_AssemblyRAST.filter_contigs,
-                             name='AssemblyRAST.filter_contigs',
+        self.rpc_service.add(impl_AssemblyRAST.run_kiki,
+                             name='AssemblyRAST.run_kiki',
                              types=[dict])
-        self.method_authentication['AssemblyRAST.filter_contigs'] = 'required'
+        self.method_authentication['AssemblyRAST.run_kiki'] = 'required'
+        self.rpc_service.add(impl_AssemblyRAST.run_velvet,
+                             name='AssemblyRAST.run_velvet',
+                             types=[dict])
+        self.method_authentication['AssemblyRAST.run_velvet'] = 'required'
+        self.rpc_service.add(impl_AssemblyRAST.run_miniasm,
+                             name='AssemblyRAST.run_miniasm',
+                             types=[dict])
+        self.method_authentication['AssemblyRAST.run_miniasm'] = 'required'
+        self.rpc_service.add(impl_AssemblyRAST.run_spades,
+                             name='AssemblyRAST.run_spades',
+                             types=[dict])
+        self.method_authentication['AssemblyRAST.run_spades'] = 'required'
+        self.rpc_service.add(impl_AssemblyRAST.run_idba,
+                             name='AssemblyRAST.run_idba',
+                             types=[dict])
+        self.method_authentication['AssemblyRAST.run_idba'] = 'required'
+        self.rpc_service.add(impl_AssemblyRAST.run_megahit,
+                             name='AssemblyRAST.run_megahit',
+                             types=[dict])
+        self.method_authentication['AssemblyRAST.run_megahit'] = 'required'
+        self.rpc_service.add(impl_AssemblyRAST.run_ray,
+                             name='AssemblyRAST.run_ray',
+                             types=[dict])
+        self.method_authentication['AssemblyRAST.run_ray'] = 'required'
+        self.rpc_service.add(impl_AssemblyRAST.run_masurca,
+                             name='AssemblyRAST.run_masurca',
+                             types=[dict])
+        self.method_authentication['AssemblyRAST.run_masurca'] = 'required'
+        self.rpc_service.add(impl_AssemblyRAST.run_a5,
+                             name='AssemblyRAST.run_a5',
+                             types=[dict])
+        self.method_authentication['AssemblyRAST.run_a5'] = 'required'
+        self.rpc_service.add(impl_AssemblyRAST.run_a6,
+                             name='AssemblyRAST.run_a6',
+                             types=[dict])
+        self.method_authentication['AssemblyRAST.run_a6'] = 'required'
+        self.rpc_service.add(impl_AssemblyRAST.run_assemblers,
+                             name='AssemblyRAST.run_assemblers',
+                             types=[dict])
+        self.method_authentication['AssemblyRAST.run_assemblers'] = 'required'
+        self.rpc_service.add(impl_AssemblyRAST.check_assembly_job,
+                             name='AssemblyRAST.check_assembly_job',
+                             types=[basestring])
+        self.method_authentication['AssemblyRAST.check_assembly_job'] = 'required'
+        self.rpc_service.add(impl_AssemblyRAST.get_queue_status,
+                             name='AssemblyRAST.get_queue_status',
+                             types=[])
+        self.method_authentication['AssemblyRAST.get_queue_status'] = 'required'
         self.auth_client = biokbase.nexus.Client(
             config={'server': 'nexus.api.globusonline.org',
                     'verify_ssl': True,
@@ -0,0 +1,313 @@
+"""
+Admission control for assembly runs.
+
+An AdmissionController limits how many runs are in flight, overall and per
+user, across every process that shares its directory: all the uwsgi
+workers of a server, each with an owner of its own. The state lives in one
+JSON file under root that is read and rewritten under an flock, so the
+limits, counters and queue positions cover the whole server rather than
+one worker. Async CLI jobs are run by the job service with a work
+directory of their own, so they do not share a server's state: each only
+counts against the limits of its own scratch.
+
+Runs over either limit can wait in a bounded queue. Waiting users are
+served in turn, round robin, so one user with many queued assemblies cannot
+hold back everyone else; each user's own runs start in the order they
+arrived. Nothing here blocks: try_acquire() admits, queues or refuses a
+run at once, and the process that queued a run calls poll() until it is
+admitted. Free slots go to the waiting runs in fair order whichever
+process queued them. Runs whose process is gone (see owners.py) are
+dropped, so a worker that dies cannot hold slots forever.
+"""
+import errno
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+from AssemblyRAST.owners import Owners
+
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionError(Exception):
+    pass
+
+
+class AdmissionController(object):
+    """
+    Admits at most max_running runs at a time, at most max_per_user of them
+    for any one user, with at most max_queued runs waiting. owners tells
+    the runs of live processes from those of dead ones; by default this
+    process gets an owner of its own under root.
+    """
+
+    def __init__(self, root, owners=None, max_running=10, max_per_user=3, max_queued=100):
+        self.root = root
+        if not os.path.exists(root):
+            os.makedirs(root)
+        self.owners = owners or Owners(root)
+        self.max_running = max_running
+        self.max_per_user = max_per_user
+        self.max_queued = max_queued
+        self._state_path = os.path.join(root, 'state.json')
+        self._lock_path = os.path.join(root, 'state.lock')
+
+    @staticmethod
+    def _empty():
+        # waiting maps user -> tickets in arrival order; turns is the order
+        # in which waiting users are served
+        return {'running': {}, 'waiting': {}, 'turns': [],
+                'admitted': 0, 'rejected': 0, 'total_wait': 0.0, 'max_wait': 0.0}
+
+    @contextmanager
+    def _state(self):
+        # a fresh descriptor per call, so threads of one process exclude
+        # each other through the flock as well. A command started meanwhile
+        # by another thread must not inherit it and hold the lock.
+        fd = os.open(self._lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.FD_CLOEXEC)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                with open(self._state_path) as f:
+                    state = json.load(f)
+            except IOError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+                state = self._empty()
+            self._sweep(state)
+            yield state
+            tmp_fd, tmp = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+            with os.fdopen(tmp_fd, 'w') as f:
+                json.dump(state, f)
+            os.rename(tmp, self._state_path)
+        finally:
+            os.close(fd)
+
+    def _sweep(self, state):
+        # drop the runs of processes that are gone
+        alive = {}
+
+        def live(ticket):
+            owner = ticket.get('owner')
+            if owner not in alive:
+                alive[owner] = self.owners.alive(owner)
+            return alive[owner]
+
+        for ticket_id, ticket in state['running'].items():
+            if not live(ticket):
+                logger.warning('Dropping run {} of {}, its process is gone'.format(
+                    ticket_id, ticket['user']))
+                del state['running'][ticket_id]
+        for user, tickets in state['waiting'].items():
+            tickets[:] = [t for t in tickets if live(t)]
+            if not tickets:
+                del state['waiting'][user]
+        state['turns'] = [u for u in state['turns'] if u in state['waiting']]
+
+    @staticmethod
+    def _running(state, user=None):
+        return sum(t['weight'] for t in state['running'].values()
+                   if user is None or t['user'] == user)
+
+    def _fits(self, state, ticket):
+        running = self._running(state)
+        user_running = self._running(state, ticket['user'])
+        return ((running == 0 or running + ticket['weight'] <= self.max_running) and
+                (user_running == 0 or user_running + ticket['weight'] <= self.max_per_user))
+
+    def _start(self, state, ticket):
+        ticket['admitted'] = time.time()
+        state['running'][ticket['id']] = ticket
+        wait = ticket['admitted'] - ticket['queued']
+        state['admitted'] += 1
+        state['total_wait'] += wait
+        state['max_wait'] = max(state['max_wait'], wait)
+
+    def _dispatch(self, state):
+        # serve the first user in turn who has a waiting run that fits, then
+        # send that user to the back of the line
+        started = True
+        while started:
+            started = False
+            for user in state['turns']:
+                tickets = state['waiting'][user]
+                if self._fits(state, tickets[0]):
+                    self._start(state, tickets.pop(0))
+                    state['turns'].remove(user)
+                    if tickets:
+                        state['turns'].append(user)
+                    else:
+                        del state['waiting'][user]
+                    started = True
+                    break
+
+    @staticmethod
+    def _remove(state, ticket_id):
+        # forget a run, returning whether it was 'running', 'waiting' or neither
+        if state['running'].pop(ticket_id, None) is not None:
+            return 'running'
+        for user, tickets in state['waiting'].items():
+            for t in tickets:
+                if t['id'] == ticket_id:
+                    tickets.remove(t)
+                    if not tickets:
+                        del state['waiting'][user]
+                        state['turns'].remove(user)
+                    return 'waiting'
+        return None
+
+    @staticmethod
+    def _order(state):
+        # the waiting runs in the order they would start if slots opened
+        # one at a time: one run per user in turn
+        order = []
+        queues = [state['waiting'][user] for user in state['turns']]
+        depth = 0
+        while queues:
+            queues = [q for q in queues if len(q) > depth]
+            order.extend(q[depth] for q in queues)
+            depth += 1
+        return order
+
+    def _position(self, state, ticket_id):
+        for i, t in enumerate(self._order(state)):
+            if t['id'] == ticket_id:
+                return i + 1
+        return None
+
+    def try_acquire(self, user, weight=1, queue=False):
+        """
+        Admit a run for user if a slot is free and return its ticket, to be
+        given to release() when the run is over. weight is the number of
+        slots the run takes. Otherwise, with queue the run waits and the
+        ticket has no 'admitted' time yet but a queue 'position', and poll()
+        tells when it has been admitted. Raises AdmissionError if no slot is
+        free and queue is false, or if the queue is full.
+        """
+        weight = max(1, min(weight, self.max_running, self.max_per_user))
+        ticket = {'id': uuid.uuid4().hex, 'user': user, 'weight': weight,
+                  'queued': time.time(), 'admitted': None, 'owner': self.owners.owner}
+        with self._state() as state:
+            state['waiting'].setdefault(user, []).append(ticket)
+            if user not in state['turns']:
+                state['turns'].append(user)
+            self._dispatch(state)
+            if ticket['id'] in state['running']:
+                return dict(ticket)
+            queued = len(self._order(state))
+            error = None
+            if not queue or queued > self.max_queued:
+                self._remove(state, ticket['id'])
+                state['rejected'] += 1
+                if queue:
+                    error = ('The assembly queue is full ({} runs waiting), '
+                             'please try again later'.format(queued - 1))
+                else:
+                    error = ('Too many assemblies are running ({} slots of {} taken, '
+                             '{} of {} for {}), please try again later'.format(
+                                 self._running(state), self.max_running,
+                                 self._running(state, user), self.max_per_user, user))
+            else:
+                ticket['position'] = self._position(state, ticket['id'])
+        # raised once the state is saved
+        if error is not None:
+            raise AdmissionError(error)
+        logger.info('Run for {} queued at position {}'.format(user, ticket['position']))
+        return dict(ticket)
+
+    def poll(self, ticket):
+        """
+        Return True once the queued ticket has been admitted, updating its
+        'admitted' time, or else its queue 'position'. Raises AdmissionError
+        if the run is neither waiting nor running any more.
+        """
+        with self._state() as state:
+            self._dispatch(state)
+            running = state['running'].get(ticket['id'])
+            if running is not None:
+                ticket['admitted'] = running['admitted']
+                return True
+            position = self._position(state, ticket['id'])
+        if position is None:
+            raise AdmissionError('Run {} for {} is no longer queued'.format(
+                ticket['id'], ticket['user']))
+        ticket['position'] = position
+        return False
+
+    def acquire(self, user, weight=1, timeout=None, log=None, interval=1.0):
+        """
+        Wait in this thread until a run for user may start and return its
+        ticket, polling every interval seconds. For processes that run one
+        assembly each, such as async CLI jobs; request threads use
+        try_acquire(). Raises AdmissionError if the queue is full or the run
+        is not admitted within timeout seconds. log, if given, is called with
+        a message when the run has to wait.
+        """
+        ticket = self.try_acquire(user, weight, queue=True)
+        if ticket['admitted'] is not None:
+            return ticket
+        message = 'Run for {} queued at position {}'.format(user, ticket['position'])
+        if log is not None:
+            log(message)
+        deadline = None if timeout is None else ticket['queued'] + timeout
+        while not self.poll(ticket):
+            if deadline is not None and time.time() >= deadline:
+                with self._state() as state:
+                    admitted = ticket['id'] in state['running']
+                    if not admitted:
+                        self._remove(state, ticket['id'])
+                        state['rejected'] += 1
+                        self._dispatch(state)
+                if not admitted:
+                    raise AdmissionError('Run for {} was not admitted within {} seconds'
+                                         .format(user, timeout))
+                # admitted just now after all, as the next poll() will say
+                continue
+            time.sleep(interval if deadline is None else
+                       max(0, min(interval, deadline - time.time())))
+        return ticket
+
+    def release(self, ticket):
+        """
+        End a run, letting waiting runs start. A run that is still queued
+        leaves the queue. Safe to call twice.
+        """
+        with self._state() as state:
+            if self._remove(state, ticket['id']) is not None:
+                self._dispatch(state)
+
+    def position(self, ticket_id):
+        """Return the queue position of a waiting run, or None."""
+        with self._state() as state:
+            return self._position(state, ticket_id)
+
+    def status(self, user=None):
+        """
+        Return the queue depth and wait time figures, and for user the
+        number of their runs in flight and waiting and the queue position
+        of each waiting run.
+        """
+        with self._state() as state:
+            now = time.time()
+            order = self._order(state)
+            admitted = state['admitted']
+            status = {'running': self._running(state),
+                      'queued': len(order),
+                      'admitted': admitted,
+                      'rejected': state['rejected'],
+                      'mean_wait_seconds': state['total_wait'] / admitted if admitted else 0.0,
+                      'max_wait_seconds': state['max_wait'],
+                      'oldest_wait_seconds': max([now - t['queued'] for t in order] or [0.0])}
+            if user is not None:
+                positions = [i + 1 for i, t in enumerate(order) if t['user'] == user]
+                status.update({'user_running': self._running(state, user),
+                               'user_queued': len(positions),
+                               'positions': positions})
+        return status
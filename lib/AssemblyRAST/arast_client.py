@@ -0,0 +1,349 @@
+"""
+Clients for the AssemblyRAST (ARAST) service.
+
+ARASTCommandClient is the default. It runs the ar-run, ar-stat and ar-get
+commands that the Docker image builds from kbase/assembly, passing the
+service URL and token to each command in its own environment instead of
+through os.environ, so concurrent runs for different users cannot pick up
+each other's token. The commands use the client library of that repo for
+every request, including the downloads.
+
+ARASTClient talks to the ARAST REST service in-process over one pooled
+requests session, saving a process per call. Its endpoints, relative to the
+ARAST base URL, are:
+
+    POST user/<user>/job/new                       submit a job
+    GET  user/<user>/job/<job_id>/status           job status string
+    GET  user/<user>/job/<job_id>/log              assembler log
+    GET  user/<user>/job/<job_id>/report           job report
+    GET  user/<user>/job/<job_id>/assemblies/auto  best assembly (FASTA)
+
+These payloads have only been checked against test/fake_arast.py, not
+against the kbase/assembly client, so ARASTClient is only used when
+arast-client = rest is configured.
+
+Once a job is done, fetch_results() downloads its log, report and contigs
+concurrently with either client.
+"""
+import json
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8000
+DEFAULT_TIMEOUT = 60
+# how long a run may take, from submission to its final status
+DEFAULT_WAIT_TIMEOUT = 2 * 24 * 3600
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class ARASTError(Exception):
+    pass
+
+
+def get_session(pool_maxsize=25):
+    """Return the process wide pooled session used by all ARAST clients."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+    return _session
+
+
+def normalize_url(url):
+    """Expand a bare ARAST host (as ar-run accepts) into a base URL."""
+    if '://' not in url:
+        url = 'http://' + url
+    scheme, rest = url.split('://', 1)
+    host, _, path = rest.partition('/')
+    if ':' not in host:
+        host = '{}:{}'.format(host, DEFAULT_PORT)
+    url = '{}://{}/{}'.format(scheme, host, path)
+    if not url.endswith('/'):
+        url += '/'
+    return url
+
+
+def user_from_token(token):
+    """Pull the user name out of a Globus Nexus style token, if present."""
+    match = re.search(r'(?:^|\|)un=([^|]+)', token or '')
+    return match.group(1) if match else None
+
+
+def job_done(status):
+    return status.startswith('Complete') or job_failed(status)
+
+
+def job_failed(status):
+    lowered = status.lower()
+    return 'fail' in lowered or 'terminated' in lowered or lowered.startswith('error')
+
+
+class _BaseClient(object):
+
+    def wait_for_job(self, job_id, interval=5, max_interval=300,
+                     timeout=DEFAULT_WAIT_TIMEOUT, on_status=None):
+        """
+        Block until the job finishes, return its final status. The status is
+        checked after interval seconds, doubling the wait after every check
+        up to max_interval, and ARASTError is raised once timeout seconds
+        pass. on_status, if given, is called with every status seen.
+        """
+        deadline = time.time() + timeout
+        while True:
+            status = self.get_job_status(job_id)
+            if on_status is not None:
+                on_status(status)
+            if job_done(status):
+                break
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise ARASTError('Timed out waiting for ARAST job {}'.format(job_id))
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 2, max_interval)
+        if job_failed(status):
+            raise ARASTError('ARAST job {} failed: {}'.format(job_id, status))
+        return status
+
+
+class ARASTCommandClient(_BaseClient):
+    """
+    Runs the kbase/assembly ar-* commands. Jobs are submitted with
+    ar-run -a <assembler> --data-json <file>, and the log, report and best
+    assembly are read with ar-get -j <job> -w and -l, -r or -p, just as
+    arast_run called them before ARASTClient existed. wait_for_job blocks
+    in ar-get -j <job> -w -l, as arast_run did, and keeps the log it
+    prints. Only the poller checks the status, with ar-stat -j <job>.
+    """
+
+    def __init__(self, url, token, user=None):
+        if token is None:
+            raise ValueError('Authentication token is required for ARAST')
+        self.url = url
+        self.user = user
+        self._env = dict(os.environ, ARAST_URL=url, KB_AUTH_TOKEN=token)
+        # logs printed by wait_for_job, for fetch_results
+        self._logs = {}
+
+    def _run(self, args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=None):
+        logger.debug('CMD: {}'.format(' '.join(args)))
+        try:
+            p = subprocess.Popen(args, stdout=stdout, stderr=stderr, env=self._env,
+                                 close_fds=True)
+        except OSError as e:
+            raise ARASTError('Could not run {}: {}'.format(args[0], e))
+        expired = []
+        timer = None
+        if timeout is not None:
+            def expire():
+                expired.append(True)
+                p.kill()
+            timer = threading.Timer(timeout, expire)
+            timer.daemon = True
+            timer.start()
+        try:
+            out, err = p.communicate()
+        finally:
+            if timer is not None:
+                timer.cancel()
+        if expired:
+            raise ARASTError('{} timed out after {} seconds'.format(' '.join(args), timeout))
+        if p.returncode != 0:
+            raise ARASTError('{} failed with return code {}: {}'.format(
+                ' '.join(args), p.returncode, (err or out or '').strip()))
+        return out
+
+    def submit_job(self, assembler, assembly_input):
+        """Submit a kbase_assembly_input for the given assembler, return the job id."""
+        fd, data_json = tempfile.mkstemp(suffix='.json')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(assembly_input, f)
+            out = self._run(['ar-run', '-a', assembler, '--data-json', data_json],
+                            stderr=subprocess.STDOUT)
+        finally:
+            os.remove(data_json)
+        logger.debug(out)
+        match = re.search(r'(\d+)', out)
+        if not match:
+            raise ARASTError('No integer job ID found: {}'.format(out))
+        return match.group(1)
+
+    def get_job_status(self, job_id):
+        return self._run(['ar-stat', '-j', str(job_id)]).strip()
+
+    def wait_for_job(self, job_id, interval=5, max_interval=300,
+                     timeout=DEFAULT_WAIT_TIMEOUT, on_status=None):
+        """
+        Block in ar-get -w until the job finishes, for at most timeout
+        seconds, and return 'Complete'; ar-get fails if the job does. The
+        intervals are not used, and on_status only sees the final status.
+        """
+        self._logs[job_id] = self._run(['ar-get', '-j', str(job_id), '-w', '-l'],
+                                       timeout=timeout)
+        status = 'Complete'
+        if on_status is not None:
+            on_status(status)
+        return status
+
+    def fetch_results(self, job_id, output_dir):
+        """
+        Write the log, report and best assembly of a finished job to files in
+        output_dir, running the three ar-get commands at the same time.
+        Returns a dict of the written paths keyed by 'log', 'report' and
+        'contigs'.
+        """
+        artifacts = {'log': ('log.txt', '-l'),
+                     'report': ('report.txt', '-r'),
+                     'contigs': ('contigs.raw.fa', '-p')}
+        paths = {}
+        errors = []
+
+        log = self._logs.pop(job_id, None)
+        if log is not None:
+            del artifacts['log']
+            paths['log'] = os.path.join(output_dir, 'log.txt')
+            with open(paths['log'], 'wb') as f:
+                f.write(log)
+
+        def fetch(name, filename, flag):
+            path = os.path.join(output_dir, filename)
+            try:
+                with open(path, 'wb') as f:
+                    self._run(['ar-get', '-j', str(job_id), '-w', flag], stdout=f)
+            except Exception as e:
+                errors.append(e)
+                return
+            paths[name] = path
+
+        threads = [threading.Thread(target=fetch, args=(name, filename, flag))
+                   for name, (filename, flag) in artifacts.items()]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if errors:
+            raise errors[0]
+        return paths
+
+
+class ARASTClient(_BaseClient):
+
+    def __init__(self, url, token, user=None, timeout=DEFAULT_TIMEOUT, session=None):
+        if token is None:
+            raise ValueError('Authentication token is required for ARAST')
+        self.url = normalize_url(url)
+        self.token = token
+        self.user = user or user_from_token(token)
+        if self.user is None:
+            raise ValueError('Could not determine the ARAST user from the token')
+        self.timeout = timeout
+        self.session = session or get_session()
+        self._headers = {'Authorization': token}
+
+    def _job_url(self, job_id, *parts):
+        return '{}user/{}/job/{}'.format(self.url, self.user, '/'.join((str(job_id),) + parts))
+
+    def _request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            resp = self.session.request(method, url, headers=self._headers, **kwargs)
+        except requests.RequestException as e:
+            raise ARASTError('ARAST request {} {} failed: {}'.format(method, url, e))
+        if resp.status_code != requests.codes.ok:
+            resp.close()
+            raise ARASTError('ARAST request {} {} returned {}: {}'.format(
+                method, url, resp.status_code, resp.text))
+        return resp
+
+    def submit_job(self, assembler, assembly_input, message=None):
+        """Submit a kbase_assembly_input for the given assembler, return the job id."""
+        data = {'pipeline': [[assembler]],
+                'kbase_assembly_input': assembly_input,
+                'message': message or 'KBase run_{}'.format(assembler)}
+        resp = self._request('POST', self._job_url('new'), data=json.dumps(data))
+        match = re.search(r'(\d+)', resp.text)
+        if not match:
+            raise ARASTError('No integer job ID found: {}'.format(resp.text))
+        return match.group(1)
+
+    def get_job_status(self, job_id):
+        return self._request('GET', self._job_url(job_id, 'status')).text.strip()
+
+    def get_job_log(self, job_id):
+        return self._request('GET', self._job_url(job_id, 'log')).text
+
+    def get_job_report(self, job_id):
+        return self._request('GET', self._job_url(job_id, 'report')).text
+
+    def get_contigs(self, job_id):
+        """Open a streaming response for the best assembly of a job."""
+        return self._request('GET', self._job_url(job_id, 'assemblies', 'auto'),
+                             stream=True, timeout=(self.timeout, None))
+
+    def _download(self, url, path, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        resp = self._request('GET', url, stream=True, timeout=(self.timeout, None))
+        nbytes = 0
+        try:
+            with open(path, 'wb') as f:
+                for chunk in resp.iter_content(chunk_size):
+                    f.write(chunk)
+                    nbytes += len(chunk)
+        finally:
+            resp.close()
+        return nbytes
+
+    def download_contigs(self, job_id, path, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        """Stream the best assembly of a job to path, return bytes written."""
+        nbytes = self._download(self._job_url(job_id, 'assemblies', 'auto'), path, chunk_size)
+        logger.debug('Downloaded {} bytes of contigs for job {}'.format(nbytes, job_id))
+        return nbytes
+
+    def fetch_results(self, job_id, output_dir, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        """
+        Download the log, report and contigs of a finished job at the same
+        time, each streamed to its own file in output_dir. Returns a dict of
+        the written paths keyed by 'log', 'report' and 'contigs'.
+        """
+        artifacts = {'log': ('log.txt', ('log',)),
+                     'report': ('report.txt', ('report',)),
+                     'contigs': ('contigs.raw.fa', ('assemblies', 'auto'))}
+        paths = {}
+        errors = []
+
+        def fetch(name, filename, parts):
+            path = os.path.join(output_dir, filename)
+            try:
+                nbytes = self._download(self._job_url(job_id, *parts), path, chunk_size)
+            except Exception as e:
+                errors.append(e)
+                return
+            logger.debug('Downloaded {} bytes of {} for job {}'.format(nbytes, name, job_id))
+            paths[name] = path
+
+        threads = [threading.Thread(target=fetch, args=(name, filename, parts))
+                   for name, (filename, parts) in artifacts.items()]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if errors:
+            raise errors[0]
+        return paths
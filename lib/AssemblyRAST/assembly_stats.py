@@ -0,0 +1,119 @@
+"""
+Assembly statistics computed as contigs stream past.
+
+An AssemblyStats is fed each contig sequence once. It keeps only the contig
+lengths, in a compact integer array, and a running count of every base
+value: sequences are gathered into blocks of a few megabytes and counted
+with one numpy bincount per block. summary() then derives everything from
+the sorted lengths with vectorized numpy operations:
+
+    contigs, total_length, largest_contig, mean_length, median_length
+    N50, L50, N90, L90, and NG50/LG50 when a genome size is given
+    GC (percent of A, C, G and T bases), N_count
+    size_classes: number and total length of contigs at least as long as
+                  each of SIZE_CLASSES, the cumulative length curve
+"""
+import array
+
+import numpy as np
+
+
+SIZE_CLASSES = (0, 500, 1000, 2000, 5000, 10000, 25000, 50000, 100000, 250000, 1000000)
+
+BLOCK_BYTES = 4 << 20
+
+_GC = np.array([ord(b) for b in 'GCgc'])
+_ACGT = np.array([ord(b) for b in 'ACGTacgt'])
+_N = np.array([ord(b) for b in 'Nn'])
+
+
+class AssemblyStats(object):
+
+    def __init__(self, genome_size=None, block_bytes=BLOCK_BYTES):
+        self.genome_size = genome_size
+        self.block_bytes = block_bytes
+        self.lengths = array.array('l')
+        self._bases = np.zeros(256, dtype=np.int64)
+        self._block = []
+        self._block_bytes = 0
+
+    def add(self, seq):
+        self.lengths.append(len(seq))
+        self._block.append(seq)
+        self._block_bytes += len(seq)
+        if self._block_bytes >= self.block_bytes:
+            self._count_block()
+
+    def _count_block(self):
+        if self._block:
+            block = np.frombuffer(''.join(self._block), dtype=np.uint8)
+            self._bases += np.bincount(block, minlength=256)
+        self._block = []
+        self._block_bytes = 0
+
+    def summary(self):
+        """Return the statistics of the contigs added so far as a dict."""
+        self._count_block()
+        lengths = np.sort(np.frombuffer(self.lengths, dtype=self.lengths.typecode)
+                          if self.lengths else np.zeros(0, dtype=np.int64))
+        count = len(lengths)
+        total = int(lengths.sum())
+        acgt = int(self._bases[_ACGT].sum())
+        stats = {'contigs': count,
+                 'total_length': total,
+                 'largest_contig': int(lengths[-1]) if count else 0,
+                 'mean_length': total / float(count) if count else 0.0,
+                 'median_length': float(np.median(lengths)) if count else 0.0,
+                 'GC': 100.0 * self._bases[_GC].sum() / acgt if acgt else 0.0,
+                 'N_count': int(self._bases[_N].sum())}
+
+        # longest first, with the running total of bases
+        descending = lengths[::-1]
+        cumulative = np.cumsum(descending)
+        for name, fraction, base in (('50', 0.5, total), ('90', 0.9, total),
+                                     ('G50', 0.5, self.genome_size)):
+            if not base:
+                continue
+            index = int(np.searchsorted(cumulative, fraction * base))
+            if index < count:
+                stats['N' + name] = int(descending[index])
+                stats['L' + name] = index + 1
+            else:
+                # the assembly is too small to reach the target
+                stats['N' + name] = stats['L' + name] = 0
+
+        # contigs at least as long as each size class, and their total length
+        starts = np.searchsorted(lengths, SIZE_CLASSES, side='left')
+        ascending_total = np.concatenate([[0], np.cumsum(lengths)])
+        stats['size_classes'] = [
+            {'min_length': size, 'contigs': int(count - start),
+             'total_length': int(total - ascending_total[start])}
+            for size, start in zip(SIZE_CLASSES, starts)]
+        return stats
+
+
+def format_stats(stats):
+    """Render a summary() as report text."""
+    lines = ['Total length: {} bp in {} contigs.'.format(stats['total_length'], stats['contigs']),
+             'Largest contig: {} bp. Median length: {:.0f} bp.'.format(
+                 stats['largest_contig'], stats['median_length']),
+             'N50: {} bp (L50: {}). N90: {} bp (L90: {}).'.format(
+                 stats.get('N50', 0), stats.get('L50', 0), stats.get('N90', 0), stats.get('L90', 0))]
+    if 'NG50' in stats:
+        lines.append('NG50: {} bp (LG50: {}).'.format(stats['NG50'], stats['LG50']))
+    lines.append('GC: {:.2f}%. Ns: {}.'.format(stats['GC'], stats['N_count']))
+    lines.append('Contigs by size (# of contigs -- total bp -- min length):')
+    for size_class in stats['size_classes']:
+        if size_class['contigs']:
+            lines.append('   {}\t--\t{}\t--\t>= {} bp'.format(
+                size_class['contigs'], size_class['total_length'], size_class['min_length']))
+    return '\n'.join(lines) + '\n'
+
+
+def stats_metadata(stats):
+    """Pick the headline statistics out of a summary() as workspace object metadata."""
+    keys = ('contigs', 'total_length', 'largest_contig', 'N50', 'L50', 'N90', 'L90',
+            'NG50', 'LG50', 'N_count')
+    meta = dict((key, str(stats[key])) for key in keys if key in stats)
+    meta['GC'] = '{:.2f}'.format(stats['GC'])
+    return meta
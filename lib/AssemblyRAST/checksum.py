@@ -0,0 +1,90 @@
+"""
+Contig and assembly checksums.
+
+Each contig is identified by the md5 of its sequence. The assembly as a
+whole is identified by an AssemblyDigest: the per-contig md5s read as
+128-bit integers and summed modulo 2**128. The sum does not depend on the
+order of the contigs and can be built up as they stream past, so it serves
+as a stable key for an assembly however it was produced.
+
+For large assemblies md5_contigs() can hash on a thread pool. hashlib
+releases the GIL while it hashes a large buffer, so the threads hash one
+bounded batch of contigs while the caller parses the next, without copying
+the sequences to other processes. Only two batches are held at a time.
+"""
+import hashlib
+from multiprocessing.pool import ThreadPool
+
+
+PARALLEL_MIN_BYTES = 256 << 20
+BATCH_BYTES = 64 << 20
+
+_MASK = (1 << 128) - 1
+
+
+class AssemblyDigest(object):
+    """Order independent digest of a set of contig md5s."""
+
+    def __init__(self):
+        self._sum = 0
+        self.count = 0
+
+    def update(self, contig_md5):
+        self._sum = (self._sum + int(contig_md5, 16)) & _MASK
+        self.count += 1
+
+    def hexdigest(self):
+        return '%032x' % self._sum
+
+
+def _md5(seq):
+    return hashlib.md5(seq).hexdigest()
+
+
+def _batches(records, batch_bytes):
+    batch = []
+    nbytes = 0
+    for record in records:
+        batch.append(record)
+        nbytes += len(record[2])
+        if nbytes >= batch_bytes:
+            yield batch
+            batch = []
+            nbytes = 0
+    if batch:
+        yield batch
+
+
+def md5_contigs(records, threads=0, batch_bytes=BATCH_BYTES):
+    """
+    Yield (id, description, sequence, md5) for each (id, description,
+    sequence) record, in order. With threads > 0 the hashing runs on a pool
+    of that many threads, one batch of at most about batch_bytes of
+    sequence at a time, while the next batch is read from records.
+    """
+    if threads <= 0:
+        for contig_id, description, seq in records:
+            yield contig_id, description, seq, _md5(seq)
+        return
+
+    pool = ThreadPool(threads)
+    try:
+        pending = None
+        for batch in _batches(records, batch_bytes):
+            chunksize = max(len(batch) // (threads * 4), 1)
+            hashing = (batch, pool.map_async(_md5, [record[2] for record in batch], chunksize))
+            if pending is not None:
+                for item in _results(*pending):
+                    yield item
+            pending = hashing
+        if pending is not None:
+            for item in _results(*pending):
+                yield item
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _results(batch, md5s):
+    for (contig_id, description, seq), md5 in zip(batch, md5s.get()):
+        yield contig_id, description, seq, md5
@@ -0,0 +1,59 @@
+"""
+The AssemblyRAST client, with the transport options the service supports.
+
+AssemblyRASTClient.py is generated by kb-sdk compile and rewritten on every
+build. AssemblyRAST here extends the generated client, so it has a method
+for each function of the spec, encodes and decodes with json_codec, and
+sends request bodies of at least compress_min_size bytes gzipped; gzip or
+deflate responses are inflated by requests.
+"""
+import random as _random
+
+import requests as _requests
+
+from AssemblyRAST import AssemblyRASTClient as generated
+from AssemblyRAST.AssemblyRASTClient import ServerError, _CT, _AJ
+from AssemblyRAST import compression
+from AssemblyRAST import json_codec
+
+
+class AssemblyRAST(generated.AssemblyRAST):
+
+    def __init__(self, *args, **kwargs):
+        # off by default, for servers that do not accept compressed requests
+        self.compress_min_size = kwargs.pop('compress_min_size', None)
+        generated.AssemblyRAST.__init__(self, *args, **kwargs)
+
+    def _call(self, method, params, json_rpc_context = None):
+        arg_hash = {'method': method,
+                    'params': params,
+                    'version': '1.1',
+                    'id': str(_random.random())[2:]
+                    }
+        if json_rpc_context:
+            arg_hash['context'] = json_rpc_context
+
+        body = json_codec.dumps(arg_hash)
+        headers = self._headers
+        if self.compress_min_size and len(body) >= self.compress_min_size:
+            body = compression.compress(body)
+            headers = dict(headers, **{'Content-Encoding': 'gzip'})
+        ret = _requests.post(self.url, data=body, headers=headers,
+                             timeout=self.timeout,
+                             verify=not self.trust_all_ssl_certificates)
+        if ret.status_code == _requests.codes.server_error:
+            if _CT in ret.headers and ret.headers[_CT] == _AJ:
+                err = json_codec.loads(ret.text)
+                if 'error' in err:
+                    raise ServerError(**err['error'])
+                else:
+                    raise ServerError('Unknown', 0, ret.text)
+            else:
+                raise ServerError('Unknown', 0, ret.text)
+        if ret.status_code != _requests.codes.OK:
+            ret.raise_for_status()
+        ret.encoding = 'utf-8'
+        resp = json_codec.loads(ret.text)
+        if 'result' not in resp:
+            raise ServerError('Unknown', 0, 'An unknown server error occurred')
+        return resp['result']
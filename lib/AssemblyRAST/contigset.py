@@ -0,0 +1,106 @@
+"""
+Streaming KBaseGenomes.ContigSet serialization and workspace upload.
+
+A ContigSetWriter writes the ContigSet JSON to disk one contig at a time,
+wrapped in a complete Workspace.save_objects JSON-RPC request. The request
+file is then posted to the workspace as a streamed upload, so neither the
+sequences nor the serialized object ever have to be held in memory.
+The object metadata is written after the data, so it can describe
+contigs that were only seen as they were added.
+"""
+import json
+import random
+from collections import OrderedDict
+
+import requests
+
+from biokbase.workspace.client import ServerError
+
+
+_PLACEHOLDER = '__contigset_data__'
+_META_PLACEHOLDER = '__contigset_meta__'
+
+
+class ContigSetWriter(object):
+    """
+    Writes a save_objects request for one ContigSet to path. Call add() for
+    each contig, then close() before uploading with save_object_from_file().
+    The meta dict may be updated until close().
+    """
+
+    def __init__(self, path, wsid, name, contigset_id, source, source_id,
+                 provenance, meta=None):
+        request = {
+            'method': 'Workspace.save_objects',
+            'version': '1.1',
+            'id': str(random.random())[2:],
+            'params': [{
+                'id': wsid,
+                'objects': [OrderedDict([
+                    ('type', 'KBaseGenomes.ContigSet'),
+                    ('name', name),
+                    ('provenance', provenance),
+                    ('data', _PLACEHOLDER),
+                    ('meta', _META_PLACEHOLDER)
+                ])]
+            }]
+        }
+        self._prefix, rest = json.dumps(request).split(json.dumps(_PLACEHOLDER))
+        self._middle, self._suffix = rest.split(json.dumps(_META_PLACEHOLDER))
+        self.meta = dict(meta or {})
+        self.path = path
+        self.count = 0
+        self._f = open(path, 'w')
+        self._f.write(self._prefix)
+        self._f.write('{"id": %s, "source": %s, "source_id": %s, "contigs": [' % (
+            json.dumps(contigset_id), json.dumps(source), json.dumps(source_id)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if not self._f.closed:
+            self._f.close()
+
+    def add(self, contig):
+        """Append one contig dict to the ContigSet."""
+        if self.count:
+            self._f.write(', ')
+        # json.dump would encode in pure Python, one small write per token
+        self._f.write(json.dumps(contig))
+        self.count += 1
+
+    def close(self, **fields):
+        """Finish the ContigSet, adding any extra top level fields given."""
+        self._f.write(']')
+        for key, value in sorted(fields.items()):
+            self._f.write(', %s: %s' % (json.dumps(key), json.dumps(value)))
+        self._f.write('}')
+        self._f.write(self._middle)
+        json.dump(self.meta, self._f)
+        self._f.write(self._suffix)
+        self._f.close()
+
+
+def save_object_from_file(url, token, path, timeout=30 * 60, session=None):
+    """
+    Post a save_objects request written by ContigSetWriter to the
+    workspace at url, streaming the body from disk. Returns the object info
+    list of the saved object.
+    """
+    with open(path, 'rb') as body:
+        ret = (session or requests).post(url, data=body, timeout=timeout,
+                                         headers={'AUTHORIZATION': token,
+                                                  'content-type': 'application/json'})
+    if ret.status_code == requests.codes.server_error:
+        if ret.headers.get('content-type') == 'application/json':
+            err = json.loads(ret.text)
+            if 'error' in err:
+                raise ServerError(**err['error'])
+        raise ServerError('Unknown', 0, ret.text)
+    if ret.status_code != requests.codes.OK:
+        ret.raise_for_status()
+    resp = json.loads(ret.text)
+    if 'result' not in resp:
+        raise ServerError('Unknown', 0, 'An unknown server error occurred')
+    return resp['result'][0][0]
@@ -0,0 +1,329 @@
+"""
+A single event loop HTTP server for the WSGI Application.
+
+The wsgiref server started by start_server, like uwsgi's threads, gives
+every connection a thread of its own for as long as it is open, including
+the time spent reading a slow request body or waiting on an idle keep-alive
+connection. EventServer instead keeps all connections in one asyncore loop,
+which reads each request in full without blocking. Only then is the
+application called, on one of a fixed number of worker threads, and the
+response is handed back to the loop to be written out.
+
+So a thread is only taken while the application runs. Once more than
+max_pending requests are running or waiting for a worker, new requests
+are answered with 503 straight from the loop instead of queueing without
+bound. Long ARAST runs are best left to the JobPoller
+(arast-submit-mode = poll), whose single thread waits on every submitted
+job; in wait mode a synchronous run holds its worker until the job is done.
+
+The service runs on Python 2.7, which has no asyncio, so the loop is built
+on the standard library's asyncore and asynchat rather than on trollius.
+server.py starts it with --event-loop.
+"""
+import Queue
+import asynchat
+import asyncore
+import errno
+import logging
+import socket
+import sys
+import threading
+import time
+import traceback
+from StringIO import StringIO
+from multiprocessing.pool import ThreadPool
+
+
+logger = logging.getLogger(__name__)
+
+STATUS_TEXT = {400: 'Bad Request', 408: 'Request Timeout', 411: 'Length Required',
+               413: 'Request Entity Too Large', 500: 'Internal Server Error',
+               503: 'Service Unavailable'}
+
+
+class _Waker(asyncore.dispatcher):
+    """Wakes the loop from worker threads through a socket pair."""
+
+    def __init__(self, server, sockets):
+        self.server = server
+        self._lock = threading.Lock()
+        self._signalled = False
+        self._read, self._write = socket.socketpair()
+        asyncore.dispatcher.__init__(self, self._read, map=sockets)
+
+    def wake(self):
+        with self._lock:
+            if self._signalled:
+                return
+            self._signalled = True
+        try:
+            self._write.send('x')
+        except socket.error:
+            pass
+
+    def writable(self):
+        return False
+
+    def handle_read(self):
+        with self._lock:
+            self._signalled = False
+            try:
+                self.recv(4096)
+            except socket.error:
+                pass
+        self.server.deliver()
+
+    def handle_close(self):
+        pass
+
+    def close(self):
+        asyncore.dispatcher.close(self)
+        self._write.close()
+
+
+class _Connection(asynchat.async_chat):
+    """One client connection: reads requests and writes the responses back."""
+
+    max_header_size = 64 * 1024
+
+    def __init__(self, server, sock, address, sockets):
+        asynchat.async_chat.__init__(self, sock, map=sockets)
+        self.server = server
+        self.address = address
+        self.last_activity = time.time()
+        self._reset()
+
+    def _reset(self):
+        self._data = []
+        self._size = 0
+        self._environ = None
+        self.running = False
+        self.reading = False
+        self.set_terminator('\r\n\r\n')
+
+    def collect_incoming_data(self, data):
+        if self.running:
+            # the rest of a refused request
+            return
+        self.last_activity = time.time()
+        self.reading = True
+        self._data.append(data)
+        self._size += len(data)
+        if self._environ is None and self._size > self.max_header_size:
+            self.error(400, 'Request headers too large')
+
+    def found_terminator(self):
+        data = ''.join(self._data)
+        self._data = []
+        self._size = 0
+        if self._environ is None:
+            self._headers_read(data)
+        else:
+            self._run(data)
+
+    def _headers_read(self, data):
+        lines = data.lstrip('\r\n').split('\r\n')
+        try:
+            method, target, version = lines[0].split(' ', 2)
+        except ValueError:
+            return self.error(400, 'Malformed request line')
+        path, _, query = target.partition('?')
+        environ = self.server.base_environ(self.address)
+        environ.update({'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': query,
+                        'SERVER_PROTOCOL': version})
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            name = name.strip().upper().replace('-', '_')
+            value = value.strip()
+            if name in ('CONTENT_LENGTH', 'CONTENT_TYPE'):
+                environ[name] = value
+            else:
+                key = 'HTTP_' + name
+                environ[key] = environ[key] + ',' + value if key in environ else value
+        self._environ = environ
+        if environ.get('HTTP_TRANSFER_ENCODING', '').lower() == 'chunked':
+            return self.error(411, 'Chunked request bodies are not supported')
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return self.error(400, 'Malformed Content-Length')
+        if length > self.server.max_request_size:
+            return self.error(413, 'Request body of %d bytes exceeds the limit of %d bytes' %
+                              (length, self.server.max_request_size))
+        if length > 0:
+            self.set_terminator(length)
+        else:
+            self._run('')
+
+    def _run(self, body):
+        environ = self._environ
+        environ['wsgi.input'] = StringIO(body)
+        self.running = True
+        self.reading = False
+        # no more requests are read until this one is answered
+        self.set_terminator(None)
+        self.server.submit(self, environ)
+
+    def readable(self):
+        return not self.running and asynchat.async_chat.readable(self)
+
+    def keep_alive(self):
+        environ = self._environ or {}
+        connection = environ.get('HTTP_CONNECTION', '').lower()
+        if environ.get('SERVER_PROTOCOL') == 'HTTP/1.1':
+            return connection != 'close'
+        return connection == 'keep-alive'
+
+    def respond(self, status, headers, body, keep_alive=True):
+        """Write a response out; called on the loop thread."""
+        keep_alive = keep_alive and self.keep_alive()
+        names = set(name.lower() for name, _ in headers)
+        if 'content-length' not in names:
+            headers = headers + [('Content-Length', str(len(body)))]
+        headers = headers + [('Connection', 'keep-alive' if keep_alive else 'close')]
+        head = ['HTTP/1.1 ' + status] + ['{}: {}'.format(k, v) for k, v in headers]
+        self.push('\r\n'.join(head) + '\r\n\r\n' + body)
+        self.last_activity = time.time()
+        if keep_alive:
+            self._reset()
+        else:
+            self.close_when_done()
+            self.running = True
+            self.set_terminator(None)
+
+    def error(self, code, message):
+        self.respond('{} {}'.format(code, STATUS_TEXT[code]),
+                     [('Content-Type', 'text/plain')], message + '\n', keep_alive=False)
+
+    def handle_error(self):
+        logger.error('Connection from {} failed:\n{}'.format(self.address, traceback.format_exc()))
+        self.close()
+
+
+class EventServer(asyncore.dispatcher):
+    """
+    Serve application from one event loop thread and workers worker threads.
+
+    Requests with bodies over max_request_size bytes are refused before they
+    are read, and connections that do not send a complete request within
+    read_timeout seconds, or stay idle that long between requests, are
+    closed.
+    """
+
+    def __init__(self, application, host='localhost', port=0, workers=10,
+                 max_pending=1000, max_request_size=16 << 20, read_timeout=60):
+        self.sockets = {}
+        asyncore.dispatcher.__init__(self, map=self.sockets)
+        self.application = application
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_request_size = max_request_size
+        self.read_timeout = read_timeout
+        self.pending = 0
+        self.served = 0
+        self.rejected = 0
+        # started by serve_forever, so the server can be forked before it runs
+        self._executor = None
+        self._done = Queue.Queue()
+        self._waker = _Waker(self, self.sockets)
+        self._stopped = threading.Event()
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind((host, port))
+        self.listen(1024)
+        self.server_name = host
+        self.server_port = self.socket.getsockname()[1]
+
+    def base_environ(self, address):
+        return {'SERVER_NAME': self.server_name,
+                'SERVER_PORT': str(self.server_port),
+                'REMOTE_ADDR': address[0],
+                'SCRIPT_NAME': '',
+                'wsgi.version': (1, 0),
+                'wsgi.url_scheme': 'http',
+                'wsgi.errors': sys.stderr,
+                'wsgi.multithread': True,
+                'wsgi.multiprocess': False,
+                'wsgi.run_once': False}
+
+    def handle_accept(self):
+        try:
+            pair = self.accept()
+        except socket.error as e:
+            if e.args[0] in (errno.EMFILE, errno.ENFILE):
+                logger.error('Out of file descriptors, not accepting connections')
+                return
+            raise
+        if pair is not None:
+            sock, address = pair
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            _Connection(self, sock, address, self.sockets)
+
+    def submit(self, connection, environ):
+        """Queue a request for a worker; called on the loop thread."""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            return connection.error(503, 'Server busy, try again later')
+        self.pending += 1
+        self._executor.apply_async(self._call, (connection, environ))
+
+    def _call(self, connection, environ):
+        # on a worker thread
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [status, list(headers)]
+
+        try:
+            result = self.application(environ, start_response)
+            try:
+                body = ''.join(result)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+            response = (started[0], started[1], body)
+        except Exception:
+            logger.error('Request failed:\n' + traceback.format_exc())
+            response = ('500 Internal Server Error', [('Content-Type', 'text/plain')],
+                        'Internal Server Error\n')
+        self._done.put((connection, response))
+        self._waker.wake()
+
+    def deliver(self):
+        """Write out the responses the workers finished; called on the loop thread."""
+        while True:
+            try:
+                connection, (status, headers, body) = self._done.get_nowait()
+            except Queue.Empty:
+                return
+            self.pending -= 1
+            self.served += 1
+            if connection.connected:
+                connection.respond(status, headers, body)
+
+    def close_stale(self):
+        deadline = time.time() - self.read_timeout
+        for connection in self.sockets.values():
+            if (isinstance(connection, _Connection) and not connection.running and
+                    connection.last_activity < deadline):
+                if connection.reading:
+                    connection.error(408, 'Request not received within %g seconds' %
+                                     self.read_timeout)
+                else:
+                    connection.close()
+
+    def serve_forever(self, poll_interval=1.0):
+        self._executor = ThreadPool(self.workers)
+        last_check = time.time()
+        while not self._stopped.is_set():
+            asyncore.loop(timeout=poll_interval, map=self.sockets, count=1)
+            if time.time() - last_check >= min(poll_interval, self.read_timeout):
+                self.close_stale()
+                last_check = time.time()
+        for connection in self.sockets.values():
+            connection.close()
+        self._executor.terminate()
+
+    def shutdown(self):
+        self._stopped.set()
+        self._waker.wake()
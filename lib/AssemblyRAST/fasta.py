@@ -0,0 +1,69 @@
+"""
+Streaming FASTA helpers for contig ingestion.
+
+Contigs are read from an open file in large blocks and yielded one record
+at a time, so an assembly never has to be held in memory or copied through
+external filter processes. Records are cut out of each block with str.find
+rather than line by line, and no per-record objects are built beyond the
+id, description and sequence strings themselves.
+"""
+
+READ_BLOCK_SIZE = 4 << 20
+
+_SEQ_WHITESPACE = ' \t\r\n'
+
+
+def _record(buf, start, end):
+    header_end = buf.find('\n', start, end)
+    if header_end < 0:
+        header_end = end
+    description = buf[start + 1:header_end].rstrip('\r')
+    fields = description.split(None, 1)
+    contig_id = fields[0] if fields else ''
+    seq = buf[header_end + 1:end].translate(None, _SEQ_WHITESPACE)
+    return contig_id, description, seq
+
+
+def read_fasta(f, block_size=READ_BLOCK_SIZE):
+    """
+    Yield (id, description, sequence) for each record of a FASTA file
+    object. description is the header line without the leading '>', and id
+    is its first word.
+    """
+    buf = ''
+    while True:
+        block = f.read(block_size)
+        if not block:
+            return
+        buf += block
+        start = buf.find('>')
+        if start >= 0:
+            break
+        buf = ''
+    buf = buf[start:]
+
+    pos = 0
+    scan = 0
+    while True:
+        nxt = buf.find('\n>', scan)
+        if nxt >= 0:
+            yield _record(buf, pos, nxt)
+            pos = scan = nxt + 1
+            continue
+        block = f.read(block_size)
+        if not block:
+            break
+        # keep the unfinished record and only rescan its last byte, so one
+        # huge contig spanning many blocks is not searched repeatedly
+        buf = buf[pos:] + block
+        scan = max(len(buf) - len(block) - 1, 0)
+        pos = 0
+    if pos < len(buf):
+        yield _record(buf, pos, len(buf))
+
+
+def filter_fasta(f, min_len, block_size=READ_BLOCK_SIZE):
+    """Yield the (id, description, sequence) records of f at least min_len bases long."""
+    for record in read_fasta(f, block_size):
+        if len(record[2]) >= min_len:
+            yield record
@@ -0,0 +1,229 @@
+"""
+Background polling of submitted ARAST jobs.
+
+A JobPoller owns a single thread that checks every watched job with capped
+exponential backoff, so a pending assembly costs no server thread while it
+runs. Finished jobs are handed to a small pool of finisher threads that
+run the post-processing callback.
+
+Job state is recorded on disk by a JobStore so that any server process can
+answer status requests, not only the one holding the poller. Watched jobs
+themselves live only in the memory of the process polling them, so each
+record names the owner (see owners.py) of the process that wrote it.
+That lets any process tell the jobs lost with a worker that was recycled
+or killed, or with a restarted server, from those a live process is still
+polling.
+"""
+import Queue
+import heapq
+import itertools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from AssemblyRAST.owners import Owners
+
+
+logger = logging.getLogger(__name__)
+
+
+class JobStore(object):
+    """
+    Keeps one JSON state record per job id under a directory. Records are
+    normally keyed by their ARAST job id; a run still waiting for an
+    admission slot has no such id yet and is saved under one of its own.
+    """
+
+    UNFINISHED = ('queued', 'running', 'finishing')
+
+    def __init__(self, root, owners=None):
+        self.root = root
+        if not os.path.exists(root):
+            os.makedirs(root)
+        self.owners = owners or Owners(root)
+
+    @property
+    def owner(self):
+        return self.owners.owner
+
+    def _path(self, job_id):
+        return os.path.join(self.root, '{}.json'.format(job_id))
+
+    def claim(self):
+        """Hold the lock that shows the jobs of this store are being watched."""
+        self.owners.claim()
+
+    def save(self, record, job_id=None):
+        record['updated'] = int(time.time())
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(record, f)
+        os.rename(tmp, self._path(job_id or record['arast_job_id']))
+
+    def load(self, job_id):
+        try:
+            with open(self._path(job_id)) as f:
+                return json.load(f)
+        except IOError:
+            return None
+
+    def update(self, job_id, **fields):
+        record = self.load(job_id) or {'arast_job_id': job_id}
+        record.update(fields)
+        self.save(record, job_id)
+        return record
+
+    def records(self):
+        """Yield (job_id, record) for every stored job."""
+        for name in os.listdir(self.root):
+            if name.endswith('.json'):
+                job_id = name[:-len('.json')]
+                record = self.load(job_id)
+                if record is not None:
+                    yield job_id, record
+
+    def load_live(self, job_id, error):
+        """
+        Load a job, first marking it failed with error if it is unfinished
+        and the process that was watching it is gone.
+        """
+        record = self.load(job_id)
+        if (record is not None and record.get('state') in self.UNFINISHED
+                and not self.owners.alive(record.get('owner'))):
+            record.update(state='error', error=error)
+            self.save(record, job_id)
+        return record
+
+    def fail_orphans(self, error):
+        """
+        Mark the unfinished jobs whose owner is gone as failed with error and
+        return their ids.
+        """
+        failed = []
+        gone = set()
+        for job_id, record in self.records():
+            owner = record.get('owner')
+            if record.get('state') not in self.UNFINISHED:
+                continue
+            if owner not in gone:
+                if self.owners.alive(owner):
+                    continue
+                gone.add(owner)
+            record.update(state='error', error=error)
+            self.save(record, job_id)
+            failed.append(job_id)
+        for owner in gone:
+            if owner is not None:
+                self.owners.forget(owner)
+        return failed
+
+
+class JobPoller(object):
+    """
+    Polls watched jobs from one background thread.
+
+    poll() is called for each job until it returns True, waiting
+    initial_delay seconds before the first check and multiplying the wait by
+    backoff after every unfinished check, up to max_delay. A job whose poll()
+    raises max_errors times in a row is given up on.
+    """
+
+    def __init__(self, initial_delay=5, max_delay=300, backoff=2.0,
+                 max_errors=5, finishers=2):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.max_errors = max_errors
+        self.finishers = finishers
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._finish_queue = Queue.Queue()
+        self._started = False
+
+    def __len__(self):
+        with self._cond:
+            return len(self._heap)
+
+    def _start(self):
+        if self._started:
+            return
+        self._started = True
+        threads = [threading.Thread(target=self._poll_loop, name='arast-poller')]
+        for i in range(self.finishers):
+            threads.append(threading.Thread(target=self._finish_loop,
+                                            name='arast-finisher-{}'.format(i)))
+        for t in threads:
+            t.daemon = True
+            t.start()
+
+    def watch(self, job_id, poll, on_done, on_error, delay=None, max_delay=None):
+        """
+        Start watching a job. on_done() is called once poll() returns True;
+        on_error(exc) is called if polling or on_done fails. delay and
+        max_delay override the poller's initial_delay and max_delay for this
+        job.
+        """
+        delay = self.initial_delay if delay is None else delay
+        job = {'job_id': job_id, 'poll': poll, 'on_done': on_done,
+               'on_error': on_error, 'delay': delay, 'errors': 0,
+               'max_delay': self.max_delay if max_delay is None else max_delay}
+        with self._cond:
+            self._start()
+            self._push(job, delay)
+
+    def _push(self, job, delay):
+        heapq.heappush(self._heap, (time.time() + delay, next(self._counter), job))
+        self._cond.notify()
+
+    def _next_due(self):
+        with self._cond:
+            while True:
+                if self._heap:
+                    wait = self._heap[0][0] - time.time()
+                    if wait <= 0:
+                        return heapq.heappop(self._heap)[2]
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+
+    def _poll_loop(self):
+        while True:
+            job = self._next_due()
+            try:
+                done = job['poll']()
+                job['errors'] = 0
+            except Exception as e:
+                job['errors'] += 1
+                logger.warning('Polling job {} failed ({} in a row): {}'.format(
+                    job['job_id'], job['errors'], e))
+                if job['errors'] >= self.max_errors:
+                    self._finish_queue.put((job, e))
+                    continue
+                done = False
+            if done:
+                self._finish_queue.put((job, None))
+                continue
+            job['delay'] = min(job['delay'] * self.backoff, job['max_delay'])
+            with self._cond:
+                self._push(job, job['delay'])
+
+    def _finish_loop(self):
+        while True:
+            job, error = self._finish_queue.get()
+            try:
+                if error is None:
+                    job['on_done']()
+                else:
+                    job['on_error'](error)
+            except Exception as e:
+                logger.exception('Finishing job {} failed'.format(job['job_id']))
+                if error is None:
+                    # a failing error handler must not take the thread down
+                    try:
+                        job['on_error'](e)
+                    except Exception:
+                        logger.exception('Error handler of job {} failed'.format(job['job_id']))
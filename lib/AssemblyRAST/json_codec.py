@@ -0,0 +1,85 @@
+"""
+JSON encoding and decoding for the JSON-RPC server and client.
+
+Decoding uses the fastest C decoder installed: ujson, then simplejson
+with its C speedups, then the standard library. Anything the fast decoder
+rejects (an invalid document, or an integer wider than 64 bits) is decoded
+again with the standard library, so results and error messages match it.
+
+Encoding always goes through one reused standard library encoder. Its C
+encoder is as fast as the alternatives on ContigSet sized payloads (see
+test/json_codec_benchmark.py), and unlike ujson it rejects objects it
+cannot encode rather than writing them out as {}. Sets and frozensets are
+encoded as lists, and objects with a toJSONable() method as its result.
+"""
+import json
+
+
+class JSONObjectEncoder(json.JSONEncoder):
+
+    def default(self, obj):
+        if isinstance(obj, set):
+            return list(obj)
+        if isinstance(obj, frozenset):
+            return list(obj)
+        if hasattr(obj, 'toJSONable'):
+            return obj.toJSONable()
+        return json.JSONEncoder.default(self, obj)
+
+
+def _decoders():
+    decoders = {'json': json.loads}
+    try:
+        import ujson
+        decoders['ujson'] = lambda s: ujson.loads(s, precise_float=True)
+    except ImportError:
+        pass
+    try:
+        import simplejson
+        from simplejson.scanner import c_make_scanner
+        if c_make_scanner is not None:
+            decoders['simplejson'] = simplejson.loads
+    except ImportError:
+        pass
+    return decoders
+
+
+DECODERS = _decoders()
+
+_PREFERENCE = ('ujson', 'simplejson', 'json')
+
+_encoder = JSONObjectEncoder()
+_decode = json.loads
+codec = 'json'
+
+
+def use(name='auto'):
+    """
+    Decode with the named codec ('ujson', 'simplejson' or 'json'), or with
+    the fastest one installed for 'auto'. Returns the name of the codec used.
+    """
+    global _decode, codec
+    if name == 'auto':
+        name = next(n for n in _PREFERENCE if n in DECODERS)
+    if name not in DECODERS:
+        raise ValueError('JSON codec {} is not available; installed: {}'.format(
+            name, ', '.join(sorted(DECODERS))))
+    _decode = DECODERS[name]
+    codec = name
+    return name
+
+
+def dumps(obj):
+    return _encoder.encode(obj)
+
+
+def loads(s):
+    if _decode is not json.loads:
+        try:
+            return _decode(s)
+        except (ValueError, OverflowError):
+            pass
+    return json.loads(s)
+
+
+use()
@@ -0,0 +1,324 @@
+"""
+Counters, gauges and histograms rendered in the Prometheus text format.
+
+A Registry holds named metrics, each with a fixed set of label names:
+
+    requests = registry.counter('assemblyrast_requests_total',
+                                'JSON-RPC requests.', ('method', 'status'))
+    requests.inc(method='AssemblyRAST.run_kiki', status='200')
+
+Values that are cheaper to read when scraped than to keep up to date,
+such as the size of a cache, come from collectors: functions registered
+with collect() that return (name, type, help, samples) tuples, samples
+being a list of (labels dict, value) pairs. render() returns the text a
+Prometheus scraper reads.
+
+Metrics are kept per process, and under uwsgi each scrape is answered by
+whichever worker takes it. A registry given a directory with share()
+writes its values there every few seconds and at each scrape, and
+renders the sum over every process that shares the directory, so the
+totals do not depend on the worker. Counters and histograms of workers
+that uwsgi has since recycled still count; gauges only count while their
+process keeps writing.
+"""
+import bisect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+logger = logging.getLogger(__name__)
+
+
+# request latencies, from a cached token check to a long synchronous run
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 1800)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _sample(name, labels, value):
+    if labels:
+        name += '{' + ','.join('{}="{}"'.format(k, _escape(v)) for k, v in labels) + '}'
+    return '{} {}'.format(name, _format_value(value))
+
+
+class _Metric(object):
+
+    type = None
+
+    def __init__(self, name, help, labels=(), on_change=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        self._on_change = on_change or (lambda: None)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError('{} takes the labels {}, not {}'.format(
+                self.name, ', '.join(self.labels), ', '.join(sorted(labels))))
+        return tuple(labels[name] for name in self.labels)
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self, values=None):
+        if values is None:
+            values = self.values()
+        return [(self.name, zip(self.labels, key), value) for key, value in sorted(values.items())]
+
+
+class Counter(_Metric):
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError('counters only go up')
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self._on_change()
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+
+    type = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self._on_change()
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+        self._on_change()
+
+
+class Histogram(_Metric):
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS, on_change=None):
+        super(Histogram, self).__init__(name, help, labels, on_change)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # per bucket counts, then the sum and count of all values
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-2] += value
+            counts[-1] += 1
+        self._on_change()
+
+    def values(self):
+        with self._lock:
+            return dict((key, list(counts)) for key, counts in self._values.items())
+
+    def samples(self, values=None):
+        if values is None:
+            values = self.values()
+        samples = []
+        for key, counts in sorted(values.items()):
+            labels = zip(self.labels, key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((self.name + '_bucket', labels + [('le', _format_value(float(bound)))],
+                                cumulative))
+            samples.append((self.name + '_sum', labels, counts[-2]))
+            samples.append((self.name + '_count', labels, counts[-1]))
+        return samples
+
+
+def _add_values(total, value):
+    # counters and gauges are numbers, histograms lists of counts
+    if isinstance(value, list):
+        return [a + b for a, b in zip(total, value)] if total is not None else list(value)
+    return (total or 0) + value
+
+
+class Registry(object):
+
+    def __init__(self):
+        self._metrics = OrderedDict()
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._share = None
+        self._pid = None
+        self._path = None
+
+    def _add(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, on_change=self._started, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError('{} is already a {}'.format(name, metric.type))
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter, name, help, labels)
+
+    def gauge(self, name, help, labels=()):
+        return self._add(Gauge, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram, name, help, labels, buckets=buckets)
+
+    def collect(self, collector, local=True):
+        """
+        Call collector() at every render for (name, type, help, samples)
+        tuples. A local collector reports on this process alone, and when
+        the registry is shared its samples are added up like the metrics;
+        others report figures that already cover every process.
+        """
+        self._collectors.append((collector, local))
+
+    def share(self, root, owners, interval=5.0):
+        """
+        Render the sum of this registry over every process that shares the
+        directory root, each writing its values there every interval
+        seconds. owners (see owners.py) tells the files of this server
+        from those left by one that has gone, which are removed.
+        """
+        if not os.path.exists(root):
+            os.makedirs(root)
+        self._share = {'root': root, 'owners': owners, 'interval': interval}
+        for name, snapshot in self._snapshots():
+            if not owners.alive(snapshot.get('owner')):
+                os.remove(os.path.join(root, name))
+
+    def _started(self):
+        # called on every update, so that each process that uses a shared
+        # registry, such as a forked uwsgi worker, writes its own file
+        if self._share is None or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._path = os.path.join(self._share['root'], '{}.json'.format(uuid.uuid4().hex))
+        t = threading.Thread(target=self._flush_loop, name='metrics-flush')
+        t.daemon = True
+        t.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self._share['interval'])
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Writing metrics to {} failed'.format(self._path))
+
+    def flush(self):
+        """Write the values of this process to the shared directory."""
+        if self._path is None:
+            return
+        collected = []
+        for collector, local in self._collectors:
+            if local:
+                collected.extend([name, type, help, [[sorted(labels.items()), value]
+                                                     for labels, value in samples]]
+                                 for name, type, help, samples in collector())
+        snapshot = {'owner': self._share['owners'].owner,
+                    'updated': time.time(),
+                    'metrics': dict((metric.name, [[list(key), value] for key, value
+                                                   in metric.values().items()])
+                                    for metric in self._metrics.values()),
+                    'collected': collected}
+        fd, tmp = tempfile.mkstemp(dir=self._share['root'], suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(snapshot, f)
+        os.rename(tmp, self._path)
+
+    def _snapshots(self):
+        root = self._share['root']
+        for name in os.listdir(root):
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(root, name)) as f:
+                        yield name, json.load(f)
+                except (IOError, ValueError):
+                    # gone, or being replaced
+                    continue
+
+    def _merged(self):
+        # the metric values and local collector samples of every process,
+        # leaving out the gauges of processes that stopped writing
+        self._started()
+        self.flush()
+        stale = time.time() - 3 * self._share['interval']
+        values = dict((name, {}) for name in self._metrics)
+        collected = OrderedDict()
+        for _, snapshot in self._snapshots():
+            fresh = snapshot['updated'] >= stale
+            for name, items in snapshot['metrics'].items():
+                metric = self._metrics.get(name)
+                if metric is None or (metric.type == 'gauge' and not fresh):
+                    continue
+                for key, value in items:
+                    key = tuple(key)
+                    values[name][key] = _add_values(values[name].get(key), value)
+            for name, type, help, samples in snapshot['collected']:
+                if type == 'gauge' and not fresh:
+                    continue
+                totals = collected.setdefault(name, (type, help, {}))[2]
+                for labels, value in samples:
+                    key = tuple(tuple(label) for label in labels)
+                    totals[key] = totals.get(key, 0) + value
+        return values, [(name, type, help, [(dict(key), value) for key, value in sorted(totals.items())])
+                        for name, (type, help, totals) in collected.items()]
+
+    def render(self):
+        values = dict((name, None) for name in self._metrics)
+        collected = []
+        if self._share is not None:
+            values, collected = self._merged()
+        lines = []
+        for metric in self._metrics.values():
+            lines.append('# HELP {} {}'.format(metric.name, metric.help))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.type))
+            lines.extend(_sample(name, labels, value)
+                         for name, labels, value in metric.samples(values[metric.name]))
+        for collector, local in self._collectors:
+            if not local or self._share is None:
+                collected.extend(collector())
+        for name, type, help, samples in collected:
+            lines.append('# HELP {} {}'.format(name, help))
+            lines.append('# TYPE {} {}'.format(name, type))
+            lines.extend(_sample(name, sorted(labels.items()), value)
+                         for labels, value in samples)
+        return '\n'.join(lines) + '\n'
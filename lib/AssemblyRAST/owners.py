@@ -0,0 +1,124 @@
+"""
+Liveness of the processes that share state files under scratch.
+
+Every process that writes shared records, each uwsgi worker and every
+async CLI job, gets a random owner id and holds an flock on a file named
+after it for as long as it lives. A worker forked from the process that
+made an Owners gets an id and lock of its own the first time it asks for
+its owner, since an id inherited from the uwsgi master would stay alive
+as long as any worker does. Shared records name the owner that wrote
+them, so any process can tell the records of a live process from those
+left behind by one that is gone, even when a restarted container hands
+out the same pids again.
+"""
+import errno
+import fcntl
+import os
+import threading
+import uuid
+
+
+class Owners(object):
+    """The owner id of this process and the liveness of the others, under root."""
+
+    def __init__(self, root):
+        self.root = root
+        if not os.path.exists(root):
+            os.makedirs(root)
+        self._lock = threading.Lock()
+        self._claimed = False
+        self._new_owner()
+
+    def _new_owner(self):
+        self._pid = os.getpid()
+        self._owner = uuid.uuid4().hex
+        self._fd = None
+
+    def _path(self, owner):
+        return os.path.join(self.root, '{}.owner'.format(owner))
+
+    @property
+    def owner(self):
+        """The owner id of this process, claimed if claim() was called."""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # forked: let go of the parent's lock and take our own
+                    if self._fd is not None:
+                        os.close(self._fd)
+                    self._new_owner()
+                    if self._claimed:
+                        self._claim()
+        return self._owner
+
+    def claim(self):
+        """Hold the lock of this process's owner until the process exits."""
+        self._claimed = True
+        # in a forked process this already takes an owner of its own
+        self.owner
+        with self._lock:
+            if self._fd is None:
+                self._claim()
+
+    def _claim(self):
+        path = self._path(self._owner)
+        while True:
+            fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o644)
+            # commands the process runs must not inherit the lock
+            fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.FD_CLOEXEC)
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # sweep() may have removed the file between the open and the lock
+            try:
+                if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                    break
+            except OSError:
+                pass
+            os.close(fd)
+        self._fd = fd
+
+    def alive(self, owner):
+        if owner is None:
+            return False
+        if owner == self.owner:
+            return True
+        try:
+            fd = os.open(self._path(owner), os.O_RDWR)
+        except OSError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError as e:
+            if e.errno in (errno.EAGAIN, errno.EACCES):
+                return True
+            raise
+        finally:
+            os.close(fd)
+        return False
+
+    def forget(self, owner):
+        """Remove the lock file of an owner that is gone."""
+        try:
+            os.remove(self._path(owner))
+        except OSError:
+            pass
+
+    def sweep(self):
+        """Remove the lock files of every owner that is gone."""
+        for name in os.listdir(self.root):
+            if not name.endswith('.owner'):
+                continue
+            try:
+                fd = os.open(os.path.join(self.root, name), os.O_RDWR)
+            except OSError:
+                continue
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except IOError as e:
+                if e.errno not in (errno.EAGAIN, errno.EACCES):
+                    raise
+            else:
+                # removed while locked, so a process claiming it meanwhile
+                # sees the file is gone and makes a new one
+                self.forget(name[:-len('.owner')])
+            finally:
+                os.close(fd)
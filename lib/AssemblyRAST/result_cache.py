@@ -0,0 +1,144 @@
+"""
+Content addressed cache of finished assembly results.
+
+Results are keyed by the assembler, the content of the input reads (the
+remote md5 of each read handle, or its id when no md5 is known) and the
+normalized parameters that affect the output. Each entry is a directory
+holding the filtered contigs, the ARAST report and the ARAST log. The cache
+is bounded in size and evicts least recently used entries first.
+
+Every worker of a server shares the cache directory, so lookups, stores
+and evictions take an flock on a lock file under it, and an entry is never
+removed while another process links its files out.
+"""
+import errno
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+ENTRY_FILES = {'contigs': 'contigs.fa', 'report': 'report.txt', 'log': 'log.txt'}
+
+_HANDLE_KEYS = ('handle', 'handle_1', 'handle_2')
+
+
+def _read_key(handle):
+    if not isinstance(handle, dict):
+        return handle
+    return handle.get('remote_md5') or handle.get('id')
+
+
+def cache_key(assembler, assembly_input, params):
+    """Return the cache key for running assembler on assembly_input with params."""
+    libs = {}
+    for kind in ('paired_end_libs', 'single_end_libs'):
+        libs[kind] = sorted(
+            json.dumps(dict((k, _read_key(v) if k in _HANDLE_KEYS else v)
+                            for k, v in lib.items()), sort_keys=True)
+            for lib in assembly_input.get(kind, []))
+    key = {'assembler': assembler,
+           'reads': libs,
+           'min_contig_len': int(params.get('min_contig_len') or 300),
+           'extra_params': list(params.get('extra_params') or [])}
+    return hashlib.sha1(json.dumps(key, sort_keys=True)).hexdigest()
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class ResultCache(object):
+    """A size bounded LRU store of result entries under root."""
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        if not os.path.exists(root):
+            os.makedirs(root)
+        self._lock_path = os.path.join(root, '.lock')
+
+    @contextmanager
+    def _locked(self):
+        # a fresh descriptor per call, so threads of one process exclude
+        # each other through the flock as well
+        fd = os.open(self._lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.FD_CLOEXEC)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _entry(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, key, output_dir):
+        """
+        On a hit, link the entry's files into output_dir and return a dict
+        of their paths keyed like ENTRY_FILES. Return None on a miss.
+        """
+        entry = self._entry(key)
+        with self._locked():
+            if not os.path.isdir(entry):
+                return None
+            os.utime(entry, None)
+            paths = {}
+            for name, filename in ENTRY_FILES.items():
+                paths[name] = os.path.join(output_dir, filename)
+                _link_or_copy(os.path.join(entry, filename), paths[name])
+        logger.info('Result cache hit for {}'.format(key))
+        return paths
+
+    def put(self, key, paths):
+        """Store the files in paths (keyed like ENTRY_FILES) under key."""
+        tmp = tempfile.mkdtemp(dir=self.root, prefix='.tmp.')
+        try:
+            for name, filename in ENTRY_FILES.items():
+                _link_or_copy(paths[name], os.path.join(tmp, filename))
+            with self._locked():
+                try:
+                    os.rename(tmp, self._entry(key))
+                except OSError as e:
+                    # another run stored the same result first
+                    if e.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                        raise
+                    shutil.rmtree(tmp)
+                self._evict()
+        except Exception:
+            if os.path.exists(tmp):
+                shutil.rmtree(tmp)
+            raise
+
+    def size(self):
+        with self._locked():
+            return sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.root):
+            entry = os.path.join(self.root, name)
+            if name.startswith('.') or not os.path.isdir(entry):
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+            entries.append((os.path.getmtime(entry), size, entry))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry)
+            total -= size
+            logger.info('Evicted {} from the result cache'.format(os.path.basename(entry)))
@@ -0,0 +1,823 @@
+#!/usr/bin/env python
+"""
+The AssemblyRAST service as uwsgi and the async job script run it.
+
+AssemblyRASTServer.py is generated by kb-sdk compile on every build, and
+only the #BEGIN/#END blocks of the Impl survive that, so what the service
+adds to the generated server lives here instead. Application extends the
+generated Application, keeping the methods it registers from the spec, and
+answers the requests itself. scripts/start_server.sh and
+bin/run_AssemblyRAST_async_job.sh, both written by the Makefile, load this
+module rather than the generated one. Run directly with --event-loop, it
+serves from an EventServer (see event_server.py) instead of wsgiref.
+"""
+from wsgiref.simple_server import make_server, WSGIRequestHandler
+import sys
+import traceback
+import hashlib
+import re
+import time
+import os
+import random as _random
+import threading
+import zlib
+import urlparse as _urlparse
+from multiprocessing import Process
+from getopt import getopt, GetoptError
+
+import requests as _requests
+from requests.adapters import HTTPAdapter as _HTTPAdapter
+
+from AssemblyRAST import AssemblyRASTServer as generated
+from AssemblyRAST.AssemblyRASTServer import (
+    config, impl_AssemblyRAST, sync_methods, async_run_methods,
+    async_check_methods, AsyncJobServiceClient, JSONRPCServiceCustom,
+    MethodContext, getIPAddress, JSONRPCError, ServerError, log, environ)
+from AssemblyRAST.ttl_cache import TTLCache
+from AssemblyRAST import json_codec
+from AssemblyRAST import compression
+from AssemblyRAST import metrics
+from AssemblyRAST.event_server import EventServer
+
+
+class CachingAuthClient(object):
+    """
+    Wraps the auth client of the generated Application, caching token
+    validations per process under a hash of the token: failures only
+    briefly, and the others never past the token's own expiry.
+    """
+
+    def __init__(self, client, size=1000, ttl=300, negative_ttl=10):
+        self.client = client
+        self.cache = TTLCache(maxsize=size, ttl=ttl)
+        self.negative_ttl = negative_ttl
+
+    def validate_token(self, token):
+        key = hashlib.sha256(token).hexdigest()
+        cached = self.cache.get(key)
+        if cached is not None:
+            if 'error' in cached:
+                raise Exception(cached['error'])
+            return cached['result']
+        try:
+            result = self.client.validate_token(token)
+        except Exception, e:
+            self.cache.put(key, {'error': str(e)}, ttl=self.negative_ttl)
+            raise
+        ttl = self.cache.ttl
+        expiry = re.search(r'(?:^|\|)expiry=(\d+)', token)
+        if expiry:
+            ttl = min(ttl, int(expiry.group(1)) - time.time())
+        if ttl > 0:
+            self.cache.put(key, {'result': result}, ttl=ttl)
+        return result
+
+    def stats(self):
+        return {'size': len(self.cache),
+                'hits': self.cache.hits,
+                'misses': self.cache.misses}
+
+
+_job_service_session = None
+_job_service_session_lock = threading.Lock()
+
+
+def get_job_service_session(pool_maxsize=25):
+    """Return the keep-alive session shared by all JobServiceClients."""
+    global _job_service_session
+    with _job_service_session_lock:
+        if _job_service_session is None:
+            session = _requests.Session()
+            adapter = _HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _job_service_session = session
+    return _job_service_session
+
+
+class JobServiceClient(AsyncJobServiceClient):
+    """
+    The generated AsyncJobServiceClient, sending its calls over a keep-alive
+    session that every client in the process shares, and able to check
+    several jobs in one call. url defaults to the job service the generated
+    client would use.
+    """
+
+    def __init__(self, timeout=30 * 60, token=None,
+                 ignore_authrc=True, trust_all_ssl_certificates=False,
+                 url=None, session=None, compress_min_size=None):
+        if url is None:
+            url = environ.get('KB_JOB_SERVICE_URL', None)
+        if url is None and config is not None:
+            url = config.get('job-service-url')
+        if url is None:
+            raise ValueError('Neither \'job-service-url\' parameter is defined in '+
+                    'configuration nor \'KB_JOB_SERVICE_URL\' variable is defined in system')
+        scheme, _, _, _, _, _ = _urlparse.urlparse(url)
+        if scheme not in ['http', 'https']:
+            raise ValueError(url + " isn't a valid http url")
+        self.url = url
+        self.timeout = int(timeout)
+        self._headers = dict()
+        self.trust_all_ssl_certificates = trust_all_ssl_certificates
+        if token is None:
+            raise ValueError('Authentication is required for async methods')
+        self._headers['AUTHORIZATION'] = token
+        self.session = session or get_job_service_session()
+        # request bodies of at least this many bytes are sent gzipped; off
+        # unless configured, as the job service may not accept them
+        if compress_min_size is None and config is not None:
+            compress_min_size = config.get('job-service-compress-min-size')
+        self.compress_min_size = int(compress_min_size or 0)
+        if self.timeout < 1:
+            raise ValueError('Timeout value must be at least 1 second')
+
+    def _call(self, method, params, json_rpc_call_context = None):
+        arg_hash = {'method': method,
+                    'params': params,
+                    'version': '1.1',
+                    'id': str(_random.random())[2:]
+                    }
+        if json_rpc_call_context:
+            arg_hash['context'] = json_rpc_call_context
+        body = json_codec.dumps(arg_hash)
+        headers = self._headers
+        if self.compress_min_size and len(body) >= self.compress_min_size:
+            body = compression.compress(body)
+            headers = dict(headers, **{'Content-Encoding': 'gzip'})
+        ret = self.session.post(self.url, data=body, headers=headers,
+                                timeout=self.timeout,
+                                verify=not self.trust_all_ssl_certificates)
+        if ret.status_code == _requests.codes.server_error:
+            if 'content-type' in ret.headers and ret.headers['content-type'] == 'application/json':
+                err = json_codec.loads(ret.text)
+                if 'error' in err:
+                    raise ServerError(**err['error'])
+                else:
+                    raise ServerError('Unknown', 0, ret.text)
+            else:
+                raise ServerError('Unknown', 0, ret.text)
+        if ret.status_code != _requests.codes.OK:
+            ret.raise_for_status()
+        resp = json_codec.loads(ret.text)
+        if 'result' not in resp:
+            raise ServerError('Unknown', 0, 'An unknown server error occurred')
+        return resp['result']
+
+    def check_jobs(self, job_ids, json_rpc_call_context = None):
+        """Check several jobs in one request, returns {job_id: job_state}."""
+        result = self._call('KBaseJobService.check_jobs', [{'job_ids': job_ids}],
+                            json_rpc_call_context)[0]
+        return result['job_states']
+
+
+class BatchRPCService(JSONRPCServiceCustom):
+    """
+    The generated JSONRPCServiceCustom, with the methods registered on it,
+    encoding results with json_codec and running the entries of a batch
+    concurrently.
+    """
+
+    def __init__(self, service=None, batch_concurrency=1):
+        JSONRPCServiceCustom.__init__(self)
+        if service is not None:
+            self.method_data = service.method_data
+        # the entries of a batch run on up to this many threads
+        self.batch_concurrency = batch_concurrency
+
+    def _run_batch(self, handle, rdata):
+        """
+        Returns [handle(entry) for entry in rdata], running the entries on
+        up to batch_concurrency threads that belong to this batch alone, the
+        request thread being one of them. A slow batch therefore never holds
+        up the entries of another.
+        """
+        results = [None] * len(rdata)
+        entries = enumerate(rdata)
+        lock = threading.Lock()
+
+        def work():
+            while True:
+                with lock:
+                    try:
+                        i, rdata_ = next(entries)
+                    except StopIteration:
+                        return
+                results[i] = handle(rdata_)
+
+        helpers = [threading.Thread(target=work)
+                   for _ in range(min(len(rdata), self.batch_concurrency) - 1)]
+        for t in helpers:
+            t.daemon = True
+            t.start()
+        work()
+        for t in helpers:
+            t.join()
+        return results
+
+    def call(self, ctx, jsondata):
+        result = self.call_py(ctx, jsondata)
+        if result is not None:
+            return json_codec.dumps(result)
+
+        return None
+
+    def call_py(self, ctx, jsondata):
+        """
+        As the generated call_py, except that each entry of a batch gets its
+        own context and a failing entry only fails its own response.
+        """
+        if not (isinstance(jsondata, list) and jsondata):
+            return JSONRPCServiceCustom.call_py(self, ctx, jsondata)
+        handle = lambda rdata_: self._handle_batch_entry(ctx, rdata_)
+        results = self._run_batch(handle, jsondata)
+
+        # Don't respond to notifications
+        responds = [respond for respond in results if respond is not None]
+
+        if responds:
+            return responds
+
+        # Nothing to respond.
+        return None
+
+    def _handle_batch_entry(self, ctx, rdata):
+        """Handles one entry of a batch, returning its response or error."""
+        # set some default values for error handling
+        request = self._get_default_vals()
+        try:
+            self._fill_request(request, rdata)
+            ctx_ = MethodContext(ctx._logger)
+            ctx_.update(ctx)
+            ctx_['module'], ctx_['method'] = request['method'].split('.')
+            ctx_['call_id'] = request['id']
+            ctx_['provenance'] = [{'service': ctx_['module'],
+                                   'method': ctx_['method'],
+                                   'method_params': request['params']}]
+            return self._handle_request(ctx_, request)
+        except JSONRPCError as jre:
+            trace = jre.trace if hasattr(jre, 'trace') else None
+            return self._batch_error(request, jre.code, jre.message, jre.data, trace)
+        except Exception:
+            return self._batch_error(request, 0, 'Unexpected Server Error',
+                                     'An unexpected server error occurred',
+                                     traceback.format_exc())
+
+    def _batch_error(self, request, code, name, message, trace):
+        respond = {'id': request['id'],
+                   'error': {'code': code, 'name': name, 'message': message}}
+        self._fill_ver(request['jsonrpc'], respond)
+        if 'jsonrpc' in respond:
+            respond['error']['data'] = trace
+        else:
+            respond['version'] = '1.1'
+            respond['error']['error'] = trace
+        return respond
+
+
+class RequestBodyError(Exception):
+    """A request body that could not be read; status is the HTTP reply."""
+
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+class Application(generated.Application):
+
+    def __init__(self):
+        generated.Application.__init__(self)
+        cfg = config or {}
+        json_codec.use(cfg.get('json-codec', 'auto'))
+        self.max_request_size = int(float(cfg.get('max-request-size-mb', 16)) * (1 << 20))
+        self.request_read_timeout = float(cfg.get('request-read-timeout', 60))
+        self.rpc_service = BatchRPCService(
+            self.rpc_service, batch_concurrency=int(cfg.get('batch-concurrency', 1)))
+        self.auth_client = CachingAuthClient(
+            self.auth_client,
+            size=int(cfg.get('auth-cache-size', 1000)),
+            ttl=int(cfg.get('auth-cache-ttl', 300)),
+            negative_ttl=int(cfg.get('auth-cache-negative-ttl', 10)))
+        self.metrics_path = cfg.get('metrics-path', '/metrics')
+        self.metrics = metrics.Registry()
+        self.requests_total = self.metrics.counter(
+            'assemblyrast_requests_total', 'JSON-RPC requests by method and HTTP status.',
+            ('method', 'status'))
+        self.request_seconds = self.metrics.histogram(
+            'assemblyrast_request_duration_seconds', 'Time to answer JSON-RPC requests.',
+            ('method',))
+        self.requests_in_flight = self.metrics.gauge(
+            'assemblyrast_requests_in_flight', 'JSON-RPC requests being answered.')
+        self.request_bytes = self.metrics.counter(
+            'assemblyrast_request_bytes_total', 'Declared size of JSON-RPC request bodies.')
+        self.response_bytes = self.metrics.counter(
+            'assemblyrast_response_bytes_total', 'Size of JSON-RPC response bodies.')
+        # every worker answers scrapes for all of them
+        self.metrics.share(os.path.join(impl_AssemblyRAST.scratch, 'metrics', 'server'),
+                           impl_AssemblyRAST.owners,
+                           interval=float(cfg.get('metrics-flush-interval', 5)))
+        self.metrics.collect(self.collect_auth_metrics)
+        self.compress_min_size = int(cfg.get('compress-min-size', 1024))
+        self.compress_level = int(cfg.get('compress-level', 1))
+
+    def collect_auth_metrics(self):
+        stats = self.auth_client.stats()
+        return [('assemblyrast_auth_cache_size', 'gauge',
+                 'Token validations cached.', [({}, stats['size'])]),
+                ('assemblyrast_auth_cache_hits_total', 'counter',
+                 'Tokens found in the validation cache.', [({}, stats['hits'])]),
+                ('assemblyrast_auth_cache_misses_total', 'counter',
+                 'Tokens validated with the auth service.', [({}, stats['misses'])])]
+
+    def metrics_label(self, ctx):
+        """The method label of a request, keeping unknown method names out of the metrics."""
+        if ctx['method'] == 'batch':
+            return 'batch'
+        if ctx['module'] is None:
+            return 'none'
+        method = ctx['module'] + '.' + ctx['method']
+        if (method in self.rpc_service.method_data or method in async_run_methods or
+                method in async_check_methods):
+            return method
+        return 'unknown'
+
+    def serve_metrics(self, environ, start_response):
+        if environ['REQUEST_METHOD'] != 'GET':
+            start_response('405 Method Not Allowed', [('Allow', 'GET')])
+            return ['']
+        body = self.metrics.render() + impl_AssemblyRAST.metrics.render()
+        start_response('200 OK', [('Content-Type', metrics.CONTENT_TYPE),
+                                  ('Content-Length', str(len(body)))])
+        return [body]
+
+    def read_body(self, environ, chunk_size=64 * 1024):
+        """
+        Read the request body a chunk at a time. Raises RequestBodyError
+        once the body passes max_request_size bytes or the read takes
+        longer than request_read_timeout seconds; a declared Content-Length
+        over the limit is refused before any of the body is read. A single
+        read that stalls is bounded by the server instead: the handler
+        timeout of start_server, or uwsgi's --socket-timeout (see the
+        start script the Makefile writes).
+        """
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if length > self.max_request_size:
+            raise RequestBodyError('413 Request Entity Too Large',
+                                   'Request body of %d bytes exceeds the limit of %d bytes' %
+                                   (length, self.max_request_size))
+        if length <= 0 and not environ.get('wsgi.input_terminated'):
+            return ''
+        # without a Content-Length, read a terminated (chunked) body to its end
+        remaining = length if length > 0 else None
+        deadline = time.time() + self.request_read_timeout
+        stream = environ['wsgi.input']
+        chunks = []
+        size = 0
+        while remaining is None or remaining > 0:
+            try:
+                chunk = stream.read(chunk_size if remaining is None
+                                    else min(chunk_size, remaining))
+            except IOError:
+                # socket.timeout under wsgiref; uwsgi raises IOError once a
+                # read waits longer than its --socket-timeout
+                chunk = None
+            if chunk is None or time.time() > deadline:
+                raise RequestBodyError('408 Request Timeout',
+                                       'Request body not received within %g seconds' %
+                                       self.request_read_timeout)
+            if not chunk:
+                if remaining is None:
+                    break
+                raise RequestBodyError('400 Bad Request',
+                                       'Request body ended after %d of %d bytes' % (size, length))
+            size += len(chunk)
+            if size > self.max_request_size:
+                raise RequestBodyError('413 Request Entity Too Large',
+                                       'Request body exceeds the limit of %d bytes' %
+                                       self.max_request_size)
+            if remaining is not None:
+                remaining -= len(chunk)
+            chunks.append(chunk)
+        return ''.join(chunks)
+
+    def decode_body(self, environ, body):
+        """Inflate a request body sent with a gzip or deflate Content-Encoding."""
+        encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if encoding in ('', 'identity'):
+            return body
+        if encoding not in compression.ENCODINGS:
+            raise RequestBodyError('415 Unsupported Media Type',
+                                   'Unsupported Content-Encoding: ' + encoding)
+        try:
+            return compression.decompress(body, encoding, self.max_request_size)
+        except compression.DecompressedTooLarge as e:
+            raise RequestBodyError('413 Request Entity Too Large', str(e))
+        except zlib.error as e:
+            raise RequestBodyError('400 Bad Request',
+                                   'Request body is not valid %s data: %s' % (encoding, e))
+
+    def __call__(self, environ, start_response):
+        if self.metrics_path and environ.get('PATH_INFO') == self.metrics_path:
+            return self.serve_metrics(environ, start_response)
+        # Context object, equivalent to the perl impl CallContext
+        ctx = MethodContext(self.userlog)
+        statuses = []
+
+        def record_status(status, headers):
+            statuses.append(status)
+            return start_response(status, headers)
+
+        start = time.time()
+        self.requests_in_flight.inc()
+        try:
+            response = self.handle_rpc(ctx, environ, record_status)
+        finally:
+            self.requests_in_flight.dec()
+        method = self.metrics_label(ctx)
+        self.requests_total.inc(method=method, status=statuses[0].split(' ', 1)[0])
+        self.request_seconds.observe(time.time() - start, method=method)
+        try:
+            self.request_bytes.inc(int(environ.get('CONTENT_LENGTH') or 0))
+        except ValueError:
+            pass
+        self.response_bytes.inc(sum(len(chunk) for chunk in response))
+        return response
+
+    def handle_rpc(self, ctx, environ, start_response):
+        ctx['client_ip'] = getIPAddress(environ)
+        status = '500 Internal Server Error'
+
+        if environ['REQUEST_METHOD'] == 'OPTIONS':
+            # we basically do nothing and just return headers
+            status = '200 OK'
+            rpc_result = ""
+        else:
+            try:
+                request_body = self.decode_body(environ, self.read_body(environ))
+                req = json_codec.loads(request_body)
+            except RequestBodyError as rbe:
+                status = rbe.status
+                err = {'error': {'code': -32600,
+                                 'name': rbe.status.split(' ', 1)[1],
+                                 'message': str(rbe),
+                                 }
+                       }
+                rpc_result = self.process_error(err, ctx, {'version': '1.1'})
+            except ValueError as ve:
+                err = {'error': {'code': -32700,
+                                 'name': "Parse error",
+                                 'message': str(ve),
+                                 }
+                       }
+                rpc_result = self.process_error(err, ctx, {'version': '1.1'})
+            else:
+                if isinstance(req, list):
+                    status, rpc_result = self.process_batch(ctx, req, environ)
+                else:
+                    ctx['module'], ctx['method'] = req['method'].split('.')
+                    ctx['call_id'] = req['id']
+                    ctx['rpc_context'] = {'call_stack': [{'time':self.now_in_utc(), 'method': req['method']}]}
+                    prov_action = {'service': ctx['module'], 'method': ctx['method'],
+                                   'method_params': req['params']}
+                    ctx['provenance'] = [prov_action]
+                    try:
+                        token = environ.get('HTTP_AUTHORIZATION')
+                        # parse out the method being requested and check if it
+                        # has an authentication requirement
+                        method_name = req['method']
+                        if method_name in async_run_methods:
+                            method_name = async_run_methods[method_name][0] + "." + async_run_methods[method_name][1]
+                        if method_name in async_check_methods:
+                            method_name = async_check_methods[method_name][0] + "." + async_check_methods[method_name][1]
+                        auth_req = self.method_authentication.get(method_name,
+                                                                  "none")
+                        if auth_req != "none":
+                            if token is None and auth_req == 'required':
+                                err = ServerError()
+                                err.data = "Authentication required for " + \
+                                    "AssemblyRAST but no authentication header was passed"
+                                raise err
+                            elif token is None and auth_req == 'optional':
+                                pass
+                            else:
+                                try:
+                                    user, _, _ = \
+                                        self.auth_client.validate_token(token)
+                                    ctx['user_id'] = user
+                                    ctx['authenticated'] = 1
+                                    ctx['token'] = token
+                                except Exception, e:
+                                    if auth_req == 'required':
+                                        err = ServerError()
+                                        err.data = \
+                                            "Token validation failed: %s" % e
+                                        raise err
+                        if (environ.get('HTTP_X_FORWARDED_FOR')):
+                            self.log(log.INFO, ctx, 'X-Forwarded-For: ' +
+                                     environ.get('HTTP_X_FORWARDED_FOR'))
+                        method_name = req['method']
+                        if method_name in async_run_methods or method_name in async_check_methods:
+                            if method_name in async_run_methods:
+                                orig_method_pair = async_run_methods[method_name]
+                            else:
+                                orig_method_pair = async_check_methods[method_name]
+                            orig_method_name = orig_method_pair[0] + '.' + orig_method_pair[1]
+                            if 'required' != self.method_authentication.get(orig_method_name, 'none'):
+                                err = ServerError()
+                                err.data = 'Async method ' + orig_method_name + ' should require ' + \
+                                    'authentication, but it has authentication level: ' + \
+                                    self.method_authentication.get(orig_method_name, 'none')
+                                raise err
+                            job_service_client = JobServiceClient(token = ctx['token'])
+                            if method_name in async_run_methods:
+                                run_job_params = {
+                                    'method': orig_method_name,
+                                    'params': req['params']}
+                                if 'rpc_context' in ctx:
+                                    run_job_params['rpc_context'] = ctx['rpc_context']
+                                job_id = job_service_client.run_job(run_job_params)
+                                respond = {'version': '1.1', 'result': [job_id], 'id': req['id']}
+                                rpc_result = json_codec.dumps(respond)
+                                status = '200 OK'
+                            elif isinstance(req['params'][0], list):
+                                # several jobs checked in one call
+                                job_states = job_service_client.check_jobs(req['params'][0])
+                                respond = {'version': '1.1', 'result': [job_states], 'id': req['id']}
+                                rpc_result = json_codec.dumps(respond)
+                                status = '200 OK'
+                            else:
+                                job_id = req['params'][0]
+                                job_state = job_service_client.check_job(job_id)
+                                finished = job_state['finished']
+                                if finished != 0 and 'error' in job_state and job_state['error'] is not None:
+                                    err = {'error': job_state['error']}
+                                    rpc_result = self.process_error(err, ctx, req, None)
+                                else:
+                                    respond = {'version': '1.1', 'result': [job_state], 'id': req['id']}
+                                    rpc_result = json_codec.dumps(respond)
+                                    status = '200 OK'
+                        elif method_name in sync_methods or (method_name + '_async') not in async_run_methods:
+                            self.log(log.INFO, ctx, 'start method')
+                            rpc_result = self.rpc_service.call(ctx, req)
+                            self.log(log.INFO, ctx, 'end method')
+                            status = '200 OK'
+                        else:
+                            err = ServerError()
+                            err.data = 'Method ' + method_name + ' cannot be run synchronously'
+                            raise err
+                    except JSONRPCError as jre:
+                        err = {'error': {'code': jre.code,
+                                         'name': jre.message,
+                                         'message': jre.data
+                                         }
+                               }
+                        trace = jre.trace if hasattr(jre, 'trace') else None
+                        rpc_result = self.process_error(err, ctx, req, trace)
+                    except Exception, e:
+                        err = {'error': {'code': 0,
+                                         'name': 'Unexpected Server Error',
+                                         'message': 'An unexpected server error ' +
+                                                    'occurred',
+                                         }
+                               }
+                        rpc_result = self.process_error(err, ctx, req,
+                                                        traceback.format_exc())
+
+        if rpc_result:
+            response_body = rpc_result
+        else:
+            response_body = ''
+
+        response_headers = [
+            ('Access-Control-Allow-Origin', '*'),
+            ('Access-Control-Allow-Headers', environ.get(
+                'HTTP_ACCESS_CONTROL_REQUEST_HEADERS', 'authorization')),
+            ('content-type', 'application/json')]
+        # small responses are not worth compressing
+        if self.compress_min_size and len(response_body) >= self.compress_min_size:
+            response_headers.append(('Vary', 'Accept-Encoding'))
+            encoding = compression.accepted_encoding(environ.get('HTTP_ACCEPT_ENCODING'))
+            if encoding is not None:
+                response_body = compression.compress(response_body, encoding,
+                                                     self.compress_level)
+                response_headers.append(('Content-Encoding', encoding))
+        response_headers.append(('content-length', str(len(response_body))))
+        start_response(status, response_headers)
+        return [response_body]
+
+    def process_batch(self, ctx, reqs, environ):
+        """
+        Run a JSON-RPC batch of synchronous methods, authenticating the
+        token once for the whole batch. Returns (status, rpc_result).
+        """
+        ctx['module'], ctx['method'] = 'AssemblyRAST', 'batch'
+        try:
+            token = environ.get('HTTP_AUTHORIZATION')
+            auth_reqs = set(self.method_authentication.get(r.get('method'), 'none')
+                            for r in reqs if isinstance(r, dict))
+            if 'required' in auth_reqs and token is None:
+                err = ServerError()
+                err.data = "Authentication required for " + \
+                    "AssemblyRAST but no authentication header was passed"
+                raise err
+            if auth_reqs != set(['none']) and token is not None:
+                try:
+                    user, _, _ = self.auth_client.validate_token(token)
+                    ctx['user_id'] = user
+                    ctx['authenticated'] = 1
+                    ctx['token'] = token
+                except Exception, e:
+                    if 'required' in auth_reqs:
+                        err = ServerError()
+                        err.data = "Token validation failed: %s" % e
+                        raise err
+            self.log(log.INFO, ctx, 'start batch of %d' % len(reqs))
+            rpc_result = self.rpc_service.call(ctx, reqs)
+            self.log(log.INFO, ctx, 'end batch')
+            return '200 OK', rpc_result
+        except JSONRPCError as jre:
+            err = {'error': {'code': jre.code,
+                             'name': jre.message,
+                             'message': jre.data
+                             }
+                   }
+            trace = jre.trace if hasattr(jre, 'trace') else None
+            return '500 Internal Server Error', self.process_error(err, ctx, {'version': '1.1'}, trace)
+
+    def process_error(self, error, context, request, trace=None):
+        if trace:
+            self.log(log.ERR, context, trace.split('\n')[0:-1])
+        if 'id' in request:
+            error['id'] = request['id']
+        if 'version' in request:
+            error['version'] = request['version']
+            if 'error' not in error['error'] or error['error']['error'] is None:
+                error['error']['error'] = trace
+        elif 'jsonrpc' in request:
+            error['jsonrpc'] = request['jsonrpc']
+            error['error']['data'] = trace
+        else:
+            error['version'] = '1.0'
+            error['error']['error'] = trace
+        return json_codec.dumps(error)
+
+
+application = Application()
+
+# uwsgi mounts what the last module to set this dictionary put in it, and
+# the generated server sets it to its own application when imported
+try:
+    import uwsgi
+    uwsgi.applications = {
+        '': application
+        }
+except ImportError:
+    # Not available outside of wsgi, ignore
+    pass
+
+_proc = None
+
+
+def start_server(host='localhost', port=0, newprocess=False):
+    '''
+    By default, will start the server on localhost on a system assigned port
+    in the main thread. Excecution of the main thread will stay in the server
+    main loop until interrupted. To run the server in a separate process, and
+    thus allow the stop_server method to be called, set newprocess = True. This
+    will also allow returning of the port number.'''
+
+    global _proc
+    if _proc:
+        raise RuntimeError('server is already running')
+    # bound every blocking read of a request, as uwsgi's socket-timeout does
+    class RequestHandler(WSGIRequestHandler):
+        timeout = application.request_read_timeout
+
+    httpd = make_server(host, port, application, handler_class=RequestHandler)
+    port = httpd.server_address[1]
+    print "Listening on port %s" % port
+    if newprocess:
+        _proc = Process(target=httpd.serve_forever)
+        _proc.daemon = True
+        _proc.start()
+    else:
+        httpd.serve_forever()
+    return port
+
+
+def start_event_server(host='localhost', port=0, newprocess=False):
+    '''
+    Like start_server, but serves every connection from a single event loop
+    and runs the application on a bounded pool of event-workers threads, so
+    idle and slow connections do not each hold a thread. Once
+    event-max-pending requests are running or waiting, new ones get a 503.'''
+
+    global _proc
+    if _proc:
+        raise RuntimeError('server is already running')
+    cfg = config or {}
+    httpd = EventServer(application, host, port,
+                        workers=int(cfg.get('event-workers', 25)),
+                        max_pending=int(cfg.get('event-max-pending', 1000)),
+                        max_request_size=application.max_request_size,
+                        read_timeout=application.request_read_timeout)
+    port = httpd.server_port
+    print "Listening on port %s" % port
+    if newprocess:
+        _proc = Process(target=httpd.serve_forever)
+        _proc.daemon = True
+        _proc.start()
+    else:
+        httpd.serve_forever()
+    return port
+
+
+def stop_server():
+    global _proc
+    _proc.terminate()
+    _proc = None
+
+
+def process_async_cli(input_file_path, output_file_path, token):
+    exit_code = 0
+    with open(input_file_path) as data_file:
+        req = json_codec.loads(data_file.read())
+    if 'version' not in req:
+        req['version'] = '1.1'
+    if 'id' not in req:
+        req['id'] = str(_random.random())[2:]
+    ctx = MethodContext(application.userlog)
+    if token:
+        user, _, _ = application.auth_client.validate_token(token)
+        ctx['user_id'] = user
+        ctx['authenticated'] = 1
+        ctx['token'] = token
+    if 'context' in req:
+        ctx['rpc_context'] = req['context']
+    ctx['CLI'] = 1
+    ctx['module'], ctx['method'] = req['method'].split('.')
+    prov_action = {'service': ctx['module'], 'method': ctx['method'],
+                   'method_params': req['params']}
+    ctx['provenance'] = [prov_action]
+    resp = None
+    try:
+        resp = application.rpc_service.call_py(ctx, req)
+    except JSONRPCError as jre:
+        trace = jre.trace if hasattr(jre, 'trace') else None
+        resp = {'id': req['id'],
+                'version': req['version'],
+                'error': {'code': jre.code,
+                          'name': jre.message,
+                          'message': jre.data,
+                          'error': trace}
+               }
+    except Exception, e:
+        trace = traceback.format_exc()
+        resp = {'id': req['id'],
+                'version': req['version'],
+                'error': {'code': 0,
+                          'name': 'Unexpected Server Error',
+                          'message': 'An unexpected server error occurred',
+                          'error': trace}
+               }
+    if 'error' in resp:
+        exit_code = 500
+    with open(output_file_path, "w") as f:
+        f.write(json_codec.dumps(resp))
+    return exit_code
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and len(sys.argv) <= 4 and os.path.isfile(sys.argv[1]):
+        token = None
+        if len(sys.argv) == 4:
+            if os.path.isfile(sys.argv[3]):
+                with open(sys.argv[3]) as token_file:
+                    token = token_file.read()
+            else:
+                token = sys.argv[3]
+        sys.exit(process_async_cli(sys.argv[1], sys.argv[2], token))
+    try:
+        opts, args = getopt(sys.argv[1:], "", ["port=", "host=", "event-loop"])
+    except GetoptError as err:
+        # print help information and exit:
+        print str(err)  # will print something like "option -a not recognized"
+        sys.exit(2)
+    port = 9999
+    host = 'localhost'
+    serve = start_server
+    for o, a in opts:
+        if o == '--port':
+            port = int(a)
+        elif o == '--host':
+            host = a
+            print "Host set to %s" % host
+        elif o == '--event-loop':
+            serve = start_event_server
+        else:
+            assert False, "unhandled option"
+
+    serve(host=host, port=port)
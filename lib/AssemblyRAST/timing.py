@@ -0,0 +1,112 @@
+"""
+Per stage timing of an assembly run.
+
+A Timings collects one span per stage of a run: the seconds spent in it,
+the bytes it moved and the records it handled. Stages nest, and a span's
+seconds only count time spent in the stage itself, so the spans of a
+streaming pipeline (contigs read by one generator, hashed by a second and
+written by the loop consuming them) add up to its wall time instead of
+counting it several times over.
+"""
+import copy
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+
+class Timings(object):
+
+    def __init__(self):
+        self.spans = []
+        self._by_stage = {}
+        # time spent in nested stages, for each stage being timed
+        self._stack = []
+
+    def copy(self):
+        """A new Timings starting with the spans recorded so far."""
+        timings = Timings()
+        for span in self.spans:
+            timings.add(**span)
+        return timings
+
+    def _span(self, stage):
+        span = self._by_stage.get(stage)
+        if span is None:
+            span = {'stage': stage, 'seconds': 0.0, 'bytes': 0, 'records': 0}
+            self._by_stage[stage] = span
+            self.spans.append(span)
+        return span
+
+    def add(self, stage, seconds=0.0, bytes=0, records=0):
+        """Add to the totals of a stage timed by other means."""
+        span = self._span(stage)
+        span['seconds'] += seconds
+        span['bytes'] += bytes
+        span['records'] += records
+        return span
+
+    def _enter(self):
+        frame = [0.0]
+        self._stack.append(frame)
+        return frame, time.time()
+
+    def _exit(self, span, frame, start):
+        elapsed = time.time() - start
+        self._stack.pop()
+        span['seconds'] += elapsed - frame[0]
+        if self._stack:
+            self._stack[-1][0] += elapsed
+
+    @contextmanager
+    def span(self, stage):
+        """Time a block as stage; the span dict is yielded to fill in bytes and records."""
+        span = self._span(stage)
+        frame, start = self._enter()
+        try:
+            yield span
+        finally:
+            self._exit(span, frame, start)
+
+    def iterate(self, stage, iterable):
+        """Yield the items of iterable, timing the production of each as stage."""
+        span = self._span(stage)
+        items = iter(iterable)
+        while True:
+            frame, start = self._enter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                self._exit(span, frame, start)
+            span['records'] += 1
+            yield item
+
+    def total(self):
+        return sum(span['seconds'] for span in self.spans)
+
+    def format(self):
+        """Render the spans as report text."""
+        lines = ['Stage\tSeconds\tBytes\tRecords']
+        for span in self.spans:
+            lines.append('{}\t{:.3f}\t{}\t{}'.format(
+                span['stage'], span['seconds'], span['bytes'], span['records']))
+        lines.append('total\t{:.3f}'.format(self.total()))
+        return '\n'.join(lines) + '\n'
+
+    def log(self, name):
+        for span in self.spans:
+            logger.info('{} {}: {:.3f}s, {} bytes, {} records'.format(
+                name, span['stage'], span['seconds'], span['bytes'], span['records']))
+
+    def provenance(self, provenance, key='timings'):
+        """A copy of provenance with the spans added to its first action's custom fields."""
+        provenance = copy.deepcopy(provenance)
+        custom = provenance[0].setdefault('custom', {})
+        custom[key] = json.dumps([dict(span, seconds=round(span['seconds'], 3))
+                                  for span in self.spans], sort_keys=True)
+        return provenance
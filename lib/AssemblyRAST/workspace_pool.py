@@ -0,0 +1,103 @@
+"""
+Pooled workspace clients.
+
+Every client handed out by a WorkspacePool talks JSON-RPC to the workspace
+over a keep-alive requests session, so the get and save calls of a run
+reuse one connection instead of opening a new one (and a new TLS session)
+for each call. Clients are kept per token and shared by all threads of a
+process; a client's session is replaced once it is older than max_age
+seconds, so connections do not live forever.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from biokbase.workspace.client import ServerError
+
+
+class WorkspaceClient(object):
+    """The subset of the workspace API used by AssemblyRAST."""
+
+    def __init__(self, url, token, session=None, timeout=30 * 60):
+        self.url = url
+        self.token = token
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.created = time.time()
+
+    def _call(self, method, params):
+        body = json.dumps({'method': method,
+                           'params': params,
+                           'version': '1.1',
+                           'id': str(random.random())[2:]})
+        ret = self.session.post(self.url, data=body, timeout=self.timeout,
+                                headers={'AUTHORIZATION': self.token})
+        if ret.status_code == requests.codes.server_error:
+            if ret.headers.get('content-type') == 'application/json':
+                err = json.loads(ret.text)
+                if 'error' in err:
+                    raise ServerError(**err['error'])
+            raise ServerError('Unknown', 0, ret.text)
+        if ret.status_code != requests.codes.OK:
+            ret.raise_for_status()
+        resp = json.loads(ret.text)
+        if 'result' not in resp:
+            raise ServerError('Unknown', 0, 'An unknown server error occurred')
+        return resp['result']
+
+    def get_object_info_new(self, params):
+        return self._call('Workspace.get_object_info_new', [params])[0]
+
+    def get_object_subset(self, sub_object_ids):
+        return self._call('Workspace.get_object_subset', [sub_object_ids])[0]
+
+    def get_objects(self, object_ids):
+        return self._call('Workspace.get_objects', [object_ids])[0]
+
+    def save_objects(self, params):
+        return self._call('Workspace.save_objects', [params])[0]
+
+
+class WorkspacePool(object):
+    """
+    Hands out one WorkspaceClient per token, holding at most max_clients
+    and renewing any client older than max_age seconds.
+    """
+
+    def __init__(self, url, max_age=300, max_clients=64, timeout=30 * 60):
+        self.url = url
+        self.max_age = max_age
+        self.max_clients = max_clients
+        self.timeout = timeout
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._clients)
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=8)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get(self, token):
+        key = hashlib.sha1(token or '').hexdigest()
+        with self._lock:
+            client = self._clients.pop(key, None)
+            # retired clients are dropped rather than closed, so threads
+            # still using one can finish their calls
+            if client is None or time.time() - client.created > self.max_age:
+                client = WorkspaceClient(self.url, token, self._new_session(), self.timeout)
+            self._clients[key] = client
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        return client
@@ -2,4 +2,4 @@
 script_dir=$(dirname "$(readlink -f "$0")")
 export KB_DEPLOYMENT_CONFIG=$script_dir/../deploy.cfg
 export PYTHONPATH=$script_dir/../lib:$PATH:$PYTHONPATH
-uwsgi --master --processes 5 --threads 5 --http :5000 --wsgi-file $script_dir/../lib/AssemblyRAST/AssemblyRASTServer.py
+uwsgi --master --processes 5 --threads 5 --http :5000 --socket-timeout 60 --wsgi-file $script_dir/../lib/AssemblyRAST/server.py
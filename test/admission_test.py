@@ -0,0 +1,134 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from AssemblyRAST.admission import AdmissionController, AdmissionError
+from AssemblyRAST.owners import Owners
+
+
+class AdmissionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def controller(self, **limits):
+        # one per simulated worker process, all sharing the same state
+        owners = Owners(os.path.join(self.tmpdir, 'owners'))
+        owners.claim()
+        return AdmissionController(os.path.join(self.tmpdir, 'admission'), owners, **limits)
+
+    def test_limits(self):
+        first = self.controller(max_running=3, max_per_user=2)
+        second = self.controller(max_running=3, max_per_user=2)
+        a1 = first.try_acquire('alice')
+        a2 = second.try_acquire('alice')
+        b1 = first.try_acquire('bob')
+        # the limits cover both workers, and without queue a full house refuses
+        self.assertRaises(AdmissionError, second.try_acquire, 'carol')
+        self.assertEqual(second.status()['rejected'], 1)
+        queued = second.try_acquire('alice', queue=True)
+        self.assertEqual(queued['admitted'], None)
+        self.assertEqual(first.status('alice')['positions'], [1])
+        # a free overall slot does not help alice past her own limit
+        first.release(b1)
+        self.assertFalse(second.poll(queued))
+        first.release(a1)
+        self.assertTrue(second.poll(queued))
+        first.release(a1)
+        status = first.status('alice')
+        self.assertEqual((status['running'], status['user_running'], status['queued']), (2, 2, 0))
+        second.release(a2)
+        second.release(queued)
+        self.assertEqual(first.status()['running'], 0)
+
+    def test_fair_order(self):
+        controller = self.controller(max_running=1, max_per_user=1)
+        running = controller.try_acquire('alice')
+        tickets = [controller.try_acquire(user, queue=True)
+                   for user in ['alice', 'alice', 'alice', 'bob', 'carol']]
+        self.assertEqual([t['position'] for t in tickets], [1, 2, 3, 2, 3])
+        self.assertEqual(controller.status('alice')['positions'], [1, 4, 5])
+        self.assertEqual(controller.status('bob')['positions'], [2])
+        self.assertEqual(controller.position(tickets[4]['id']), 3)
+        order = []
+        for _ in range(5):
+            controller.release(running)
+            running, = [t for t in tickets if t not in order and controller.poll(t)]
+            order.append(running)
+        self.assertEqual([t['user'] for t in order], ['alice', 'bob', 'carol', 'alice', 'alice'])
+        self.assertEqual(controller.status()['admitted'], 6)
+
+    def test_queue_full_and_timeout(self):
+        controller = self.controller(max_running=1, max_per_user=1, max_queued=1)
+        ticket = controller.acquire('alice')
+        waiting = controller.try_acquire('bob', queue=True)
+        self.assertRaises(AdmissionError, controller.acquire, 'carol')
+        controller.max_queued = 2
+        start = time.time()
+        self.assertRaises(AdmissionError, controller.acquire, 'carol', timeout=0.1, interval=0.01)
+        self.assertTrue(time.time() - start < 1)
+        self.assertEqual(controller.status()['queued'], 1)
+        self.assertEqual(controller.status()['rejected'], 2)
+        controller.release(ticket)
+        self.assertTrue(controller.poll(waiting))
+        self.assertTrue(controller.status()['max_wait_seconds'] > 0)
+
+    def test_dead_process(self):
+        dead = self.controller(max_running=2, max_per_user=2)
+        live = self.controller(max_running=2, max_per_user=2)
+        dead.try_acquire('alice', weight=2)
+        dead.try_acquire('alice', queue=True)
+        waiting = live.try_acquire('bob', queue=True)
+        self.assertFalse(live.poll(waiting))
+        os.close(dead.owners._fd)
+        # the slots and queue places of a process that is gone are freed
+        self.assertTrue(live.poll(waiting))
+        self.assertEqual(live.status('alice')['user_running'], 0)
+        self.assertEqual(live.status()['queued'], 0)
+        live.release(waiting)
+        self.assertRaises(AdmissionError, live.poll, waiting)
+
+    def test_forked_process(self):
+        parent = self.controller(max_running=2, max_per_user=2)
+        owner = parent.owners.owner
+        read, write = os.pipe()
+        done_read, done_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # a worker forked after the controller was made, as under uwsgi
+            try:
+                os.close(read)
+                os.close(done_write)
+                ticket = parent.try_acquire('alice', weight=2)
+                os.write(write, '1' if ticket['owner'] != owner else '0')
+                os.read(done_read, 1)
+            finally:
+                os._exit(0)
+        os.close(write)
+        os.close(done_read)
+        self.assertEqual(os.read(read, 1), '1')
+        waiting = parent.try_acquire('bob', queue=True)
+        self.assertFalse(parent.poll(waiting))
+        os.close(done_write)
+        os.waitpid(pid, 0)
+        # the parent is still alive, yet the slots of its dead child are freed
+        self.assertTrue(parent.poll(waiting))
+        self.assertEqual(parent.status('alice')['user_running'], 0)
+        self.assertEqual(parent.owners.owner, owner)
+
+    def test_weight(self):
+        controller = self.controller(max_running=4, max_per_user=3)
+        ticket = controller.try_acquire('alice', weight=5)
+        self.assertEqual(ticket['weight'], 3)
+        self.assertEqual(controller.status()['running'], 3)
+        controller.try_acquire('bob')
+        self.assertEqual(controller.status()['running'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
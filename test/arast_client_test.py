@@ -0,0 +1,136 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from AssemblyRAST.arast_client import (ARASTClient, ARASTCommandClient, ARASTError,
+                                       normalize_url, user_from_token)
+from fake_arast import FakeARASTServer, DEFAULT_CONTIGS
+
+TOKEN = 'un=tester|tokenid=abc|expiry=1'
+
+
+class ARASTClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeARASTServer()
+        self.url = self.server.start()
+        self.client = ARASTClient(self.url, TOKEN)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_normalize_url(self):
+        self.assertEqual(normalize_url('140.221.67.209'), 'http://140.221.67.209:8000/')
+        self.assertEqual(normalize_url('https://arast.example:443/api'),
+                         'https://arast.example:443/api/')
+
+    def test_user_from_token(self):
+        self.assertEqual(user_from_token(TOKEN), 'tester')
+        self.assertIsNone(user_from_token('opaque-token'))
+        self.assertRaises(ValueError, ARASTClient, self.url, 'opaque-token')
+
+    def test_submit_and_retrieve(self):
+        job_id = self.client.submit_job('kiki', {'paired_end_libs': []})
+        self.assertEqual(job_id, '1')
+        self.assertEqual(self.server.jobs[job_id]['data']['pipeline'], [['kiki']])
+        self.assertEqual(self.client.wait_for_job(job_id, interval=0), 'Complete')
+        self.assertEqual(self.client.get_job_log(job_id), self.server.log)
+        self.assertEqual(self.client.get_job_report(job_id), self.server.report)
+
+        path = os.path.join(self.tmpdir, 'contigs.fa')
+        nbytes = self.client.download_contigs(job_id, path, chunk_size=7)
+        self.assertEqual(nbytes, len(DEFAULT_CONTIGS))
+        with open(path) as f:
+            self.assertEqual(f.read(), DEFAULT_CONTIGS)
+        self.assertTrue(all(token == TOKEN for _, _, token in self.server.requests))
+
+    def test_fetch_results(self):
+        job_id = self.client.submit_job('kiki', {})
+        paths = self.client.fetch_results(job_id, self.tmpdir, chunk_size=5)
+        expected = {'log': self.server.log, 'report': self.server.report,
+                    'contigs': DEFAULT_CONTIGS}
+        self.assertEqual(sorted(paths), sorted(expected))
+        for name, content in expected.items():
+            self.assertEqual(os.path.dirname(paths[name]), self.tmpdir)
+            with open(paths[name]) as f:
+                self.assertEqual(f.read(), content)
+
+        self.assertRaises(ARASTError, self.client.fetch_results, '999', self.tmpdir)
+
+    def test_failed_job(self):
+        self.server.final_status = '[FAIL] assembler crashed'
+        job_id = self.client.submit_job('velvet', {})
+        self.assertRaises(ARASTError, self.client.wait_for_job, job_id, interval=0)
+
+    def test_wait_timeout(self):
+        self.server.final_status = 'Running'
+        job_id = self.client.submit_job('kiki', {})
+        start = time.time()
+        self.assertRaises(ARASTError, self.client.wait_for_job, job_id,
+                          interval=0.01, max_interval=0.05, timeout=0.3)
+        self.assertTrue(time.time() - start < 1)
+
+    def test_unknown_job(self):
+        self.assertRaises(ARASTError, self.client.get_job_log, '999')
+
+
+class ARASTCommandClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeARASTServer()
+        self.url = self.server.start()
+        self.tmpdir = tempfile.mkdtemp()
+        self.bindir = self.server.write_commands(tempfile.mkdtemp())
+        self.path = os.environ['PATH']
+        os.environ['PATH'] = self.bindir + os.pathsep + self.path
+        self.client = ARASTCommandClient(self.url, TOKEN)
+
+    def tearDown(self):
+        os.environ['PATH'] = self.path
+        self.server.stop()
+        shutil.rmtree(self.tmpdir)
+        shutil.rmtree(self.bindir)
+
+    def test_submit_and_retrieve(self):
+        job_id = self.client.submit_job('kiki', {'paired_end_libs': []})
+        self.assertEqual(job_id, '1')
+        self.assertEqual(self.server.jobs[job_id]['data'],
+                         {'assemblers': ['kiki'], 'kbase_assembly_input': {'paired_end_libs': []}})
+        self.assertEqual(self.client.wait_for_job(job_id), 'Complete')
+        paths = self.client.fetch_results(job_id, self.tmpdir)
+        # the log ar-get -w printed is kept rather than fetched again
+        self.assertEqual([path for _, path, _ in self.server.requests if path.endswith('/log')],
+                         ['/user/tester/job/1/log'])
+        expected = {'log': self.server.log, 'report': self.server.report,
+                    'contigs': DEFAULT_CONTIGS}
+        self.assertEqual(sorted(paths), sorted(expected))
+        for name, content in expected.items():
+            with open(paths[name]) as f:
+                self.assertEqual(f.read(), content)
+        # the token only reaches the commands, not this process
+        self.assertTrue(all(token == TOKEN for _, _, token in self.server.requests))
+        self.assertNotEqual(os.environ.get('KB_AUTH_TOKEN'), TOKEN)
+
+    def test_failures(self):
+        self.server.final_status = '[FAIL] assembler crashed'
+        job_id = self.client.submit_job('velvet', {})
+        self.assertRaises(ARASTError, self.client.wait_for_job, job_id)
+        self.assertRaises(ARASTError, self.client.fetch_results, '999', self.tmpdir)
+        os.environ['PATH'] = self.path
+        client = ARASTCommandClient(self.url, TOKEN)
+        self.assertRaises(ARASTError, client.get_job_status, job_id)
+
+    def test_wait_timeout(self):
+        self.server.final_status = 'Running'
+        job_id = self.client.submit_job('kiki', {})
+        start = time.time()
+        self.assertRaises(ARASTError, self.client.wait_for_job, job_id, timeout=0.5)
+        self.assertTrue(time.time() - start < 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
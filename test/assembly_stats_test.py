@@ -0,0 +1,67 @@
+import random
+import unittest
+
+from AssemblyRAST.assembly_stats import AssemblyStats, format_stats, stats_metadata
+
+
+def nx(lengths, target):
+    # the plain definition: walk the contigs longest first
+    total = 0
+    for i, length in enumerate(sorted(lengths, reverse=True)):
+        total += length
+        if total >= target:
+            return length, i + 1
+    return 0, 0
+
+
+class AssemblyStatsTest(unittest.TestCase):
+
+    def test_small_assembly(self):
+        stats = AssemblyStats(genome_size=100, block_bytes=10)
+        for seq in ['ACGT' * 10, 'GGGGNNNN', 'AT' * 20, 'cc']:
+            stats.add(seq)
+        summary = stats.summary()
+        self.assertEqual((summary['contigs'], summary['total_length'], summary['largest_contig']),
+                         (4, 90, 40))
+        self.assertEqual((summary['N50'], summary['L50'], summary['N90'], summary['L90']),
+                         (40, 2, 8, 3))
+        self.assertEqual((summary['NG50'], summary['LG50']), (40, 2))
+        self.assertAlmostEqual(summary['GC'], 100.0 * 26 / 86)
+        self.assertEqual(summary['N_count'], 4)
+        self.assertEqual(summary['median_length'], 24.0)
+        self.assertEqual(stats_metadata(summary)['N50'], '40')
+        self.assertTrue('NG50: 40 bp' in format_stats(summary))
+
+    def test_matches_plain_computation(self):
+        rng = random.Random(7)
+        lengths = [rng.randint(200, 60000) for _ in range(2000)]
+        stats = AssemblyStats(genome_size=sum(lengths) * 2, block_bytes=1 << 16)
+        for length in lengths:
+            stats.add('A' * length)
+        summary = stats.summary()
+        total = sum(lengths)
+        self.assertEqual((summary['N50'], summary['L50']), nx(lengths, total * 0.5))
+        self.assertEqual((summary['N90'], summary['L90']), nx(lengths, total * 0.9))
+        # half the genome size is the whole assembly, reached at the last contig
+        self.assertEqual((summary['NG50'], summary['LG50']), (min(lengths), len(lengths)))
+        for size_class in summary['size_classes']:
+            longer = [n for n in lengths if n >= size_class['min_length']]
+            self.assertEqual(size_class['contigs'], len(longer))
+            self.assertEqual(size_class['total_length'], sum(longer))
+        self.assertEqual(summary['GC'], 0.0)
+
+    def test_genome_not_reached(self):
+        stats = AssemblyStats(genome_size=1000)
+        stats.add('ACGT')
+        summary = stats.summary()
+        self.assertEqual((summary['NG50'], summary['LG50']), (0, 0))
+
+    def test_empty(self):
+        summary = AssemblyStats().summary()
+        self.assertEqual((summary['contigs'], summary['total_length']), (0, 0))
+        self.assertFalse('N50' in summary)
+        format_stats(summary)
+
+
+if __name__ == '__main__':
+    unittest.main()
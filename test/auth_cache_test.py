@@ -0,0 +1,45 @@
+import time
+import unittest
+
+from AssemblyRAST.server import CachingAuthClient
+
+
+class CountingAuthClient(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    def validate_token(self, token):
+        self.calls += 1
+        if 'bad' in token:
+            raise Exception('invalid token')
+        return token.split('|')[0][len('un='):], None, None
+
+
+class CachingAuthClientTest(unittest.TestCase):
+
+    def test_cached(self):
+        client = CountingAuthClient()
+        auth = CachingAuthClient(client, ttl=60, negative_ttl=60)
+        for _ in range(3):
+            self.assertEqual(auth.validate_token('un=alice|token')[0], 'alice')
+            self.assertRaises(Exception, auth.validate_token, 'un=bob|bad')
+        self.assertEqual(client.calls, 2)
+        self.assertEqual(auth.stats(), {'size': 2, 'hits': 4, 'misses': 2})
+
+    def test_token_expiry(self):
+        client = CountingAuthClient()
+        auth = CachingAuthClient(client, ttl=60)
+        # an expired token is never cached, one about to expire only briefly
+        for _ in range(2):
+            auth.validate_token('un=alice|expiry={}'.format(int(time.time()) - 10))
+        self.assertEqual(client.calls, 2)
+        token = 'un=alice|expiry={}'.format(int(time.time()) + 1)
+        auth.validate_token(token)
+        time.sleep(1.1)
+        auth.validate_token(token)
+        self.assertEqual(client.calls, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Compare serial contig hashing with md5_contigs on a thread pool.
+
+Generates a synthetic assembly file, then for each thread count reads it
+with filter_fasta and hashes every contig with md5_contigs, as
+arast_save_contigs does, reporting the best wall time of --repeat runs.
+Parsing is counted too, since the point of the pool is to hash one batch
+while the next is parsed. contig-hash-threads should only be turned on
+where this shows a gain on the production hosts.
+
+    python checksum_benchmark.py [--mb M] [--length L] [--threads 0,2,4]
+                                 [--batch-mb B] [--repeat R]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from AssemblyRAST.checksum import md5_contigs
+from AssemblyRAST.fasta import filter_fasta
+
+
+def make_assembly(path, mb, length, line_width=60):
+    rng = random.Random(42)
+    pool = ''.join(rng.choice('ACGT') for _ in range(max(1 << 16, 2 * length)))
+    written = 0
+    i = 0
+    with open(path, 'w') as f:
+        while written < mb << 20:
+            start = rng.randint(0, len(pool) - length - 1)
+            seq = pool[start:start + length]
+            f.write('>contig_{} length={}\n'.format(i, length))
+            f.write('\n'.join(seq[j:j + line_width] for j in range(0, length, line_width)))
+            f.write('\n')
+            written += length
+            i += 1
+
+
+def hash_file(path, threads, batch_bytes):
+    with open(path) as f:
+        count = 0
+        for _ in md5_contigs(filter_fasta(f, 0), threads, batch_bytes):
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--mb', type=int, default=300, help='megabytes of sequence')
+    parser.add_argument('--length', type=int, default=100000, help='contig length')
+    parser.add_argument('--threads', default='0,2,4')
+    parser.add_argument('--batch-mb', type=int, default=64)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, 'contigs.fa')
+        make_assembly(path, args.mb, args.length)
+        print('{} MB of sequence in {} bp contigs, {} CPUs'.format(
+            args.mb, args.length, multiprocessing.cpu_count()))
+        for threads in [int(t) for t in args.threads.split(',')]:
+            best = None
+            for _ in range(args.repeat):
+                start = time.time()
+                hash_file(path, threads, args.batch_mb << 20)
+                elapsed = time.time() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print('{:>3} threads: {:.2f} s'.format(threads, best))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+import hashlib
+import unittest
+
+from AssemblyRAST.checksum import AssemblyDigest, md5_contigs
+
+
+def digest_of(seqs):
+    digest = AssemblyDigest()
+    for seq in seqs:
+        digest.update(hashlib.md5(seq).hexdigest())
+    return digest.hexdigest()
+
+
+class ChecksumTest(unittest.TestCase):
+
+    def test_assembly_digest(self):
+        seqs = ['ACGT', 'GGCC', 'TTTTA']
+        self.assertEqual(digest_of(seqs), digest_of(reversed(seqs)))
+        self.assertNotEqual(digest_of(seqs), digest_of(seqs[:2]))
+        self.assertNotEqual(digest_of(seqs), digest_of(seqs + ['ACGT']))
+        self.assertEqual(len(digest_of([])), 32)
+        self.assertEqual(digest_of(['ACGT']), hashlib.md5('ACGT').hexdigest())
+
+    def test_md5_contigs(self):
+        records = [('c{}'.format(i), 'c{} desc'.format(i), 'ACGT' * i) for i in range(50)]
+        expected = [r + (hashlib.md5(r[2]).hexdigest(),) for r in records]
+        self.assertEqual(list(md5_contigs(iter(records))), expected)
+        self.assertEqual(list(md5_contigs(iter(records), threads=2, batch_bytes=100)),
+                         expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+Weigh the CPU cost of compressing RPC bodies against the bandwidth saved.
+
+Builds the JSON bodies the service actually moves: a ContigSet-sized
+response (random sequence, which compresses the least), a job state poll
+and a run request with large extra_params. Each is compressed with gzip and
+deflate at several levels. For each one the benchmark prints the size
+ratio, the compress and decompress time, and the time to move the body
+over links of the given bandwidths compared with sending it as is. The
+transfer time counts compression, sending the compressed bytes and
+decompression.
+
+    python compression_benchmark.py [--contigs N] [--levels 1,6,9]
+                                    [--mbits 10,100,1000] [--output FILE]
+"""
+import argparse
+import json
+import random
+import time
+
+from AssemblyRAST import compression
+
+
+def contigset_response(contigs, length=2000):
+    rng = random.Random(42)
+    pool = ''.join(rng.choice('ACGT') for _ in range(1 << 16))
+    data = {'id': 'kiki.contigset', 'name': 'contigs', 'source': 'ARAST',
+            'contigs': []}
+    for i in range(contigs):
+        start = rng.randint(0, len(pool) - length)
+        seq = pool[start:start + length]
+        data['contigs'].append({'id': 'NODE_{}'.format(i), 'name': 'NODE_{}'.format(i),
+                                'description': 'NODE_{} length={}'.format(i, length),
+                                'length': length, 'md5': '%032x' % rng.getrandbits(128),
+                                'sequence': seq})
+    return json.dumps({'version': '1.1', 'id': '1', 'result': [data]})
+
+
+def poll_response():
+    return json.dumps({'version': '1.1', 'id': '1', 'result': [{
+        'job_id': '58b7f4f3e4b0d4c7a2b2b7b4', 'finished': 0, 'job_state': 'in-progress',
+        'position': 3, 'ujs_url': 'https://kbase.us/services/userandjobstate/'}]})
+
+
+def run_request(extra_params=2000):
+    return json.dumps({'version': '1.1', 'id': '1', 'method': 'AssemblyRAST.run_spades',
+                       'params': [{'workspace_name': 'ws', 'read_library_name': 'reads',
+                                   'output_contigset_name': 'contigs',
+                                   'extra_params': ['--careful', '-k', '21,33,55,77'] *
+                                   (extra_params // 4)}]})
+
+
+def best_time(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        result = func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def measure(body, encoding, level, mbits):
+    packed, compress_seconds = best_time(lambda: compression.compress(body, encoding, level))
+    _, decompress_seconds = best_time(lambda: compression.decompress(packed, encoding))
+    result = {'encoding': encoding, 'level': level,
+              'bytes': len(body), 'compressed_bytes': len(packed),
+              'ratio': round(len(packed) / float(len(body)), 3),
+              'compress_ms': round(compress_seconds * 1000, 3),
+              'decompress_ms': round(decompress_seconds * 1000, 3),
+              'transfer_ms': {}}
+    for rate in mbits:
+        bytes_per_second = rate * 1e6 / 8
+        plain = len(body) / bytes_per_second
+        packed_time = compress_seconds + len(packed) / bytes_per_second + decompress_seconds
+        result['transfer_ms'][str(rate)] = {'plain': round(plain * 1000, 3),
+                                            'compressed': round(packed_time * 1000, 3)}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--contigs', type=int, default=5000,
+                        help='contigs in the ContigSet response')
+    parser.add_argument('--levels', default='1,6,9')
+    parser.add_argument('--mbits', default='10,100,1000',
+                        help='link bandwidths to compare, in Mbit/s')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+    levels = [int(l) for l in args.levels.split(',')]
+    mbits = [float(m) for m in args.mbits.split(',')]
+
+    bodies = [('contigset response', contigset_response(args.contigs)),
+              ('run request', run_request()),
+              ('job poll response', poll_response())]
+    results = {}
+    print('{:<20} {:>10} {:<8} {:>5} {:>6} {:>10} {:>10}'.format(
+        'body', 'bytes', 'coding', 'level', 'ratio', 'comp ms', 'decomp ms') +
+        ''.join('{:>18}'.format('{:g} Mbit/s ms'.format(m)) for m in mbits))
+    for name, body in bodies:
+        results[name] = []
+        for encoding in compression.ENCODINGS:
+            for level in levels:
+                r = measure(body, encoding, level, mbits)
+                results[name].append(r)
+                row = '{:<20} {:>10} {:<8} {:>5} {:>6.3f} {:>10.3f} {:>10.3f}'.format(
+                    name, r['bytes'], encoding, level, r['ratio'],
+                    r['compress_ms'], r['decompress_ms'])
+                for m in mbits:
+                    t = r['transfer_ms'][str(m)]
+                    row += '{:>18}'.format('{:.1f} vs {:.1f}'.format(t['compressed'], t['plain']))
+                print(row)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
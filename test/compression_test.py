@@ -0,0 +1,121 @@
+import json
+import threading
+import unittest
+import zlib
+from StringIO import StringIO
+from wsgiref.simple_server import make_server, WSGIRequestHandler
+
+from AssemblyRAST import compression
+from AssemblyRAST.client import AssemblyRAST as AssemblyRASTClient
+from AssemblyRAST.server import Application, JobServiceClient, application
+from fake_job_service import FakeJobService
+
+
+class QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+class CompressionTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        data = json.dumps([{'sequence': 'ACGT' * 1000, 'id': i} for i in range(20)])
+        for encoding in compression.ENCODINGS:
+            packed = compression.compress(data, encoding)
+            self.assertTrue(len(packed) < len(data) / 10)
+            self.assertEqual(compression.decompress(packed, encoding), data)
+        # deflate without the zlib header
+        raw = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        self.assertEqual(compression.decompress(raw.compress(data) + raw.flush(), 'deflate'), data)
+        packed = compression.compress('x' * 10000)
+        self.assertRaises(compression.DecompressedTooLarge,
+                          compression.decompress, packed, 'gzip', 9999)
+        self.assertEqual(compression.decompress(packed, 'gzip', 10000), 'x' * 10000)
+        self.assertRaises(zlib.error, compression.decompress, 'not gzip', 'gzip')
+
+    def test_accepted_encoding(self):
+        self.assertEqual(compression.accepted_encoding('gzip, deflate'), 'gzip')
+        self.assertEqual(compression.accepted_encoding('deflate;q=1, gzip;q=0.5'), 'deflate')
+        self.assertEqual(compression.accepted_encoding('gzip;q=0, br'), None)
+        self.assertEqual(compression.accepted_encoding('*'), 'gzip')
+        self.assertEqual(compression.accepted_encoding(None), None)
+
+    def call(self, app, body, **headers):
+        environ = {'REQUEST_METHOD': 'POST', 'REMOTE_ADDR': '127.0.0.1',
+                   'CONTENT_LENGTH': str(len(body)), 'wsgi.input': StringIO(body),
+                   'HTTP_AUTHORIZATION': 'un=alice|token'}
+        environ.update(headers)
+        started = []
+        response = ''.join(app(environ, lambda status, headers: started.append((status, headers))))
+        return started[0][0], dict(started[0][1]), response
+
+    def test_server(self):
+        app = Application()
+        app.compress_min_size = 500
+        app.max_request_size = 5000
+        rpc = {'version': '1.1', 'id': '1', 'method': 'AssemblyRAST.get_queue_status', 'params': []}
+        batch = json.dumps([dict(rpc, id=str(i)) for i in range(10)])
+
+        # a gzipped request and response
+        status, headers, body = self.call(app, compression.compress(batch),
+                                          HTTP_CONTENT_ENCODING='gzip',
+                                          HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['content-length'], str(len(body)))
+        self.assertEqual(len(json.loads(compression.decompress(body, 'gzip'))), 10)
+
+        # no compression unless asked for, or below the threshold
+        status, headers, body = self.call(app, batch)
+        self.assertFalse('Content-Encoding' in headers)
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(len(json.loads(body)), 10)
+        status, headers, body = self.call(app, json.dumps(rpc), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse('Content-Encoding' in headers)
+        json.loads(body)
+
+        status, _, body = self.call(app, 'x', HTTP_CONTENT_ENCODING='br')
+        self.assertEqual(status, '415 Unsupported Media Type')
+        status, _, body = self.call(app, compression.compress(' ' * 6000),
+                                    HTTP_CONTENT_ENCODING='gzip')
+        self.assertEqual(status, '413 Request Entity Too Large')
+        status, _, body = self.call(app, 'not gzip', HTTP_CONTENT_ENCODING='gzip')
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(json.loads(body)['error']['code'], -32600)
+
+    def test_clients(self):
+        # AssemblyRASTClient against the server, both ways compressed
+        min_size = application.compress_min_size
+        application.compress_min_size = 10
+        httpd = make_server('127.0.0.1', 0, application, handler_class=QuietHandler)
+        thread = threading.Thread(target=httpd.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            client = AssemblyRASTClient('http://127.0.0.1:{}/'.format(httpd.server_address[1]),
+                                        token='un=alice|token', compress_min_size=10)
+            status = client.get_queue_status()
+            self.assertEqual(status['user_running'], 0)
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+            application.compress_min_size = min_size
+
+        # JobServiceClient only compresses when configured to
+        service = FakeJobService()
+        url = service.start()
+        try:
+            params = {'method': 'AssemblyRAST.run_kiki', 'params': [{'x': 'y' * 2000}]}
+            JobServiceClient(token='token', url=url).run_job(params)
+            self.assertEqual(service.compressed, 0)
+            job_id = JobServiceClient(token='token', url=url,
+                                      compress_min_size=1024).run_job(params)
+            self.assertEqual(service.compressed, 1)
+            self.assertEqual(service.jobs[job_id]['params'], params)
+        finally:
+            service.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from AssemblyRAST.AssemblyRASTImpl import AssemblyRAST
+from fake_arast import FakeARASTServer
+from fake_workspace import FakeWorkspaceServer
+
+
+RUNS = 24
+
+
+def owner(token):
+    return token.split('|')[0][len('un='):]
+
+
+def user_contigs(job):
+    # each user gets contigs named after them, so any mix-up shows
+    return ''.join('>{}_contig_{} length=400\n{}\n'.format(job['user'], i, 'ACGT' * 100)
+                   for i in range(3))
+
+
+class ConcurrentRunsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.arast = FakeARASTServer(contigs=user_contigs, polls_until_done=0)
+        self.workspace = FakeWorkspaceServer()
+        self.bindir = self.arast.write_commands(tempfile.mkdtemp())
+        self.path = os.environ['PATH']
+        os.environ['PATH'] = self.bindir + os.pathsep + self.path
+        self.impl = AssemblyRAST({'workspace-url': self.workspace.start(),
+                                  'arast-url': self.arast.start(),
+                                  'scratch': self.scratch,
+                                  'contig-hash-threads': 0,
+                                  # wait mode turns away runs beyond the limit
+                                  'admission-max-running': RUNS})
+
+    def tearDown(self):
+        os.environ['PATH'] = self.path
+        shutil.rmtree(self.bindir)
+        self.arast.stop()
+        self.workspace.stop()
+        shutil.rmtree(self.scratch)
+
+    def run_job(self, i, outputs, errors):
+        user = 'user{}'.format(i)
+        params = {'workspace_name': 'ws', 'read_library_name': 'reads',
+                  'output_contigset_name': 'contigs.' + user, 'min_contig_len': 300}
+        ctx = {'token': 'un={}|token{}'.format(user, i), 'user_id': user,
+               'provenance': [{'service': 'AssemblyRAST', 'method': 'run_kiki',
+                               'method_params': [params]}]}
+        try:
+            outputs[user] = self.impl.arast_run(ctx, params, 'kiki')
+        except Exception as e:
+            errors.append(e)
+
+    def test_simultaneous_runs(self):
+        outputs = {}
+        errors = []
+        threads = [threading.Thread(target=self.run_job, args=(i, outputs, errors))
+                   for i in range(RUNS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(outputs), RUNS)
+
+        # every ARAST job was submitted and fetched with its own user's token
+        self.assertEqual(len(self.arast.jobs), RUNS)
+        for job in self.arast.jobs.values():
+            self.assertEqual(job['token'], 'un={}|token{}'.format(job['user'], job['user'][4:]))
+        for method, path, token in self.arast.requests:
+            self.assertTrue(path.startswith('/user/{}/'.format(owner(token))))
+
+        # every object was saved with its own user's token and contigs
+        saved = dict((obj['name'], obj) for obj in self.workspace.saved)
+        for user in outputs:
+            contigset = saved['contigs.' + user]['data']
+            self.assertEqual([c['id'] for c in contigset['contigs']],
+                             ['{}_contig_{}'.format(user, i) for i in range(3)])
+            provenance = saved['contigs.' + user]['provenance']
+            self.assertEqual(provenance[0]['method_params'][0]['output_contigset_name'],
+                             'contigs.' + user)
+            self.assertEqual(provenance[0]['input_ws_objects'], ['ws/reads'])
+            self.assertEqual(saved['contigs.' + user]['meta']['N50'], '400')
+        for _, token, request in self.workspace.requests:
+            if request['method'] == 'Workspace.save_objects':
+                for obj in request['params'][0]['objects']:
+                    if obj['type'] == 'KBaseReport.Report':
+                        job_id = obj['name'].rsplit('.', 1)[1]
+                        self.assertEqual(self.arast.jobs[job_id]['user'], owner(token))
+                        self.assertTrue('Timings' in obj['data']['text_message'])
+                        spans = json.loads(obj['provenance'][0]['custom']['timings'])
+                        self.assertEqual(spans[-1]['stage'], 'save')
+                    else:
+                        self.assertEqual(obj['name'], 'contigs.' + owner(token))
+
+        # every run gave back its admission slot
+        self.assertEqual(self.impl.admission.status()['running'], 0)
+        self.assertEqual(self.impl.admission.status()['admitted'], RUNS)
+
+        # and every run cleaned up its own output directory
+        self.assertEqual([d for d in os.listdir(self.scratch) if d.startswith('output.')], [])
+
+    def test_queued_runs(self):
+        impl = AssemblyRAST({'workspace-url': self.impl.workspaceURL,
+                             'arast-url': self.impl.arastURL,
+                             'scratch': self.scratch,
+                             'arast-submit-mode': 'poll',
+                             'arast-poll-initial-delay': 0,
+                             'admission-max-running': 1,
+                             'admission-poll-interval': 0.05})
+        # the first run is held in its ARAST queue until the others have queued
+        release = threading.Event()
+        status = self.arast.final_status
+        self.arast.final_status = lambda job: status if release.is_set() else 'Queued'
+        outputs = []
+        for i in range(3):
+            user = 'user{}'.format(i)
+            params = {'workspace_name': 'ws', 'read_library_name': 'reads',
+                      'output_contigset_name': 'contigs.' + user}
+            ctx = {'token': 'un={}|token{}'.format(user, i), 'user_id': user,
+                   'provenance': [{'service': 'AssemblyRAST', 'method': 'run_kiki',
+                                   'method_params': [params]}]}
+            outputs.append((ctx, impl.arast_run(ctx, params, 'kiki')))
+
+        # the request returns at once with the place in the queue
+        self.assertEqual([output['queue_position'] for _, output in outputs], [0, 1, 2])
+        self.assertEqual(len(self.arast.jobs), 1)
+        ctx, output = outputs[2]
+        state = impl.check_assembly_job(ctx, output['arast_job_id'])[0]
+        self.assertEqual((state['state'], state['queue_position']), ('queued', 2))
+        self.assertEqual(impl.get_queue_status(ctx)[0]['positions'], [2])
+
+        release.set()
+        deadline = time.time() + 30
+        for ctx, output in outputs:
+            while impl.check_assembly_job(ctx, output['arast_job_id'])[0]['state'] != 'done':
+                self.assertTrue(time.time() < deadline, 'timed out')
+                time.sleep(0.05)
+        self.assertEqual(len(self.arast.jobs), 3)
+        self.assertEqual(sorted(obj['name'] for obj in self.workspace.saved
+                                if obj['type'] == 'KBaseGenomes.ContigSet'),
+                         ['contigs.user0', 'contigs.user1', 'contigs.user2'])
+        status = impl.admission.status()
+        self.assertEqual((status['running'], status['queued'], status['admitted']), (0, 0, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from biokbase.workspace.client import ServerError
+from AssemblyRAST.contigset import ContigSetWriter, save_object_from_file
+from fake_workspace import FakeWorkspaceServer, WSID
+
+
+class ContigSetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'contigset.json')
+        self.workspace = FakeWorkspaceServer()
+        self.url = self.workspace.start()
+
+    def tearDown(self):
+        self.workspace.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def write_contigset(self, contigs):
+        with ContigSetWriter(self.path, WSID, 'contigs', 'kiki.contigset', 'src', 'none',
+                             [{'service': 'AssemblyRAST'}]) as writer:
+            for contig in contigs:
+                writer.add(contig)
+            writer.meta['contigs'] = str(len(contigs))
+            writer.close(md5='abc')
+        return writer
+
+    def test_write_and_save(self):
+        contigs = [{'id': 'c{}'.format(i), 'length': i, 'sequence': 'A' * i}
+                   for i in range(1, 4)]
+        writer = self.write_contigset(contigs)
+        self.assertEqual(writer.count, 3)
+
+        info = save_object_from_file(self.url, 'token', self.path)
+        self.assertEqual(info[6], WSID)
+        _, token, request = self.workspace.requests[0]
+        self.assertEqual(token, 'token')
+        self.assertEqual(request['method'], 'Workspace.save_objects')
+        self.assertEqual(request['params'][0]['id'], WSID)
+        obj = self.workspace.saved[0]
+        self.assertEqual(obj['type'], 'KBaseGenomes.ContigSet')
+        self.assertEqual(obj['name'], 'contigs')
+        self.assertEqual(obj['provenance'], [{'service': 'AssemblyRAST'}])
+        self.assertEqual(obj['meta'], {'contigs': '3'})
+        self.assertEqual(obj['data'], {'id': 'kiki.contigset', 'source': 'src',
+                                       'source_id': 'none', 'md5': 'abc',
+                                       'contigs': contigs})
+
+    def test_empty_and_error(self):
+        self.write_contigset([])
+        with open(self.path) as f:
+            self.assertEqual(json.load(f)['params'][0]['objects'][0]['data']['contigs'], [])
+        self.workspace.fail = True
+        self.assertRaises(ServerError, save_object_from_file, self.url, 'token', self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import httplib
+import json
+import socket
+import threading
+import time
+import unittest
+
+from AssemblyRAST.event_server import EventServer
+
+
+class EventServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+        self.release = threading.Event()
+        self.server = None
+
+    def tearDown(self):
+        self.release.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.thread.join(5)
+
+    def app(self, environ, start_response):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            body = environ['wsgi.input'].read(int(environ.get('CONTENT_LENGTH') or 0))
+            if environ['PATH_INFO'] == '/wait':
+                self.release.wait(5)
+            if environ['PATH_INFO'] == '/fail':
+                raise ValueError('boom')
+            response = '{} {} {}'.format(environ['REQUEST_METHOD'], environ['PATH_INFO'], body)
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [response]
+        finally:
+            with self.lock:
+                self.running -= 1
+
+    def start(self, **kwargs):
+        self.server = EventServer(self.app, '127.0.0.1', 0, **kwargs)
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={'poll_interval': 0.05})
+        self.thread.daemon = True
+        self.thread.start()
+        return self.server.server_port
+
+    def request(self, conn, path, body=''):
+        conn.request('POST', path, body)
+        resp = conn.getresponse()
+        return resp.status, resp.read()
+
+    def test_keep_alive(self):
+        port = self.start(workers=2)
+        conn = httplib.HTTPConnection('127.0.0.1', port)
+        self.assertEqual(self.request(conn, '/a', 'x' * 100000), (200, 'POST /a ' + 'x' * 100000))
+        self.assertEqual(self.request(conn, '/b'), (200, 'POST /b '))
+        self.assertEqual(self.request(conn, '/fail')[0], 500)
+        self.assertEqual(self.request(conn, '/c', 'y'), (200, 'POST /c y'))
+        conn.close()
+
+    def test_bounded_workers(self):
+        port = self.start(workers=2, max_pending=4)
+        # many idle connections and a slow upload take no worker
+        idle = [socket.create_connection(('127.0.0.1', port)) for _ in range(50)]
+        slow = socket.create_connection(('127.0.0.1', port))
+        slow.sendall('POST /slow HTTP/1.1\r\nContent-Length: 10\r\n\r\n12345')
+        results = []
+
+        def call():
+            conn = httplib.HTTPConnection('127.0.0.1', port, timeout=10)
+            results.append(self.request(conn, '/wait'))
+            conn.close()
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for t in threads:
+            t.start()
+        deadline = time.time() + 5
+        while self.server.pending < 4 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.max_running, 2)
+        # the fifth request is turned away while four are pending
+        conn = httplib.HTTPConnection('127.0.0.1', port)
+        self.assertEqual(self.request(conn, '/a')[0], 503)
+        self.release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual([r[0] for r in results], [200] * 4)
+        self.assertEqual(self.max_running, 2)
+        slow.sendall('67890')
+        self.assertTrue(slow.recv(4096).endswith('POST /slow 1234567890'))
+        for s in idle + [slow]:
+            s.close()
+
+    def test_application(self):
+        # the service's own Application, as server.py --event-loop serves it
+        from AssemblyRAST.server import Application
+        self.app = Application()
+        port = self.start(workers=2)
+        conn = httplib.HTTPConnection('127.0.0.1', port)
+        conn.request('POST', '/', json.dumps(
+            {'method': 'AssemblyRAST.get_queue_status', 'params': [], 'version': '1.1', 'id': '1'}),
+            {'Authorization': 'un=alice|token'})
+        resp = conn.getresponse()
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(json.loads(resp.read())['result'][0]['user_running'], 0)
+        conn.close()
+
+    def test_limits(self):
+        port = self.start(max_request_size=10, read_timeout=0.2)
+        conn = httplib.HTTPConnection('127.0.0.1', port)
+        self.assertEqual(self.request(conn, '/a', 'x' * 11)[0], 413)
+        conn.close()
+        stalled = socket.create_connection(('127.0.0.1', port))
+        stalled.sendall('POST /a HTTP/1.1\r\nContent-Length: 5\r\n\r\n12')
+        stalled.settimeout(5)
+        self.assertTrue(stalled.recv(4096).startswith('HTTP/1.1 408'))
+        stalled.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+"""
+Local stand-in for the ARAST REST service, for offline tests.
+
+Jobs are kept in memory. A job reports a running status for the first
+`polls_until_done` status requests and 'Complete' afterwards, then serves
+the configured log, report and contigs. contigs and final_status may also
+be functions of the job (a dict with its user, token and submitted data),
+and a large assembly can be streamed from contigs_file instead.
+
+write_commands() puts stand-ins for the kbase/assembly ar-run, ar-stat and
+ar-get commands in a directory. They take ARAST_URL and KB_AUTH_TOKEN from
+their environment, like the real commands, and serve the jobs of this
+server.
+"""
+import BaseHTTPServer
+import SocketServer
+import json
+import os
+import re
+import shutil
+import stat
+import sys
+import threading
+
+
+DEFAULT_CONTIGS = ('>contig_1 length=12\nACGTACGTACGT\n'
+                   '>contig_2 length=4\nACGT\n'
+                   '>contig_3 length=10\nGGGCCCAAAT\n')
+
+_COMMAND = r'''#!{python}
+import json, os, re, shutil, sys, time, urllib2
+
+url = os.environ['ARAST_URL'].rstrip('/') + '/'
+token = os.environ['KB_AUTH_TOKEN']
+user = re.search(r'un=([^|]+)', token).group(1)
+command = os.path.basename(sys.argv[0])
+args = sys.argv[1:]
+
+
+def call(path, data=None):
+    request = urllib2.Request('{{}}user/{{}}/job/{{}}'.format(url, user, path), data,
+                              {{'Authorization': token}})
+    try:
+        return urllib2.urlopen(request)
+    except urllib2.HTTPError as e:
+        sys.stderr.write('Error: {{}}\n'.format(e))
+        sys.exit(1)
+
+
+job_id = args[args.index('-j') + 1] if '-j' in args else None
+if command == 'ar-run':
+    with open(args[args.index('--data-json') + 1]) as f:
+        data = {{'assemblers': [args[args.index('-a') + 1]], 'kbase_assembly_input': json.load(f)}}
+    sys.stdout.write(call('new', json.dumps(data)).read())
+elif command == 'ar-stat':
+    sys.stdout.write(call(job_id + '/status').read() + '\n')
+else:
+    while '-w' in args:
+        status = call(job_id + '/status').read()
+        if status.startswith('Complete'):
+            break
+        if 'fail' in status.lower():
+            sys.stderr.write('Job failed: ' + status + '\n')
+            sys.exit(1)
+        time.sleep(0.01)
+    action = {{'-l': 'log', '-r': 'report', '-p': 'assemblies/auto'}}[args[-1]]
+    shutil.copyfileobj(call(job_id + '/' + action), sys.stdout, 1 << 20)
+'''
+
+_JOB_PATH = re.compile(r'^/user/([^/]+)/job/([^/]+)(?:/(.*))?$')
+
+
+class FakeARASTServer(object):
+
+    def __init__(self, contigs=DEFAULT_CONTIGS, log='assembler log\n',
+                 report='assembly report\n', polls_until_done=1,
+                 final_status='Complete', contigs_file=None):
+        self.contigs = contigs
+        self.contigs_file = contigs_file
+        self.log = log
+        self.report = report
+        self.polls_until_done = polls_until_done
+        self.final_status = final_status
+        self.jobs = {}
+        self.requests = []
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/'.format(self._httpd.server_address[1])
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake._handle(self, 'GET')
+
+            def do_POST(self):
+                fake._handle(self, 'POST')
+
+        class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+            daemon_threads = True
+
+        self._httpd = Server(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self.url
+
+    def write_commands(self, directory):
+        """Write the ar-run, ar-stat and ar-get stand-ins to directory."""
+        script = _COMMAND.format(python=sys.executable)
+        for name in ('ar-run', 'ar-stat', 'ar-get'):
+            path = os.path.join(directory, name)
+            with open(path, 'w') as f:
+                f.write(script)
+            os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+        return directory
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _reply(self, handler, code, body):
+        handler.send_response(code)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _handle(self, handler, method):
+        body = ''
+        length = int(handler.headers.get('Content-Length') or 0)
+        if length:
+            body = handler.rfile.read(length)
+        token = handler.headers.get('Authorization')
+        with self._lock:
+            self.requests.append((method, handler.path, token))
+        match = _JOB_PATH.match(handler.path)
+        if token is None or match is None:
+            return self._reply(handler, 401 if token is None else 404, 'bad request')
+        user, job_id, action = match.groups()
+        if method == 'POST' and job_id == 'new':
+            with self._lock:
+                job_id = str(self._next_id)
+                self._next_id += 1
+                self.jobs[job_id] = {'user': user, 'token': token,
+                                     'data': json.loads(body), 'polls': 0}
+            return self._reply(handler, 200, "Job ID: {}\n".format(job_id))
+        job = self.jobs.get(job_id)
+        if job is None:
+            return self._reply(handler, 404, 'no such job')
+        if action == 'status':
+            with self._lock:
+                job['polls'] += 1
+                done = job['polls'] > self.polls_until_done
+            if not done:
+                return self._reply(handler, 200, 'Running: stage 1')
+            status = self.final_status(job) if callable(self.final_status) else self.final_status
+            return self._reply(handler, 200, status)
+        if action == 'log':
+            return self._reply(handler, 200, self.log)
+        if action == 'report':
+            return self._reply(handler, 200, self.report)
+        if action == 'assemblies/auto' and self.contigs_file is not None:
+            handler.send_response(200)
+            handler.send_header('Content-Length', str(os.path.getsize(self.contigs_file)))
+            handler.end_headers()
+            with open(self.contigs_file, 'rb') as f:
+                shutil.copyfileobj(f, handler.wfile, 1 << 20)
+            return
+        if action == 'assemblies/auto':
+            contigs = self.contigs(job) if callable(self.contigs) else self.contigs
+            return self._reply(handler, 200, contigs)
+        return self._reply(handler, 404, 'unknown action')
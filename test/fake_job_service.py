@@ -0,0 +1,110 @@
+"""
+Local stand-in for the KBaseJobService JSON-RPC service, for offline tests.
+
+Jobs started with run_job finish after `checks_until_done` checks. Every
+request is recorded with the client connection it arrived on, so tests can
+count the connections a client opens. gzip request bodies are accepted and
+counted in `compressed`.
+"""
+import BaseHTTPServer
+import SocketServer
+import json
+import threading
+import time
+import zlib
+
+
+class FakeJobService(object):
+
+    def __init__(self, checks_until_done=1, latency=0):
+        self.checks_until_done = checks_until_done
+        self.latency = latency
+        self.jobs = {}
+        self.requests = []
+        self.compressed = 0
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._httpd = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/'.format(self._httpd.server_address[1])
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                fake._handle(self)
+
+        class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+            daemon_threads = True
+            request_queue_size = 128
+
+        self._httpd = Server(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=self._httpd.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self.url
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def connections(self):
+        return len(set(client for client, _ in self.requests))
+
+    def _state(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return {'job_id': job_id, 'finished': 1, 'error': {
+                'name': 'JSONRPCError', 'code': -32500, 'message': 'no such job'}}
+        job['checks'] += 1
+        finished = 1 if job['checks'] > self.checks_until_done else 0
+        state = {'job_id': job_id, 'finished': finished, 'job_state':
+                 'completed' if finished else 'in-progress'}
+        if finished:
+            state['result'] = [{'report_name': 'report', 'report_ref': '1/2/3'}]
+        return state
+
+    def _handle(self, handler):
+        body = handler.rfile.read(int(handler.headers['Content-Length']))
+        if handler.headers.get('Content-Encoding') == 'gzip':
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+            with self._lock:
+                self.compressed += 1
+        request = json.loads(body)
+        if self.latency:
+            time.sleep(self.latency)
+        method = request['method'].split('.', 1)[1]
+        params = request['params']
+        with self._lock:
+            self.requests.append((handler.client_address, request))
+            if method == 'run_job':
+                job_id = str(self._next_id)
+                self._next_id += 1
+                self.jobs[job_id] = {'params': params[0], 'checks': 0}
+                result = job_id
+            elif method == 'check_job':
+                result = self._state(params[0])
+            elif method == 'check_jobs':
+                result = {'job_states': dict((j, self._state(j)) for j in params[0]['job_ids'])}
+            else:
+                result = None
+        if result is None:
+            code, resp = 500, {'error': {'name': 'JSONRPCError', 'code': -32601,
+                                         'message': 'no such method', 'error': ''}}
+        else:
+            code, resp = 200, {'version': '1.1', 'result': [result]}
+        body = json.dumps(resp)
+        handler.send_response(code)
+        handler.send_header('content-type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
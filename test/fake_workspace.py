@@ -0,0 +1,111 @@
+"""
+Local stand-in for the KBase workspace JSON-RPC service, for offline tests.
+
+Serves the handful of methods AssemblyRAST uses. Every saved object is
+kept in memory (without its data when keep_data is False, for large
+benchmark objects), and every request is recorded together with the
+client connection it arrived on so tests can check connection reuse.
+"""
+import BaseHTTPServer
+import SocketServer
+import json
+import threading
+
+
+READ_LIBRARY = {'lib1': {'file': {'id': 'h1', 'remote_md5': 'aaa'}},
+                'lib2': {'file': {'id': 'h2', 'remote_md5': 'bbb'}},
+                'interleaved': 0,
+                'insert_size_mean': 300}
+
+WSID = 7
+
+
+class FakeWorkspaceServer(object):
+
+    def __init__(self, read_library=READ_LIBRARY, fail=False, keep_data=True):
+        self.read_library = read_library
+        self.fail = fail
+        self.keep_data = keep_data
+        # the version of the read library object
+        self.version = 1
+        self.saved = []
+        self.requests = []
+        self._lock = threading.Lock()
+        self._httpd = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/'.format(self._httpd.server_address[1])
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                fake._handle(self)
+
+        class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+            daemon_threads = True
+
+        self._httpd = Server(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=self._httpd.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self.url
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def connections(self):
+        return len(set(client for client, _, _ in self.requests))
+
+    def _info(self, objid, name, type_name, version=1):
+        return [objid, name, type_name, '2016-01-01T00:00:00+0000', version,
+                'tester', WSID, 'ws', '', 0, {}]
+
+    def _reply(self, handler, code, resp):
+        body = json.dumps(resp)
+        handler.send_response(code)
+        handler.send_header('content-type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _handle(self, handler):
+        body = handler.rfile.read(int(handler.headers['Content-Length']))
+        request = json.loads(body)
+        del body
+        token = handler.headers.get('AUTHORIZATION')
+        with self._lock:
+            self.requests.append((handler.client_address, token, request))
+        if self.fail or token is None:
+            return self._reply(handler, 500, {'error': {
+                'name': 'JSONRPCError', 'code': -32500,
+                'message': 'request failed', 'error': 'trace'}})
+        method = request['method'].split('.', 1)[1]
+        params = request['params']
+        lib_info = self._info(1, 'reads', 'KBaseFile.PairedEndLibrary-2.0', self.version)
+        if method == 'get_object_info_new':
+            result = [lib_info for _ in params[0]['objects']]
+        elif method in ('get_objects', 'get_object_subset'):
+            result = [{'data': self.read_library, 'info': lib_info} for _ in params[0]]
+        elif method == 'save_objects':
+            result = []
+            with self._lock:
+                for obj in params[0]['objects']:
+                    if not self.keep_data and obj['type'] == 'KBaseGenomes.ContigSet':
+                        obj['data'] = None
+                    self.saved.append(obj)
+                    result.append(self._info(len(self.saved) + 1, obj['name'], obj['type']))
+        else:
+            return self._reply(handler, 500, {'error': {
+                'name': 'JSONRPCError', 'code': -32601,
+                'message': 'no such method ' + method, 'error': ''}})
+        return self._reply(handler, 200, {'result': [result], 'version': '1.1'})
@@ -0,0 +1,111 @@
+"""
+Compare contig ingestion with Bio.SeqIO against AssemblyRAST.fasta.
+
+Generates a synthetic assembly with many short contigs (the metagenome
+case) and runs the old SeqIO loop and the block reader over it, reporting
+wall time and the peak resident memory of each run.
+
+    python fasta_benchmark.py [--contigs N] [--length L] [--repeat R]
+"""
+import argparse
+import hashlib
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+from multiprocessing import Process, Queue
+
+from AssemblyRAST.fasta import read_fasta
+
+
+def make_assembly(path, contigs, length, line_width=60):
+    rng = random.Random(42)
+    with open(path, 'w') as f:
+        for i in range(contigs):
+            n = rng.randint(length // 2, length * 3 // 2)
+            seq = ''.join(rng.choice('ACGT') for _ in range(n))
+            f.write('>contig_{} length={}\n'.format(i, n))
+            for j in range(0, n, line_width):
+                f.write(seq[j:j + line_width] + '\n')
+
+
+def ingest_seqio(path):
+    from Bio import SeqIO
+    contigs = []
+    for seq_record in SeqIO.parse(path, 'fasta'):
+        contigs.append({
+            'id': seq_record.id,
+            'name': seq_record.name,
+            'description': seq_record.description,
+            'length': len(seq_record.seq),
+            'sequence': str(seq_record.seq),
+            'md5': hashlib.md5(str(seq_record.seq)).hexdigest()
+        })
+    return len(contigs)
+
+
+def ingest_block_reader(path):
+    contigs = []
+    with open(path) as f:
+        for contig_id, description, seq in read_fasta(f):
+            contigs.append({
+                'id': contig_id,
+                'name': contig_id,
+                'description': description,
+                'length': len(seq),
+                'sequence': seq,
+                'md5': hashlib.md5(seq).hexdigest()
+            })
+    return len(contigs)
+
+
+def _measure(func, path, queue):
+    start = time.time()
+    count = func(path)
+    elapsed = time.time() - start
+    queue.put((count, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+def measure(func, path):
+    """Run func(path) in a fresh process, return (count, seconds, peak KB)."""
+    queue = Queue()
+    p = Process(target=_measure, args=(func, path, queue))
+    p.start()
+    result = queue.get()
+    p.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--contigs', type=int, default=200000)
+    parser.add_argument('--length', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, 'contigs.fa')
+        make_assembly(path, args.contigs, args.length)
+        print('{} contigs, {:.1f} MB'.format(args.contigs, os.path.getsize(path) / 1e6))
+
+        readers = [('block reader', ingest_block_reader)]
+        try:
+            import Bio
+            readers.insert(0, ('Bio.SeqIO', ingest_seqio))
+        except ImportError:
+            print('Biopython is not installed, skipping the SeqIO baseline')
+
+        for name, func in readers:
+            runs = [measure(func, path) for _ in range(args.repeat)]
+            best = min(r[1] for r in runs)
+            peak = max(r[2] for r in runs)
+            print('{:<14} {:8.2f} s  {:8.1f} MB peak'.format(name, best, peak / 1024.0))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+import unittest
+from StringIO import StringIO
+
+from AssemblyRAST.fasta import filter_fasta, read_fasta
+
+FASTA = ('>contig_1 length=12\nACGTAC\nGTACGT\n'
+         '>contig_2 length=4\r\nACGT\r\n'
+         '>contig_3\nGGGCCCAAAT')
+
+
+class FastaTest(unittest.TestCase):
+
+    def test_read_fasta(self):
+        expected = [('contig_1', 'contig_1 length=12', 'ACGTACGTACGT'),
+                    ('contig_2', 'contig_2 length=4', 'ACGT'),
+                    ('contig_3', 'contig_3', 'GGGCCCAAAT')]
+        for block_size in (1, 2, 3, 7, 1 << 20):
+            records = list(read_fasta(StringIO(FASTA), block_size))
+            self.assertEqual(records, expected)
+
+    def test_edge_cases(self):
+        self.assertEqual(list(read_fasta(StringIO(''))), [])
+        self.assertEqual(list(read_fasta(StringIO('\n\n'), 1)), [])
+        self.assertEqual(list(read_fasta(StringIO('\n>only_header\n'), 2)),
+                         [('only_header', 'only_header', '')])
+        self.assertEqual(list(read_fasta(StringIO('>a\nAC\n>\nGT\n'))),
+                         [('a', 'a', 'AC'), ('', '', 'GT')])
+
+    def test_filter_fasta(self):
+        kept = [r[0] for r in filter_fasta(StringIO(FASTA), 10, block_size=5)]
+        self.assertEqual(kept, ['contig_1', 'contig_3'])
+        self.assertEqual(len(list(filter_fasta(StringIO(FASTA), 0))), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
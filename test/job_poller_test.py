@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from AssemblyRAST.job_poller import JobPoller, JobStore
+
+
+class JobPollerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.poller = JobPoller(initial_delay=0.01, max_delay=0.04, backoff=2.0,
+                                max_errors=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_store_roundtrip(self):
+        store = JobStore(self.tmpdir)
+        self.assertIsNone(store.load('1'))
+        store.save({'arast_job_id': '1', 'state': 'running'})
+        record = store.update('1', state='done', report_ref='1/2/3')
+        self.assertEqual(store.load('1')['state'], 'done')
+        self.assertEqual(record['report_ref'], '1/2/3')
+
+    def test_backoff_until_done(self):
+        polls = []
+        finished = threading.Event()
+
+        def poll():
+            polls.append(time.time())
+            return len(polls) == 5
+
+        self.poller.watch('1', poll, finished.set, lambda e: None)
+        self.assertTrue(finished.wait(5))
+        gaps = [b - a for a, b in zip(polls, polls[1:])]
+        self.assertTrue(gaps[1] >= 0.04 - 0.005)
+        self.assertTrue(gaps[-1] < 0.2)
+        self.assertEqual(len(self.poller), 0)
+
+    def test_many_jobs_share_one_poller(self):
+        done = []
+        lock = threading.Lock()
+        all_done = threading.Event()
+
+        def on_done(i):
+            with lock:
+                done.append(i)
+                if len(done) == 50:
+                    all_done.set()
+
+        for i in range(50):
+            self.poller.watch(str(i), lambda: True, lambda i=i: on_done(i), lambda e: None)
+        self.assertTrue(all_done.wait(5))
+        self.assertEqual(sorted(done), range(50))
+
+    def test_errors(self):
+        errors = []
+        failed = threading.Event()
+
+        def on_error(e):
+            errors.append(e)
+            failed.set()
+
+        def poll():
+            raise IOError('connection refused')
+
+        self.poller.watch('1', poll, lambda: None, on_error)
+        self.assertTrue(failed.wait(5))
+        self.assertTrue(isinstance(errors[0], IOError))
+
+        failed.clear()
+
+        def broken_finish():
+            raise ValueError('save failed')
+
+        self.poller.watch('2', lambda: True, broken_finish, on_error)
+        self.assertTrue(failed.wait(5))
+        self.assertTrue(isinstance(errors[1], ValueError))
+
+    def test_failing_error_handler(self):
+        # a finisher survives an on_done and on_error that both raise
+        poller = JobPoller(initial_delay=0.01, finishers=1)
+        done = threading.Event()
+
+        def broken(*args):
+            raise IOError('disk full')
+
+        poller.watch('1', lambda: True, broken, broken)
+        poller.watch('2', lambda: True, done.set, broken)
+        self.assertTrue(done.wait(5))
+
+    def test_fail_orphans(self):
+        old = JobStore(self.tmpdir)
+        old.claim()
+        live = JobStore(self.tmpdir)
+        live.claim()
+        old.save({'arast_job_id': '1', 'owner': old.owner, 'state': 'running'})
+        old.save({'arast_job_id': '2', 'owner': old.owner, 'state': 'finishing'})
+        old.save({'arast_job_id': '3', 'owner': old.owner, 'state': 'done'})
+        live.save({'arast_job_id': '4', 'owner': live.owner, 'state': 'running'})
+        old.save({'arast_job_id': '5', 'state': 'running'})
+
+        # while its process lives, nobody else fails its jobs
+        restarted = JobStore(self.tmpdir)
+        self.assertEqual(restarted.fail_orphans('lost'), ['5'])
+        os.close(old.owners._fd)
+        self.assertEqual(sorted(restarted.fail_orphans('lost')), ['1', '2'])
+        self.assertEqual(restarted.load('1')['state'], 'error')
+        self.assertEqual(restarted.load('2')['error'], 'lost')
+        self.assertEqual(restarted.load('3')['state'], 'done')
+        self.assertEqual(restarted.load('4')['state'], 'running')
+        self.assertFalse(os.path.exists(old.owners._path(old.owner)))
+
+    def test_load_live(self):
+        store = JobStore(self.tmpdir)
+        store.claim()
+        store.save({'arast_job_id': '1', 'owner': store.owner, 'state': 'running'})
+        pid = os.fork()
+        if pid == 0:
+            # a worker forked from the server, recycled with a job in flight
+            try:
+                store.save({'arast_job_id': '2', 'owner': store.owner, 'state': 'running'})
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertEqual(store.load_live('1', 'lost')['state'], 'running')
+        self.assertEqual(store.load_live('2', 'lost')['error'], 'lost')
+        self.assertEqual(store.load('2')['state'], 'error')
+        self.assertEqual(store.load_live('3', 'lost'), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+
+import requests
+
+from AssemblyRAST.server import JobServiceClient
+from fake_job_service import FakeJobService
+
+
+class JobServiceClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.service = FakeJobService(checks_until_done=1)
+        self.url = self.service.start()
+
+    def tearDown(self):
+        self.service.stop()
+
+    def client(self, **kwargs):
+        return JobServiceClient(token='token', url=self.url, **kwargs)
+
+    def test_shared_session(self):
+        job_id = self.client().run_job({'method': 'AssemblyRAST.run_kiki', 'params': [{}]})
+        self.assertEqual(self.client().check_job(job_id)['finished'], 0)
+        self.assertEqual(self.client().check_job(job_id)['finished'], 1)
+        self.assertTrue(self.client().session is self.client().session)
+        self.assertEqual(self.service.connections(), 1)
+
+    def test_check_jobs(self):
+        client = self.client(session=requests.Session())
+        job_ids = [client.run_job({'method': 'AssemblyRAST.run_kiki', 'params': [{}]})
+                   for _ in range(3)]
+        states = client.check_jobs(job_ids + ['missing'])
+        self.assertEqual(sorted(states), sorted(job_ids + ['missing']))
+        self.assertTrue(all(states[j]['finished'] == 0 for j in job_ids))
+        self.assertTrue('error' in states['missing'])
+        self.assertEqual(len(self.service.requests), 4)
+
+    def test_requires_token(self):
+        self.assertRaises(ValueError, JobServiceClient, url=self.url)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Load test JobServiceClient against a local fake job service.
+
+Several threads each start a job and poll it, the way Application.__call__
+serves narrative _check requests, first with a new connection per request
+and then through the shared pooled session. A final run checks all jobs
+with one check_jobs call per poll. Reports requests per second, median and
+95th percentile latency, and how many connections the service saw.
+
+    python job_service_load.py [--threads T] [--polls P] [--latency S]
+"""
+import argparse
+import time
+import threading
+
+import requests
+
+from AssemblyRAST.server import JobServiceClient
+from fake_job_service import FakeJobService
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * p), len(samples) - 1)]
+
+
+def run(name, service, threads, polls, new_client):
+    samples = []
+    lock = threading.Lock()
+    service.requests = []
+
+    def worker():
+        job_id = new_client().run_job({'method': 'AssemblyRAST.run_kiki', 'params': [{}]})
+        for _ in range(polls):
+            start = time.time()
+            new_client().check_job(job_id)
+            with lock:
+                samples.append(time.time() - start)
+
+    start = time.time()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    report(name, samples, time.time() - start, service)
+
+
+def run_batched(name, service, threads, polls, new_client):
+    service.requests = []
+    client = new_client()
+    job_ids = [client.run_job({'method': 'AssemblyRAST.run_kiki', 'params': [{}]})
+               for _ in range(threads)]
+    samples = []
+    start = time.time()
+    for _ in range(polls):
+        t = time.time()
+        client.check_jobs(job_ids)
+        samples.append(time.time() - t)
+    report(name, samples, time.time() - start, service, jobs_per_call=threads)
+
+
+def report(name, samples, elapsed, service, jobs_per_call=1):
+    print('{:<26} {:8.0f} job checks/s  median {:6.2f} ms  p95 {:6.2f} ms  {:5d} connections'.format(
+        name, len(samples) * jobs_per_call / elapsed, percentile(samples, 0.5) * 1000,
+        percentile(samples, 0.95) * 1000, service.connections()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--threads', type=int, default=20)
+    parser.add_argument('--polls', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds the fake service waits before answering')
+    args = parser.parse_args()
+
+    service = FakeJobService(checks_until_done=args.polls, latency=args.latency)
+    url = service.start()
+    try:
+        run('new connection per call', service, args.threads, args.polls,
+            lambda: JobServiceClient(token='token', url=url, session=requests.Session()))
+        run('pooled session', service, args.threads, args.polls,
+            lambda: JobServiceClient(token='token', url=url))
+        run_batched('pooled session, check_jobs', service, args.threads, args.polls,
+                    lambda: JobServiceClient(token='token', url=url))
+    finally:
+        service.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Compare JSON encode and decode times of the codecs AssemblyRAST can use.
+
+Builds three payloads: a ContigSet save_objects request (what the server
+and client see around contig uploads), a typical run_* response, and a
+small RPC request. Each is encoded the old way (json.dumps with
+JSONObjectEncoder as cls), with json_codec.dumps, and with ujson when
+installed, then decoded with every decoder json_codec knows about. Reports
+the mean time per call.
+
+    python json_codec_benchmark.py [--contigs N] [--length L] [--repeat R]
+"""
+import argparse
+import hashlib
+import json
+import random
+import time
+
+from AssemblyRAST import json_codec
+from AssemblyRAST.json_codec import JSONObjectEncoder
+
+
+def contigset_request(contigs, length):
+    rng = random.Random(42)
+    records = []
+    for i in range(contigs):
+        n = rng.randint(length // 2, length * 3 // 2)
+        seq = ''.join(rng.choice('ACGT') for _ in range(n))
+        records.append({'id': 'contig_{}'.format(i),
+                        'name': 'contig_{}'.format(i),
+                        'description': 'length={} cov={:.4f}'.format(n, rng.random() * 100),
+                        'length': n,
+                        'md5': hashlib.md5(seq).hexdigest(),
+                        'sequence': seq})
+    contigset = {'id': 'assembly.contigs', 'name': 'assembly.contigs',
+                 'source': 'ARAST', 'source_id': 'job_1', 'md5': '0' * 32,
+                 'type': 'Draft', 'contigs': records}
+    return {'method': 'Workspace.save_objects', 'version': '1.1', 'id': '1',
+            'params': [{'id': 7, 'objects': [{'type': 'KBaseGenomes.ContigSet',
+                                              'name': 'assembly.contigs',
+                                              'data': contigset,
+                                              'provenance': [{'service': 'AssemblyRAST'}]}]}]}
+
+
+def run_response():
+    return {'version': '1.1', 'id': '12345',
+            'result': [{'report_name': 'assembly_report_1', 'report_ref': '7/2/1',
+                        'arast_job_id': '1234', 'tags': set(['kiki'])}]}
+
+
+def rpc_request():
+    return {'method': 'AssemblyRAST.run_kiki', 'version': '1.1', 'id': '12345',
+            'params': [{'workspace_name': 'ws', 'read_library_names': ['reads'],
+                        'output_contigset_name': 'contigs', 'min_contig_len': 300,
+                        'extra_params': []}]}
+
+
+def mean_time(fn, repeat):
+    start = time.time()
+    for _ in range(repeat):
+        fn()
+    return (time.time() - start) / repeat
+
+
+def encoders():
+    runs = [('json cls=JSONObjectEncoder', lambda obj: json.dumps(obj, cls=JSONObjectEncoder)),
+            ('json_codec.dumps', json_codec.dumps)]
+    try:
+        import ujson
+        # ujson has no default hook, and writes objects it cannot encode as {}
+        runs.append(('ujson.dumps', lambda obj: ujson.dumps(obj, double_precision=15)))
+    except ImportError:
+        pass
+    return runs
+
+
+def report(name, obj, repeat):
+    encoded = json_codec.dumps(obj)
+    print('{} ({:,} bytes)'.format(name, len(encoded)))
+    for label, encode in encoders():
+        print('  encode {:<28} {:10.1f} us'.format(label, mean_time(lambda: encode(obj), repeat) * 1e6))
+    for label in sorted(json_codec.DECODERS):
+        decode = json_codec.DECODERS[label]
+        print('  decode {:<28} {:10.1f} us'.format(label, mean_time(lambda: decode(encoded), repeat) * 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--contigs', type=int, default=20000)
+    parser.add_argument('--length', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('json_codec decodes with {}'.format(json_codec.codec))
+    report('ContigSet save_objects request', contigset_request(args.contigs, args.length), args.repeat)
+    report('run_* response', run_response(), args.repeat * 10000)
+    report('run_* request', rpc_request(), args.repeat * 10000)
+
+
+if __name__ == '__main__':
+    main()
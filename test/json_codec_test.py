@@ -0,0 +1,42 @@
+import json
+import unittest
+
+from AssemblyRAST import json_codec
+
+
+class Jsonable(object):
+
+    def toJSONable(self):
+        return {'kind': 'jsonable'}
+
+
+class JSONCodecTest(unittest.TestCase):
+
+    def tearDown(self):
+        json_codec.use('auto')
+
+    def test_dumps(self):
+        obj = {'tags': set(['a']), 'ids': frozenset([1]), 'obj': Jsonable(), 'x': 0.1 + 0.2}
+        self.assertEqual(json.loads(json_codec.dumps(obj)),
+                         {'tags': ['a'], 'ids': [1], 'obj': {'kind': 'jsonable'},
+                          'x': 0.1 + 0.2})
+        self.assertRaises(TypeError, json_codec.dumps, {'obj': object()})
+
+    def test_codecs_agree(self):
+        doc = json.dumps({'version': '1.1', 'id': '42', 'params': [{
+            'contigs': [{'id': 'contig_1', 'length': 1200, 'gc': 0.4123456789012345,
+                         'sequence': 'ACGT' * 300, 'name': u'\xe9'}],
+            'big': 2 ** 70, 'none': None, 'flag': True}]})
+        expected = json.loads(doc)
+        for name in json_codec.DECODERS:
+            self.assertEqual(json_codec.use(name), name)
+            self.assertEqual(json_codec.loads(doc), expected, name)
+            self.assertRaises(ValueError, json_codec.loads, '{"method": ')
+
+    def test_unknown_codec(self):
+        self.assertRaises(ValueError, json_codec.use, 'nosuchjson')
+        self.assertIn(json_codec.use('auto'), json_codec.DECODERS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+
+from AssemblyRAST.metrics import Registry
+from AssemblyRAST.owners import Owners
+from AssemblyRAST.server import Application
+from AssemblyRAST.timing import Timings
+
+
+def sample_values(text):
+    return dict(line.rsplit(' ', 1) for line in text.splitlines() if not line.startswith('#'))
+
+
+class MetricsTest(unittest.TestCase):
+
+    def test_render(self):
+        registry = Registry()
+        requests = registry.counter('requests_total', 'Requests.', ('method',))
+        requests.inc(method='a')
+        requests.inc(2, method='b "quoted"')
+        registry.gauge('in_flight', 'In flight.').set(3)
+        latency = registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1))
+        for value in (0.05, 0.5, 5):
+            latency.observe(value)
+        registry.collect(lambda: [('cache_size', 'gauge', 'Cache size.', [({'kind': 'x'}, 7)])])
+        lines = registry.render().splitlines()
+        self.assertEqual(lines[:4], ['# HELP requests_total Requests.',
+                                     '# TYPE requests_total counter',
+                                     'requests_total{method="a"} 1',
+                                     'requests_total{method="b \\"quoted\\""} 2'])
+        self.assertTrue('in_flight 3' in lines)
+        self.assertTrue('# TYPE latency_seconds histogram' in lines)
+        self.assertTrue('latency_seconds_bucket{le="0.1"} 1' in lines)
+        self.assertTrue('latency_seconds_bucket{le="1"} 2' in lines)
+        self.assertTrue('latency_seconds_bucket{le="+Inf"} 3' in lines)
+        self.assertTrue('latency_seconds_sum 5.55' in lines)
+        self.assertTrue('latency_seconds_count 3' in lines)
+        self.assertTrue('cache_size{kind="x"} 7' in lines)
+        self.assertRaises(ValueError, requests.inc, method='a', status='200')
+        self.assertRaises(ValueError, registry.gauge, 'requests_total', 'Requests.')
+
+    def test_endpoint(self):
+        app = Application()
+
+        def call(method, path='/', body=''):
+            environ = {'REQUEST_METHOD': method, 'PATH_INFO': path, 'REMOTE_ADDR': '127.0.0.1',
+                       'CONTENT_LENGTH': str(len(body)), 'wsgi.input': StringIO(body),
+                       'HTTP_AUTHORIZATION': 'un=alice|token'}
+            started = []
+            response = ''.join(app(environ, lambda status, headers: started.append(status)))
+            return started[0], response
+
+        # every Application in this process writes to the same directory, as
+        # the workers of a server do, so only count what this test adds
+        before = sample_values(call('GET', '/metrics')[1])
+
+        def added(sample):
+            return float(after.get(sample, 0)) - float(before.get(sample, 0))
+
+        rpc = {'version': '1.1', 'id': '1', 'method': 'AssemblyRAST.get_queue_status', 'params': []}
+        for _ in range(2):
+            status, response = call('POST', body=json.dumps(rpc))
+            self.assertEqual(status, '200 OK')
+        rpc['method'] = 'AssemblyRAST.no_such_method'
+        call('POST', body=json.dumps(rpc))
+        batch = json.dumps([dict(rpc, method='AssemblyRAST.get_queue_status')])
+        call('POST', body=batch)
+
+        status, text = call('GET', '/metrics')
+        self.assertEqual(status, '200 OK')
+        after = sample_values(text)
+        self.assertEqual(added('assemblyrast_requests_total{method="AssemblyRAST.get_queue_status",'
+                               'status="200"}'), 2)
+        self.assertEqual(added('assemblyrast_requests_total{method="unknown",status="500"}'), 1)
+        self.assertEqual(added('assemblyrast_requests_total{method="batch",status="200"}'), 1)
+        self.assertEqual(added('assemblyrast_request_duration_seconds_count'
+                               '{method="AssemblyRAST.get_queue_status"}'), 2)
+        self.assertEqual(after['assemblyrast_requests_in_flight'], '0')
+        self.assertEqual(added('assemblyrast_auth_cache_hits_total'), 2)
+        self.assertEqual(added('assemblyrast_auth_cache_misses_total'), 1)
+        self.assertEqual(after['assemblyrast_arast_jobs_active'], '0')
+        self.assertEqual(after['assemblyrast_runs_queued'], '0')
+        self.assertTrue(added('assemblyrast_request_bytes_total') > 0)
+        self.assertEqual(call('POST', '/metrics')[0], '405 Method Not Allowed')
+
+    def test_run_metrics(self):
+        from AssemblyRAST.AssemblyRASTServer import impl_AssemblyRAST as impl
+        timings = Timings()
+        timings.add('download', 1.5, bytes=1000)
+        timings.add('save', 0.5, bytes=1200)
+        impl.observe_timings('kiki', timings)
+        impl.arastJobs.add('job1')
+        try:
+            lines = impl.metrics.render().splitlines()
+        finally:
+            impl.arastJobs.discard('job1')
+        self.assertTrue('assemblyrast_stage_bytes_total{assembler="kiki",stage="download"} 1000'
+                        in lines)
+        self.assertTrue('assemblyrast_stage_bytes_total{assembler="kiki",stage="save"} 1200'
+                        in lines)
+        self.assertTrue('assemblyrast_arast_jobs_active 1' in lines)
+
+    def test_shared(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        owners = Owners(os.path.join(tmpdir, 'owners'))
+        owners.claim()
+        root = os.path.join(tmpdir, 'metrics')
+
+        # two workers of one server
+        workers = []
+        for i in range(2):
+            registry = Registry()
+            registry.share(root, owners, interval=60)
+            requests = registry.counter('requests_total', 'Requests.', ('method',))
+            requests.inc(i + 1, method='a')
+            registry.gauge('in_flight', 'In flight.').set(i + 1)
+            registry.histogram('latency_seconds', 'Latency.', buckets=(1,)).observe(0.5)
+            registry.collect(lambda: [('hits_total', 'counter', 'Hits.', [({}, 5)])])
+            registry.collect(lambda: [('queued', 'gauge', 'Queued.', [({}, 7)])], local=False)
+            workers.append(registry)
+        # as the second worker's flush thread would
+        workers[1].flush()
+
+        lines = workers[0].render().splitlines()
+        self.assertTrue('requests_total{method="a"} 3' in lines)
+        self.assertTrue('in_flight 3' in lines)
+        self.assertTrue('latency_seconds_bucket{le="1"} 2' in lines)
+        self.assertTrue('hits_total 10' in lines)
+        # figures that already cover every worker are not added up
+        self.assertTrue('queued 7' in lines)
+        self.assertEqual(workers[1].render().splitlines(), lines)
+
+        # a worker that stopped writing keeps its counts but not its gauges
+        path = workers[1]._path
+        with open(path) as f:
+            snapshot = json.load(f)
+        snapshot['updated'] -= 3600
+        with open(path, 'w') as f:
+            json.dump(snapshot, f)
+        lines = workers[0].render().splitlines()
+        self.assertTrue('requests_total{method="a"} 3' in lines)
+        self.assertTrue('in_flight 1' in lines)
+
+        # a restarted server starts from nothing
+        os.close(owners._fd)
+        restarted = Registry()
+        restarted.share(root, Owners(os.path.join(tmpdir, 'owners')))
+        restarted.counter('requests_total', 'Requests.', ('method',))
+        self.assertEqual(restarted.render().splitlines(),
+                         ['# HELP requests_total Requests.', '# TYPE requests_total counter'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+"""
+Benchmark the post-processing of an assembly run against local stand-ins.
+
+Generates synthetic ARAST assemblies of increasing size, serves each one
+from FakeARASTServer and runs arast_run against it and an in-memory
+FakeWorkspaceServer, so everything after the assembler itself is measured
+without a live ARAST, Shock or workspace. Each run happens in a fresh
+process; its wall time, peak resident memory and the stage spans recorded
+in the report's provenance are written as JSON, along with the commit and
+Python version, so runs on different commits can be compared:
+
+    python postprocess_benchmark.py --output base.json
+    git checkout other-branch
+    python postprocess_benchmark.py --compare base.json
+
+The stages are those of Timings: download, parse (which includes dropping
+contigs shorter than --min-contig-len), hash, stats, serialize and save.
+The save stage includes the time the stand-in workspace takes to read the
+object, since that happens before it answers.
+
+    python postprocess_benchmark.py [--contigs N,N,...] [--length L]
+                                    [--min-contig-len M] [--hash-threads T]
+                                    [--output FILE] [--compare FILE]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing import Process, Queue
+
+from AssemblyRAST.AssemblyRASTImpl import AssemblyRAST
+from fake_arast import FakeARASTServer
+from fake_workspace import FakeWorkspaceServer
+
+
+STAGES = ('download', 'parse', 'hash', 'stats', 'serialize', 'save')
+
+
+def make_assembly(path, contigs, length, line_width=60):
+    """Write contigs random contigs of length / 4 to 7 * length / 4 bases."""
+    rng = random.Random(42)
+    # slices of one random pool are random enough and much faster to make
+    pool = ''.join(rng.choice('ACGT') for _ in range(1 << 16))
+    pool = pool * (max(length * 2, 1 << 17) // len(pool) + 2)
+    with open(path, 'w') as f:
+        for i in range(contigs):
+            n = rng.randint(length // 4, length * 7 // 4)
+            start = rng.randint(0, len(pool) - n - 1)
+            seq = pool[start:start + n]
+            f.write('>NODE_{}_length_{}\n'.format(i, n))
+            f.write('\n'.join(seq[j:j + line_width] for j in range(0, n, line_width)))
+            f.write('\n')
+
+
+def _run(workspace_url, arast_url, bindir, scratch, hash_threads, min_contig_len, queue):
+    # the run prints its console log and report
+    sys.stdout = open(os.devnull, 'w')
+    os.environ['PATH'] = bindir + os.pathsep + os.environ['PATH']
+    impl = AssemblyRAST({'workspace-url': workspace_url,
+                         'arast-url': arast_url,
+                         'scratch': scratch,
+                         'contig-hash-threads': hash_threads,
+                         'arast-poll-initial-delay': 0})
+    params = {'workspace_name': 'benchmark', 'read_library_name': 'reads',
+              'output_contigset_name': 'contigs', 'min_contig_len': min_contig_len}
+    ctx = {'token': 'un=benchmark|token', 'user_id': 'benchmark',
+           'provenance': [{'service': 'AssemblyRAST', 'method': 'run_kiki',
+                           'method_params': [params]}]}
+    start = time.time()
+    try:
+        impl.arast_run(ctx, params, 'kiki')
+    except Exception as e:
+        queue.put(e)
+        raise
+    elapsed = time.time() - start
+    queue.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+def measure(contigs_file, scratch, hash_threads, min_contig_len):
+    """Run one arast_run in a fresh process, return its result dict."""
+    arast = FakeARASTServer(contigs_file=contigs_file, polls_until_done=0)
+    workspace = FakeWorkspaceServer(keep_data=False)
+    bindir = arast.write_commands(tempfile.mkdtemp())
+    try:
+        queue = Queue()
+        p = Process(target=_run, args=(workspace.start(), arast.start(), bindir, scratch,
+                                       hash_threads, min_contig_len, queue))
+        p.start()
+        result = queue.get()
+        p.join()
+        if isinstance(result, Exception):
+            raise result
+        elapsed, peak = result
+        saved = dict((obj['type'], obj) for obj in workspace.saved)
+        kept = int(saved['KBaseGenomes.ContigSet']['meta']['contigs'])
+        report = saved['KBaseReport.Report']
+        spans = json.loads(report['provenance'][0]['custom']['timings'])
+    finally:
+        arast.stop()
+        workspace.stop()
+        shutil.rmtree(bindir)
+    return {'contigs_kept': kept,
+            'seconds': round(elapsed, 3),
+            'peak_rss_mb': round(peak / 1024.0, 1),
+            'stages': dict((span['stage'], span) for span in spans)}
+
+
+def commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_result(size, result):
+    print('{} contigs ({} kept, {:.1f} MB): {:.2f} s, {:.1f} MB peak'.format(
+        size, result['contigs_kept'], result['input_mb'], result['seconds'], result['peak_rss_mb']))
+    for stage in STAGES:
+        span = result['stages'].get(stage)
+        if span:
+            print('    {:<10} {:8.3f} s'.format(stage, span['seconds']))
+
+
+def compare(base, results):
+    print('\nCompared with {} (ratio of seconds, < 1 is faster):'.format(base.get('commit')))
+    print('{:>10} {:>8} {:>8}'.format('contigs', 'total', 'peak') +
+          ''.join('{:>10}'.format(stage) for stage in STAGES))
+    for size, result in sorted(results['runs'].items(), key=lambda item: int(item[0])):
+        old = base['runs'].get(size)
+        if old is None:
+            continue
+
+        def ratio(new, was):
+            return '{:.2f}'.format(new / was) if was else '-'
+
+        row = '{:>10} {:>8} {:>8}'.format(size, ratio(result['seconds'], old['seconds']),
+                                          ratio(result['peak_rss_mb'], old['peak_rss_mb']))
+        for stage in STAGES:
+            if stage in result['stages'] and stage in old['stages']:
+                row += '{:>10}'.format(ratio(result['stages'][stage]['seconds'],
+                                             old['stages'][stage]['seconds']))
+            else:
+                row += '{:>10}'.format('-')
+        print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--contigs', default='1000,10000,100000,1000000',
+                        help='comma separated assembly sizes, in contigs')
+    parser.add_argument('--length', type=int, default=1000)
+    parser.add_argument('--min-contig-len', type=int, default=300)
+    parser.add_argument('--hash-threads', type=int, default=0)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+    args = parser.parse_args()
+
+    results = {'commit': commit(),
+               'python': platform.python_version(),
+               'length': args.length,
+               'min_contig_len': args.min_contig_len,
+               'hash_threads': args.hash_threads,
+               'runs': {}}
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for size in [int(s) for s in args.contigs.split(',')]:
+            path = os.path.join(tmpdir, 'contigs.fa')
+            make_assembly(path, size, args.length)
+            result = measure(path, os.path.join(tmpdir, 'scratch'),
+                             args.hash_threads, args.min_contig_len)
+            result['input_mb'] = round(os.path.getsize(path) / 1e6, 1)
+            os.remove(path)
+            results['runs'][str(size)] = result
+            print_result(size, result)
+    finally:
+        shutil.rmtree(tmpdir)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
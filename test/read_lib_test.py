@@ -0,0 +1,53 @@
+import shutil
+import tempfile
+import unittest
+
+from AssemblyRAST.AssemblyRASTImpl import AssemblyRAST
+from fake_workspace import FakeWorkspaceServer, READ_LIBRARY, WSID
+
+
+class ReadLibTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.workspace = FakeWorkspaceServer()
+        self.impl = AssemblyRAST({'workspace-url': self.workspace.start(),
+                                  'scratch': self.scratch})
+        self.ws = self.impl.wsPool.get('un=alice|token')
+
+    def tearDown(self):
+        self.workspace.stop()
+        shutil.rmtree(self.scratch)
+
+    def fetch(self):
+        del self.workspace.requests[:]
+        lib = self.impl.get_read_lib(self.ws, 'ws/reads')
+        return lib, [request for _, _, request in self.workspace.requests]
+
+    def test_subset_fetch(self):
+        lib, requests = self.fetch()
+        self.assertEqual([r['method'] for r in requests],
+                         ['Workspace.get_object_info_new', 'Workspace.get_object_subset'])
+        self.assertEqual(requests[0]['params'][0], {'objects': [{'ref': 'ws/reads'}]})
+        # only the handle fields, of the exact version the info call saw
+        self.assertEqual(requests[1]['params'][0],
+                         [{'ref': '{}/1/1'.format(WSID), 'included': AssemblyRAST.READ_LIB_PATHS}])
+        self.assertEqual(lib['data'], READ_LIBRARY)
+        self.assertEqual(lib['info'][4], 1)
+
+        # a repeat only checks the object info
+        lib, requests = self.fetch()
+        self.assertEqual([r['method'] for r in requests], ['Workspace.get_object_info_new'])
+        self.assertEqual(lib['data'], READ_LIBRARY)
+
+        # a new version of the object is fetched again
+        self.workspace.version = 2
+        lib, requests = self.fetch()
+        self.assertEqual([r['method'] for r in requests],
+                         ['Workspace.get_object_info_new', 'Workspace.get_object_subset'])
+        self.assertEqual(requests[1]['params'][0][0]['ref'], '{}/1/2'.format(WSID))
+        self.assertEqual(lib['info'][4], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import json
+import time
+import unittest
+from StringIO import StringIO
+
+from AssemblyRAST.server import Application, RequestBodyError
+
+
+class Unreadable(object):
+
+    def read(self, size=-1):
+        raise AssertionError('body should not be read')
+
+
+class SlowStream(object):
+    """Trickles data out 100 bytes at a time."""
+
+    def __init__(self, data, delay):
+        self.stream = StringIO(data)
+        self.delay = delay
+
+    def read(self, size=-1):
+        time.sleep(self.delay)
+        return self.stream.read(min(size, 100))
+
+
+class StalledStream(object):
+    """Fails a read the way uwsgi does once its socket-timeout passes."""
+
+    def read(self, size=-1):
+        raise IOError('error waiting for wsgi.input data')
+
+
+class RequestBodyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Application()
+        self.app.max_request_size = 1000
+        self.app.request_read_timeout = 0.2
+
+    def call(self, stream, length=None, **extra):
+        environ = {'REQUEST_METHOD': 'POST', 'REMOTE_ADDR': '127.0.0.1', 'wsgi.input': stream}
+        if length is not None:
+            environ['CONTENT_LENGTH'] = str(length)
+        environ.update(extra)
+        started = []
+        body = self.app(environ, lambda status, headers: started.append(status))
+        return started[0], json.loads(''.join(body))
+
+    def test_read_in_chunks(self):
+        body = 'x' * 900
+        environ = {'CONTENT_LENGTH': str(len(body)), 'wsgi.input': StringIO(body)}
+        self.assertEqual(self.app.read_body(environ, chunk_size=64), body)
+        environ = {'wsgi.input': StringIO(body), 'wsgi.input_terminated': True}
+        self.assertEqual(self.app.read_body(environ, chunk_size=64), body)
+        self.assertEqual(self.app.read_body({'wsgi.input': StringIO(body)}), '')
+
+    def test_declared_size_refused_unread(self):
+        status, resp = self.call(Unreadable(), 1001)
+        self.assertEqual(status, '413 Request Entity Too Large')
+        self.assertEqual(resp['error']['code'], -32600)
+        self.assertTrue('1001' in resp['error']['message'])
+
+    def test_undeclared_size_cut_off(self):
+        status, resp = self.call(StringIO('[' * 5000), **{'wsgi.input_terminated': True})
+        self.assertEqual(status, '413 Request Entity Too Large')
+
+    def test_slow_body(self):
+        status, resp = self.call(SlowStream('x' * 500, 0.1), 500)
+        self.assertEqual(status, '408 Request Timeout')
+
+    def test_stalled_read(self):
+        status, resp = self.call(StalledStream(), 500)
+        self.assertEqual(status, '408 Request Timeout')
+        self.assertEqual(resp['error']['code'], -32600)
+
+    def test_truncated_body(self):
+        environ = {'CONTENT_LENGTH': '100', 'wsgi.input': StringIO('{}')}
+        self.assertRaises(RequestBodyError, self.app.read_body, environ)
+
+    def test_parse_error_still_reported(self):
+        status, resp = self.call(StringIO('{"method": '), 11)
+        self.assertEqual(resp['error']['code'], -32700)
+
+
+if __name__ == '__main__':
+    unittest.main()
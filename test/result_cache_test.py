@@ -0,0 +1,178 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from AssemblyRAST.AssemblyRASTImpl import AssemblyRAST
+from AssemblyRAST.result_cache import ResultCache, cache_key
+from fake_arast import FakeARASTServer
+from fake_workspace import FakeWorkspaceServer
+
+READS = {'paired_end_libs': [{'handle_1': {'id': 'h1', 'remote_md5': 'aaa'},
+                              'handle_2': {'id': 'h2', 'remote_md5': 'bbb'},
+                              'interleaved': 0}],
+         'single_end_libs': [],
+         'references': []}
+
+
+class ResultCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = ResultCache(os.path.join(self.tmpdir, 'cache'), 100)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def make_result(self, name, contigs):
+        result = os.path.join(self.tmpdir, name)
+        os.makedirs(result)
+        paths = {}
+        for key, content in (('contigs', contigs), ('report', 'report'), ('log', 'log')):
+            paths[key] = os.path.join(result, key)
+            with open(paths[key], 'w') as f:
+                f.write(content)
+        return paths
+
+    def output_dir(self, name):
+        path = os.path.join(self.tmpdir, 'out.' + name)
+        os.makedirs(path)
+        return path
+
+    def test_cache_key(self):
+        key = cache_key('kiki', READS, {'min_contig_len': 300})
+        self.assertEqual(key, cache_key('kiki', READS, {}))
+        self.assertEqual(key, cache_key('kiki', READS, {'min_contig_len': '300',
+                                                        'workspace_name': 'other'}))
+        self.assertNotEqual(key, cache_key('spades', READS, {}))
+        self.assertNotEqual(key, cache_key('kiki', READS, {'min_contig_len': 500}))
+        self.assertNotEqual(key, cache_key('kiki', READS, {'extra_params': ['-k 31']}))
+
+        # the same reads under new handle ids hit the same entry
+        moved = {'paired_end_libs': [{'handle_1': {'id': 'h3', 'remote_md5': 'aaa'},
+                                      'handle_2': {'id': 'h4', 'remote_md5': 'bbb'},
+                                      'interleaved': 0}]}
+        self.assertEqual(key, cache_key('kiki', moved, {}))
+
+    def test_get_and_put(self):
+        self.assertIsNone(self.cache.get('k1', self.output_dir('miss')))
+        self.cache.put('k1', self.make_result('r1', '>c\nACGT\n'))
+        self.cache.put('k1', self.make_result('r1b', '>c\nACGT\n'))
+
+        paths = self.cache.get('k1', self.output_dir('hit'))
+        with open(paths['contigs']) as f:
+            self.assertEqual(f.read(), '>c\nACGT\n')
+        with open(paths['report']) as f:
+            self.assertEqual(f.read(), 'report')
+
+    def test_lru_eviction(self):
+        self.cache.put('old', self.make_result('r1', 'A' * 40))
+        os.utime(os.path.join(self.cache.root, 'old'), (time.time() - 20,) * 2)
+        self.cache.put('used', self.make_result('r2', 'C' * 40))
+        os.utime(os.path.join(self.cache.root, 'used'), (time.time() - 10,) * 2)
+        self.assertIsNotNone(self.cache.get('old', self.output_dir('touch')))
+
+        self.cache.put('new', self.make_result('r3', 'G' * 40))
+        self.assertIsNone(self.cache.get('used', self.output_dir('evicted')))
+        self.assertIsNotNone(self.cache.get('old', self.output_dir('kept')))
+        self.assertTrue(self.cache.size() <= 100)
+
+    def test_shared_by_workers(self):
+        # two workers on one directory, one evicting what the other reads
+        other = ResultCache(self.cache.root, 100)
+        paths = [self.make_result('r{}'.format(i), 'A' * 40) for i in range(4)]
+        errors = []
+
+        def store():
+            try:
+                for i in range(200):
+                    other.put('k{}'.format(i % 4), paths[i % 4])
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=store)
+        thread.start()
+        try:
+            for i in range(200):
+                self.cache.get('k{}'.format(i % 4), self.output_dir('get{}'.format(i)))
+                self.cache.size()
+        finally:
+            thread.join()
+        self.assertEqual(errors, [])
+
+
+class CachedRunTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        contigs = ''.join('>NODE_{} length={}\n{}\n'.format(i, n, 'ACGT' * (n // 4))
+                          for i, n in enumerate((400, 600, 1000)))
+        self.arast = FakeARASTServer(contigs=contigs, polls_until_done=0)
+        self.workspace = FakeWorkspaceServer()
+        self.bindir = self.arast.write_commands(tempfile.mkdtemp())
+        self.path = os.environ['PATH']
+        os.environ['PATH'] = self.bindir + os.pathsep + self.path
+        self.impl = AssemblyRAST({'workspace-url': self.workspace.start(),
+                                  'arast-url': self.arast.start(),
+                                  'scratch': self.scratch,
+                                  'result-cache-size-mb': 1})
+
+    def tearDown(self):
+        os.environ['PATH'] = self.path
+        shutil.rmtree(self.bindir)
+        self.arast.stop()
+        self.workspace.stop()
+        shutil.rmtree(self.scratch)
+
+    def run_kiki(self, name, min_contig_len=300):
+        params = {'workspace_name': 'ws', 'read_library_name': 'reads',
+                  'output_contigset_name': name, 'min_contig_len': min_contig_len}
+        ctx = {'token': 'un=alice|token', 'user_id': 'alice',
+               'provenance': [{'service': 'AssemblyRAST', 'method': 'run_kiki',
+                               'method_params': [params]}]}
+        output = self.impl.run_kiki(ctx, params)[0]
+        saved = dict((obj['name'], obj) for obj in self.workspace.saved)
+        return output, saved[name]['data'], saved[output['report_name']]
+
+    def test_repeat_run_uses_cache(self):
+        output, first, _ = self.run_kiki('first')
+        self.assertEqual(len(self.arast.jobs), 1)
+
+        # the same reads and parameters under another output name
+        output, second, report = self.run_kiki('second')
+        self.assertEqual(len(self.arast.jobs), 1)
+        self.assertEqual(second['contigs'], first['contigs'])
+        self.assertEqual(second['md5'], first['md5'])
+        self.assertTrue(report['data']['text_message'].startswith(
+            '============= Raw Contigs ============\nassembly report\n'))
+        self.assertEqual(report['data']['objects_created'][0]['ref'], 'ws/second')
+        stages = [line.split('\t')[0] for line in
+                  report['data']['text_message'].split('== Timings ==')[1].split('\n')]
+        self.assertTrue('cache_lookup' in stages)
+        self.assertFalse('download' in stages)
+
+        # another minimum contig length needs a new assembly
+        output, third, _ = self.run_kiki('third', min_contig_len=500)
+        self.assertEqual(len(self.arast.jobs), 2)
+        self.assertEqual([c['id'] for c in third['contigs']], ['NODE_1', 'NODE_2'])
+        self.assertEqual([c['id'] for c in first['contigs']], ['NODE_0', 'NODE_1', 'NODE_2'])
+
+    def test_broken_cache(self):
+        class BrokenCache(object):
+            def get(self, key, output_dir):
+                raise OSError('cache unreadable')
+
+            def put(self, key, paths):
+                raise OSError('cache full')
+
+        self.impl.resultCache = BrokenCache()
+        # neither a failed lookup nor a failed store fails the run
+        output, contigset, _ = self.run_kiki('first')
+        self.assertEqual(len(self.arast.jobs), 1)
+        self.assertEqual(len(contigset['contigs']), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import threading
+import time
+import unittest
+
+from AssemblyRAST.AssemblyRASTServer import MethodContext
+from AssemblyRAST.server import BatchRPCService
+
+
+class Logger(object):
+
+    def log_message(self, *args):
+        pass
+
+
+class RPCBatchTest(unittest.TestCase):
+
+    def make_service(self, concurrency):
+        service = BatchRPCService(batch_concurrency=concurrency)
+        self.running = 0
+        self.max_running = 0
+        lock = threading.Lock()
+
+        def slow(ctx, n):
+            with lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            time.sleep(0.05)
+            with lock:
+                self.running -= 1
+            if n < 0:
+                raise ValueError('negative')
+            return [ctx['method'], n, ctx['provenance'][0]['method_params']]
+
+        service.add(slow, name='AssemblyRAST.slow', types=[int])
+        return service
+
+    def batch(self, ns):
+        return [{'version': '1.1', 'id': str(i), 'method': 'AssemblyRAST.slow', 'params': [n]}
+                for i, n in enumerate(ns)]
+
+    def test_concurrent_batch(self):
+        service = self.make_service(4)
+        start = time.time()
+        responds = service.call_py(MethodContext(Logger()), self.batch(range(8)))
+        elapsed = time.time() - start
+        self.assertEqual([r['id'] for r in responds], [str(i) for i in range(8)])
+        self.assertEqual([r['result'] for r in responds],
+                         [['slow', i, [i]] for i in range(8)])
+        self.assertEqual(self.max_running, 4)
+        self.assertTrue(elapsed < 8 * 0.05)
+
+    def test_batches_do_not_share_threads(self):
+        # a batch stuck on slow entries does not hold up another batch
+        service = self.make_service(2)
+        release = threading.Event()
+
+        def stuck(ctx):
+            release.wait(5)
+            return 'done'
+
+        service.add(stuck, name='AssemblyRAST.stuck')
+        stuck_batch = [{'version': '1.1', 'id': str(i), 'method': 'AssemblyRAST.stuck',
+                        'params': []} for i in range(4)]
+        thread = threading.Thread(target=service.call_py,
+                                  args=(MethodContext(Logger()), stuck_batch))
+        thread.start()
+        try:
+            start = time.time()
+            responds = service.call_py(MethodContext(Logger()), self.batch(range(2)))
+            self.assertTrue(time.time() - start < 1)
+            self.assertEqual([r['result'][1] for r in responds], [0, 1])
+        finally:
+            release.set()
+            thread.join()
+
+    def test_sequential_batch(self):
+        service = self.make_service(1)
+        service.call_py(MethodContext(Logger()), self.batch(range(3)))
+        self.assertEqual(self.max_running, 1)
+
+    def test_error_isolation(self):
+        service = self.make_service(4)
+        reqs = self.batch([1, -1, 2])
+        reqs.append({'version': '1.1', 'id': '3', 'method': 'AssemblyRAST.nope', 'params': []})
+        reqs.append({'version': '1.1', 'id': '4', 'method': 'AssemblyRAST.slow', 'params': ['x']})
+        responds = service.call_py(MethodContext(Logger()), reqs)
+        self.assertEqual([r['id'] for r in responds], ['0', '1', '2', '3', '4'])
+        self.assertEqual(responds[0]['result'], ['slow', 1, [1]])
+        self.assertEqual(responds[2]['result'], ['slow', 2, [2]])
+        for r in responds[1], responds[3], responds[4]:
+            self.assertTrue('result' not in r)
+            self.assertEqual(r['version'], '1.1')
+        self.assertTrue('negative' in responds[1]['error']['message'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from AssemblyRAST.AssemblyRASTImpl import AssemblyRAST
+from AssemblyRAST.arast_client import ARASTError
+from fake_arast import FakeARASTServer
+from fake_workspace import FakeWorkspaceServer
+
+
+def assembler_of(job):
+    return job['data']['assemblers'][0]
+
+
+def contigs_of(job):
+    return ''.join('>{}_{} length=400\n{}\n'.format(assembler_of(job), i, 'ACGT' * 100)
+                   for i in range(2))
+
+
+class RunAssemblersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.arast = FakeARASTServer(contigs=contigs_of, polls_until_done=0)
+        self.workspace = FakeWorkspaceServer()
+        self.bindir = self.arast.write_commands(tempfile.mkdtemp())
+        self.path = os.environ['PATH']
+        os.environ['PATH'] = self.bindir + os.pathsep + self.path
+        self.impl = AssemblyRAST({'workspace-url': self.workspace.start(),
+                                  'arast-url': self.arast.start(),
+                                  'scratch': self.scratch})
+        self.params = {'workspace_name': 'ws', 'read_library_name': 'reads',
+                       'output_contigset_name': 'contigs',
+                       'assemblers': ['kiki', 'velvet', 'spades']}
+        self.ctx = {'token': 'un=alice|token', 'user_id': 'alice',
+                    'provenance': [{'service': 'AssemblyRAST', 'method': 'run_assemblers',
+                                    'method_params': [self.params]}]}
+
+    def tearDown(self):
+        os.environ['PATH'] = self.path
+        shutil.rmtree(self.bindir)
+        self.arast.stop()
+        self.workspace.stop()
+        shutil.rmtree(self.scratch)
+
+    def saved(self, type_name):
+        return [obj for obj in self.workspace.saved if obj['type'] == type_name]
+
+    def methods(self):
+        return [request['method'] for _, _, request in self.workspace.requests]
+
+    def test_run_assemblers(self):
+        output = self.impl.run_assemblers(self.ctx, self.params)[0]
+
+        # the read library is staged once for all three jobs
+        self.assertEqual(self.methods().count('Workspace.get_object_info_new'), 1)
+        self.assertEqual(self.methods().count('Workspace.get_object_subset'), 1)
+        self.assertEqual(sorted(assembler_of(job) for job in self.arast.jobs.values()),
+                         ['kiki', 'spades', 'velvet'])
+
+        contigsets = dict((obj['name'], obj) for obj in self.saved('KBaseGenomes.ContigSet'))
+        self.assertEqual(sorted(contigsets), ['contigs.kiki', 'contigs.spades', 'contigs.velvet'])
+        for assembler in self.params['assemblers']:
+            self.assertEqual([c['id'] for c in contigsets['contigs.' + assembler]['data']['contigs']],
+                             ['{}_0'.format(assembler), '{}_1'.format(assembler)])
+
+        report, = self.saved('KBaseReport.Report')
+        self.assertEqual(output['report_name'], report['name'])
+        text = report['data']['text_message']
+        self.assertTrue('Assembler Comparison' in text)
+        for assembler in self.params['assemblers']:
+            self.assertTrue('\n{}\t2\t800\t'.format(assembler) in text)
+        self.assertEqual(len(report['data']['objects_created']), 3)
+        self.assertEqual(self.impl.arastJobs, set())
+        self.assertEqual(self.impl.admission.status()['running'], 0)
+
+    def test_some_assemblers_fail(self):
+        # velvet is refused at submission and spades fails in ARAST
+        submit = self.impl.arast_submit
+
+        def flaky_submit(ctx, params, assembler, staged=None):
+            if assembler == 'velvet':
+                raise ARASTError('submission refused')
+            return submit(ctx, params, assembler, staged)
+
+        self.impl.arast_submit = flaky_submit
+        self.arast.final_status = lambda job: ('[FAIL] crashed' if assembler_of(job) == 'spades'
+                                               else 'Complete')
+        self.impl.run_assemblers(self.ctx, self.params)
+
+        self.assertEqual([obj['name'] for obj in self.saved('KBaseGenomes.ContigSet')],
+                         ['contigs.kiki'])
+        report, = self.saved('KBaseReport.Report')
+        text = report['data']['text_message']
+        self.assertTrue('\nkiki\t2\t800\t' in text)
+        self.assertTrue('\nvelvet\tFAILED: submission refused\n' in text)
+        self.assertTrue('\nspades\tFAILED: ' in text)
+        self.assertEqual(len(report['data']['objects_created']), 1)
+        self.assertEqual(self.impl.arastJobs, set())
+        self.assertEqual(self.impl.admission.status()['running'], 0)
+
+        # with nothing left to compare the call fails
+        self.arast.final_status = '[FAIL] crashed'
+        self.params['assemblers'] = ['velvet', 'spades']
+        self.assertRaises(ARASTError, self.impl.run_assemblers, self.ctx, self.params)
+        self.assertEqual(self.impl.arastJobs, set())
+
+    def test_bad_numbers(self):
+        for name, value in (('genome_size', 'big'), ('genome_size', 0),
+                            ('min_contig_len', '1e3'), ('min_contig_len', -1)):
+            params = dict(self.params, **{name: value})
+            self.assertRaises(ValueError, self.impl.run_assemblers, self.ctx, params)
+            self.assertRaises(ValueError, self.impl.run_kiki, self.ctx, params)
+        # refused before taking a slot or staging anything
+        self.assertEqual(self.impl.admission.status()['admitted'], 0)
+        self.assertEqual(self.workspace.requests, [])
+
+        # a number sent as a string is fine
+        self.params.update(genome_size='1600', min_contig_len='300')
+        self.impl.run_assemblers(self.ctx, self.params)
+        report, = self.saved('KBaseReport.Report')
+        self.assertTrue('\nkiki\t2\t800\t' in report['data']['text_message'])
+
+    def wait_done(self, impl, output):
+        deadline = time.time() + 20
+        while time.time() < deadline:
+            state = impl.check_assembly_job(self.ctx, output['arast_job_id'])[0]
+            if state['state'] in ('done', 'error'):
+                return state
+            time.sleep(0.05)
+        self.fail('run {} did not finish'.format(output['arast_job_id']))
+
+    def test_poll_mode(self):
+        impl = AssemblyRAST({'workspace-url': self.impl.workspaceURL,
+                             'arast-url': self.impl.arastURL,
+                             'scratch': self.scratch,
+                             'arast-submit-mode': 'poll',
+                             'arast-poll-initial-delay': 0,
+                             'admission-poll-interval': 0.05})
+        output = impl.run_assemblers(self.ctx, self.params)[0]
+        self.assertEqual(output['report_ref'], '')
+        state = self.wait_done(impl, output)
+        self.assertEqual(state['state'], 'done', state['error'])
+        self.assertEqual(state['assembler'], 'kiki,velvet,spades')
+
+        report, = self.saved('KBaseReport.Report')
+        self.assertEqual(state['report_name'], report['name'])
+        self.assertTrue(state['report_ref'])
+        for assembler in self.params['assemblers']:
+            self.assertTrue('\n{}\t2\t800\t'.format(assembler) in report['data']['text_message'])
+        self.assertEqual(len(self.saved('KBaseGenomes.ContigSet')), 3)
+        self.assertEqual(impl.arastJobs, set())
+        self.assertEqual(impl.admission.status()['running'], 0)
+
+    def test_poll_mode_queued(self):
+        impl = AssemblyRAST({'workspace-url': self.impl.workspaceURL,
+                             'arast-url': self.impl.arastURL,
+                             'scratch': self.scratch,
+                             'arast-submit-mode': 'poll',
+                             'arast-poll-initial-delay': 0,
+                             'admission-max-running': 3,
+                             'admission-poll-interval': 0.05})
+        held = impl.admission.try_acquire('bob')
+        output = impl.run_assemblers(self.ctx, self.params)[0]
+        self.assertEqual(output['queue_position'], 1)
+        state = impl.check_assembly_job(self.ctx, output['arast_job_id'])[0]
+        self.assertEqual((state['state'], state['queue_position']), ('queued', 1))
+        self.assertEqual(self.arast.jobs, {})
+
+        impl.admission.release(held)
+        state = self.wait_done(impl, output)
+        self.assertEqual(state['state'], 'done', state['error'])
+        self.assertEqual(len(self.arast.jobs), 3)
+        self.assertEqual(impl.admission.status()['running'], 0)
+
+        # with every assembler failing the run ends in error
+        self.arast.final_status = '[FAIL] crashed'
+        state = self.wait_done(impl, impl.run_assemblers(self.ctx, self.params)[0])
+        self.assertEqual(state['state'], 'error')
+        self.assertTrue(state['error'].startswith('All assemblers failed'))
+        self.assertEqual(impl.admission.status()['running'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
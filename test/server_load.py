@@ -0,0 +1,322 @@
+"""
+Load test the server.py WSGI Application against local stand-ins.
+
+The Application is served the way uwsgi runs it (see scripts/start_server.sh):
+it is loaded once, then a number of worker processes are forked that each
+accept connections on the shared listening socket from a fixed number of
+threads. Token validation goes to an in-process stand-in for the auth
+service that answers after --auth-latency seconds, async methods go to a
+FakeJobService, and the workspace and ARAST URLs point at FakeWorkspaceServer
+and FakeARASTServer.
+
+For each processes x threads setting, --clients client threads, spread over
+--client-processes processes of their own, replay a mix of traffic for
+--duration seconds:
+
+    submit  run_kiki_async, which starts a job with the job service
+    poll    run_kiki_check of one of the jobs started so far
+    batch   a JSON-RPC batch of --batch-size get_queue_status calls
+
+and the requests per second, median and 99th percentile latency and error
+rate of each kind are reported. --output writes the results as JSON.
+
+    python server_load.py [--settings 1x1,1x5,5x5] [--clients C]
+                          [--client-processes N] [--duration S]
+                          [--mix submit=1,poll=8,batch=1]
+                          [--batch-size B] [--users U] [--auth-latency S]
+                          [--job-service-latency S] [--output FILE]
+
+The workers are plain WSGIServers, not uwsgi, so the numbers measure the
+Application itself and leave out uwsgi's HTTP router. The client processes
+share the machine with the workers, so compare settings on a machine with
+more cores than workers plus client processes.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from ConfigParser import ConfigParser
+from multiprocessing import Process, Queue
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler
+
+import requests
+
+from fake_arast import FakeARASTServer
+from fake_job_service import FakeJobService
+from fake_workspace import FakeWorkspaceServer
+
+
+KINDS = ('submit', 'poll', 'batch')
+
+
+class FakeAuthClient(object):
+    """Stands in for biokbase.nexus.Client, taking latency seconds per validation."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def validate_token(self, token):
+        if self.latency:
+            time.sleep(self.latency)
+        return token.split('|')[0][len('un='):], None, None
+
+
+class Server(WSGIServer):
+    request_queue_size = 128
+
+
+class Worker(object):
+    """One forked worker process serving the shared socket from several threads."""
+
+    def __init__(self, httpd, threads):
+        self.httpd = httpd
+        self.threads = threads
+
+    def serve(self):
+        threads = [threading.Thread(target=self.accept_loop) for _ in range(self.threads)]
+        for t in threads:
+            t.daemon = True
+            t.start()
+        for t in threads:
+            t.join()
+
+    def accept_loop(self):
+        httpd = self.httpd
+        while True:
+            try:
+                request, client_address = httpd.get_request()
+            except socket.error:
+                continue
+            try:
+                httpd.finish_request(request, client_address)
+            except Exception:
+                httpd.handle_error(request, client_address)
+            finally:
+                httpd.shutdown_request(request)
+
+
+def start_workers(application, processes, threads):
+    """Fork processes workers of threads threads each, return (url, processes)."""
+    class RequestHandler(WSGIRequestHandler):
+        timeout = application.request_read_timeout
+
+        def log_message(self, *args):
+            pass
+
+    httpd = Server(('127.0.0.1', 0), RequestHandler)
+    httpd.set_app(application)
+    workers = [Process(target=Worker(httpd, threads).serve) for _ in range(processes)]
+    for p in workers:
+        p.daemon = True
+        p.start()
+    # the workers have their own copies of the listening socket
+    url = 'http://127.0.0.1:{}/'.format(httpd.server_address[1])
+    httpd.server_close()
+    return url, workers
+
+
+def rpc(method, params, i):
+    return {'version': '1.1', 'id': str(i), 'method': 'AssemblyRAST.' + method,
+            'params': params}
+
+
+class LoadClient(object):
+
+    def __init__(self, url, tokens, mix, batch_size, job_ids):
+        self.url = url
+        self.tokens = tokens
+        self.kinds = [kind for kind in KINDS for _ in range(mix.get(kind, 0))]
+        self.batch_size = batch_size
+        self.job_ids = job_ids
+        self.lock = threading.Lock()
+        self.samples = []
+
+    def request(self, session, rng, kind):
+        token = rng.choice(self.tokens)
+        if kind == 'submit':
+            body = rpc('run_kiki_async', [{'workspace_name': 'ws', 'read_library_name': 'reads',
+                                           'output_contigset_name': 'contigs'}], 0)
+        elif kind == 'poll':
+            body = rpc('run_kiki_check', [rng.choice(self.job_ids)], 0)
+        else:
+            body = [rpc('get_queue_status', [], i) for i in range(self.batch_size)]
+        resp = session.post(self.url, data=json.dumps(body),
+                            headers={'AUTHORIZATION': token}, timeout=60)
+        if resp.status_code != 200:
+            return False
+        result = resp.json()
+        if kind == 'batch':
+            return all('error' not in r for r in result)
+        if kind == 'submit' and 'result' in result:
+            with self.lock:
+                self.job_ids.append(result['result'][0])
+        return 'error' not in result
+
+    def run(self, seed, deadline):
+        rng = random.Random(seed)
+        session = requests.Session()
+        samples = []
+        while time.time() < deadline:
+            kind = rng.choice(self.kinds)
+            start = time.time()
+            try:
+                ok = self.request(session, rng, kind)
+            except requests.RequestException:
+                ok = False
+            samples.append((kind, time.time() - start, ok))
+        with self.lock:
+            self.samples.extend(samples)
+
+
+def _generate(url, tokens, mix, batch_size, job_ids, clients, deadline, seed, queue):
+    client = LoadClient(url, tokens, mix, batch_size, job_ids)
+    threads = [threading.Thread(target=client.run, args=(seed + i, deadline))
+               for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    queue.put(client.samples)
+
+
+def generate(url, tokens, mix, batch_size, job_ids, clients, processes, duration):
+    """
+    Replay traffic from clients threads spread over processes processes,
+    so the client side is not the bottleneck. Returns (samples, seconds).
+    """
+    queue = Queue()
+    start = time.time()
+    deadline = start + duration
+    generators = [Process(target=_generate, args=(
+        url, tokens, mix, batch_size, job_ids, clients // processes + (i < clients % processes),
+        deadline, i * clients, queue)) for i in range(processes)]
+    for p in generators:
+        p.start()
+    samples = []
+    for _ in generators:
+        samples.extend(queue.get())
+    elapsed = time.time() - start
+    for p in generators:
+        p.join()
+    return samples, elapsed
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * p), len(samples) - 1)]
+
+
+def summarize(samples, elapsed):
+    result = {}
+    for kind in ('all',) + KINDS:
+        selected = [s for s in samples if kind == 'all' or s[0] == kind]
+        if not selected:
+            continue
+        latencies = [s[1] for s in selected]
+        errors = sum(1 for s in selected if not s[2])
+        result[kind] = {'requests': len(selected),
+                        'per_second': round(len(selected) / elapsed, 1),
+                        'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+                        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+                        'error_rate': round(errors / float(len(selected)), 4)}
+    return result
+
+
+def print_summary(setting, summary):
+    for kind in ('all',) + KINDS:
+        row = summary.get(kind)
+        if row:
+            print('{:>6} {:<7} {:9.1f} req/s  p50 {:8.2f} ms  p99 {:8.2f} ms  {:6.2%} errors'.format(
+                setting, kind, row['per_second'], row['p50_ms'], row['p99_ms'], row['error_rate']))
+
+
+def write_config(path, scratch, workspace_url, arast_url, job_service_url):
+    config = ConfigParser()
+    config.add_section('AssemblyRAST')
+    for key, value in (('workspace-url', workspace_url),
+                       ('arast-url', arast_url),
+                       ('job-service-url', job_service_url),
+                       ('scratch', scratch)):
+        config.set('AssemblyRAST', key, value)
+    with open(path, 'w') as f:
+        config.write(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--settings', default='1x1,1x5,5x5',
+                        help='comma separated processes x threads settings')
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--client-processes', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--mix', default='submit=1,poll=8,batch=1',
+                        help='relative weights of the kinds of request')
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--auth-latency', type=float, default=0.05,
+                        help='seconds the auth stand-in takes to validate a token')
+    parser.add_argument('--job-service-latency', type=float, default=0.0,
+                        help='seconds the fake job service waits before answering')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+    mix = dict((kind, int(weight)) for kind, weight in
+               (item.split('=') for item in args.mix.split(',')))
+
+    tmpdir = tempfile.mkdtemp()
+    # jobs stay in progress, as most polled jobs are
+    job_service = FakeJobService(checks_until_done=sys.maxint,
+                                 latency=args.job_service_latency)
+    workspace = FakeWorkspaceServer()
+    arast = FakeARASTServer()
+    try:
+        deploy_cfg = os.path.join(tmpdir, 'deploy.cfg')
+        write_config(deploy_cfg, os.path.join(tmpdir, 'scratch'), workspace.start(),
+                     arast.start(), job_service.start())
+        os.environ['KB_DEPLOYMENT_CONFIG'] = deploy_cfg
+        # the server reads its configuration as it is imported
+        from AssemblyRAST.server import application
+        application.auth_client.client = FakeAuthClient(args.auth_latency)
+
+        tokens = ['un=user{}|tokenid={}|expiry={}'.format(i, i, int(time.time()) + 86400)
+                  for i in range(args.users)]
+        results = {'clients': args.clients, 'duration': args.duration, 'mix': mix,
+                   'batch_size': args.batch_size, 'users': args.users,
+                   'auth_latency': args.auth_latency,
+                   'job_service_latency': args.job_service_latency, 'settings': {}}
+        for setting in args.settings.split(','):
+            processes, threads = [int(n) for n in setting.split('x')]
+            url, workers = start_workers(application, processes, threads)
+            try:
+                # some jobs to poll from the start
+                job_ids = []
+                for i, token in enumerate(tokens):
+                    resp = requests.post(url, data=json.dumps(rpc('run_kiki_async', [{}], i)),
+                                         headers={'AUTHORIZATION': token})
+                    job_ids.append(resp.json()['result'][0])
+                samples, elapsed = generate(url, tokens, mix, args.batch_size, job_ids,
+                                            args.clients, args.client_processes, args.duration)
+            finally:
+                for p in workers:
+                    p.terminate()
+                    p.join()
+            results['settings'][setting] = summarize(samples, elapsed)
+            print_summary(setting, results['settings'][setting])
+    finally:
+        job_service.stop()
+        workspace.stop()
+        arast.stop()
+        shutil.rmtree(tmpdir)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
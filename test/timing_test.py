@@ -0,0 +1,62 @@
+import json
+import time
+import unittest
+
+from AssemblyRAST.timing import Timings
+
+
+def slow_items(n, delay):
+    for i in range(n):
+        time.sleep(delay)
+        yield i
+
+
+class TimingsTest(unittest.TestCase):
+
+    def test_nested_stages_are_exclusive(self):
+        timings = Timings()
+        with timings.span('outer') as span:
+            inner = timings.iterate('inner', slow_items(3, 0.02))
+            for _ in timings.iterate('middle', inner):
+                time.sleep(0.01)
+            span['bytes'] = 10
+        spans = dict((s['stage'], s) for s in timings.spans)
+        self.assertEqual([s['stage'] for s in timings.spans], ['outer', 'middle', 'inner'])
+        self.assertTrue(0.05 < spans['inner']['seconds'] < 0.1)
+        self.assertTrue(spans['middle']['seconds'] < 0.01)
+        self.assertTrue(0.025 < spans['outer']['seconds'] < 0.05)
+        self.assertEqual((spans['inner']['records'], spans['middle']['records']), (3, 3))
+        self.assertEqual(spans['outer']['bytes'], 10)
+        self.assertTrue(0.08 < timings.total() < 0.15)
+
+    def test_add_copy_and_provenance(self):
+        timings = Timings()
+        timings.add('download', 1.5, bytes=100, records=3)
+        timings.add('download', 0.5)
+        copied = timings.copy()
+        copied.add('save', 1.0)
+        self.assertEqual(len(timings.spans), 1)
+        self.assertEqual(timings.spans[0]['seconds'], 2.0)
+        self.assertTrue('download\t2.000\t100\t3' in timings.format())
+
+        provenance = [{'service': 'AssemblyRAST'}]
+        with_timings = copied.provenance(provenance)
+        self.assertEqual(provenance, [{'service': 'AssemblyRAST'}])
+        spans = json.loads(with_timings[0]['custom']['timings'])
+        self.assertEqual([s['stage'] for s in spans], ['download', 'save'])
+
+    def test_errors_still_timed(self):
+        timings = Timings()
+        try:
+            with timings.span('fails'):
+                raise ValueError('boom')
+        except ValueError:
+            pass
+        with timings.span('after'):
+            pass
+        self.assertEqual(len(timings._stack), 0)
+        self.assertEqual([s['stage'] for s in timings.spans], ['fails', 'after'])
+
+
+if __name__ == '__main__':
+    unittest.main()
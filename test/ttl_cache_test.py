@@ -0,0 +1,49 @@
+import threading
+import time
+import unittest
+
+from AssemblyRAST.ttl_cache import TTLCache
+
+
+class TTLCacheTest(unittest.TestCase):
+
+    def test_expiry(self):
+        cache = TTLCache(ttl=0.05)
+        cache.put('a', 1)
+        cache.put('b', 2, ttl=10)
+        self.assertEqual(cache.get('a'), 1)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_size_bound(self):
+        cache = TTLCache(maxsize=3)
+        for i in range(5):
+            cache.put(i, str(i))
+        self.assertEqual(len(cache), 3)
+        self.assertIsNone(cache.get(0))
+        self.assertEqual(cache.get(4), '4')
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_threads(self):
+        cache = TTLCache(maxsize=50)
+
+        def work(n):
+            for i in range(500):
+                cache.put((n, i % 60), i)
+                cache.get((n, (i + 1) % 60))
+
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(cache), 50)
+        self.assertEqual(cache.hits + cache.misses, 8 * 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
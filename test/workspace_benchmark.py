@@ -0,0 +1,61 @@
+"""
+Compare per-call workspace latency with and without the client pool.
+
+Runs get_object_info_new against a local workspace stand-in, once with a
+new client and connection for every call (as the generated workspace
+client does) and once through a WorkspacePool, and reports the median and
+95th percentile latency of each.
+
+    python workspace_benchmark.py [--calls N] [--url URL --token TOKEN]
+
+Against a real https workspace the pooled client also saves the TLS
+handshake, which the local stand-in does not have.
+"""
+import argparse
+import time
+
+from AssemblyRAST.workspace_pool import WorkspaceClient, WorkspacePool
+from fake_workspace import FakeWorkspaceServer
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * p), len(samples) - 1)]
+
+
+def measure(get_client, calls):
+    samples = []
+    for _ in range(calls):
+        start = time.time()
+        get_client().get_object_info_new({'objects': [{'ref': 'ws/reads'}]})
+        samples.append(time.time() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--url')
+    parser.add_argument('--token', default='token')
+    args = parser.parse_args()
+
+    workspace = None
+    url = args.url
+    if url is None:
+        workspace = FakeWorkspaceServer()
+        url = workspace.start()
+    try:
+        pool = WorkspacePool(url)
+        runs = [('new client per call', lambda: WorkspaceClient(url, args.token)),
+                ('pooled client', lambda: pool.get(args.token))]
+        for name, get_client in runs:
+            samples = measure(get_client, args.calls)
+            print('{:<20} median {:7.3f} ms  p95 {:7.3f} ms'.format(
+                name, percentile(samples, 0.5) * 1000, percentile(samples, 0.95) * 1000))
+    finally:
+        if workspace is not None:
+            workspace.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import threading
+import time
+import unittest
+
+from biokbase.workspace.client import ServerError
+from AssemblyRAST.workspace_pool import WorkspacePool
+from fake_workspace import FakeWorkspaceServer, READ_LIBRARY
+
+
+class WorkspacePoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = FakeWorkspaceServer()
+        self.pool = WorkspacePool(self.workspace.start(), max_age=60, max_clients=2)
+
+    def tearDown(self):
+        self.workspace.stop()
+
+    def test_calls(self):
+        ws = self.pool.get('token1')
+        info = ws.get_object_info_new({'objects': [{'ref': 'ws/reads'}]})[0]
+        self.assertEqual(info[1], 'reads')
+        subset = ws.get_object_subset([{'ref': '7/1/1', 'included': ['lib1/file']}])
+        self.assertEqual(subset[0]['data'], READ_LIBRARY)
+        saved = ws.save_objects({'id': 7, 'objects': [{'type': 'T', 'name': 'n', 'data': {}}]})
+        self.assertEqual(saved[0][1], 'n')
+        self.assertTrue(all(token == 'token1' for _, token, _ in self.workspace.requests))
+
+        self.workspace.fail = True
+        self.assertRaises(ServerError, ws.get_objects, [{'ref': 'ws/reads'}])
+
+    def test_reuse(self):
+        ws = self.pool.get('token1')
+        self.assertTrue(self.pool.get('token1') is ws)
+        self.assertFalse(self.pool.get('token2') is ws)
+
+        for _ in range(5):
+            self.pool.get('token1').get_object_info_new({'objects': [{'ref': 'ws/reads'}]})
+        self.assertEqual(self.workspace.connections(), 1)
+
+        # the least recently used client is dropped when the pool is full
+        self.pool.get('token2')
+        self.pool.get('token3')
+        self.assertEqual(len(self.pool), 2)
+        self.assertFalse(self.pool.get('token1') is ws)
+
+    def test_max_age(self):
+        self.pool.max_age = 0.05
+        ws = self.pool.get('token1')
+        time.sleep(0.1)
+        self.assertFalse(self.pool.get('token1') is ws)
+
+    def test_threads(self):
+        errors = []
+
+        def work():
+            try:
+                for _ in range(10):
+                    self.pool.get('token1').get_object_info_new({'objects': [{'ref': 'ws/r'}]})
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.workspace.requests), 50)
+        self.assertTrue(self.workspace.connections() <= 5)
+
+
+if __name__ == '__main__':
+    unittest.main()